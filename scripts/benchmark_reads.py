@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Load test of the read endpoints, to compare the sync views under WSGI with
+the async views under ASGI.
+
+Every connection sends its requests one after the other over HTTP/1.1
+keep-alive, so the concurrency is the number of connections. Only the
+standard library is used, the load generator mustn't be the bottleneck of
+the server measured: run it on another machine or core.
+
+Example, with the server under test on port 8000:
+
+    gunicorn taskmanager.wsgi -w 4 --threads 8
+    python scripts/benchmark_reads.py --token $JWT --concurrency 500 \\
+        http://localhost:8000/tasks/ http://localhost:8000/tasks/1/
+
+    uvicorn taskmanager.asgi:application --workers 4
+    python scripts/benchmark_reads.py --token $JWT --concurrency 500 \\
+        http://localhost:8000/tasks/async/ http://localhost:8000/tasks/async/1/
+"""
+
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def _request(reader, writer, host, path, headers):
+    writer.write(
+        (
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{headers}"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode()
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("The server closed the connection")
+    length, close = 0, False
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection" and value.strip().lower() == "close":
+            close = True
+    await reader.readexactly(length)
+    return int(status_line.split()[1]), close
+
+
+async def _worker(urls, headers, deadline, latencies, errors):
+    parts = [urlsplit(url) for url in urls]
+    host, port = parts[0].hostname, parts[0].port or 80
+    connection = None
+    for part in itertools.cycle(parts):
+        if time.monotonic() >= deadline:
+            break
+        path = part.path + (f"?{part.query}" if part.query else "")
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port)
+            status, close = await _request(*connection, part.netloc, path, headers)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            errors.append("connection")
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors.append(status)
+        if close:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def _run(args):
+    headers = "".join(f"{header}\r\n" for header in args.header)
+    if args.token:
+        headers += f"Authorization: Bearer {args.token}\r\n"
+    latencies, errors = [], []
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    await asyncio.gather(
+        *(
+            _worker(args.urls, headers, deadline, latencies, errors)
+            for _ in range(args.concurrency)
+        )
+    )
+    elapsed = time.monotonic() - started
+    if not latencies:
+        print("No request completed")
+        return
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"requests:   {len(latencies)} in {elapsed:.1f}s")
+    print(f"throughput: {len(latencies) / elapsed:.0f} requests/s")
+    print(f"p50:        {percentiles[49] * 1000:.1f} ms")
+    print(f"p99:        {percentiles[98] * 1000:.1f} ms")
+    print(f"errors:     {len(errors)} {sorted(set(map(str, errors)))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("urls", nargs="+", help="The URLs requested in turn.")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="In seconds.")
+    parser.add_argument("--token", help="A JWT access token.")
+    parser.add_argument(
+        "--header", action="append", default=[], help='e.g. "Accept: */*"'
+    )
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
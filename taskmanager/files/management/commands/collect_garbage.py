@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from taskmanager.garbage import collect_garbage
+
+
+class Command(BaseCommand):
+    """
+    Django command to delete the files of the storage no row refers to, e.g.
+    the pictures of deleted profiles, see taskmanager.garbage.
+    """
+
+    help = "Delete the orphaned files of the profile pictures and shared files"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the orphaned files, without deleting them",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="The number of rows loaded and files checked at a time",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            help="Keep the files modified less than this many seconds ago",
+        )
+
+    def handle(self, *args, **options):
+        files, reclaimed = collect_garbage(
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+            min_age=options["min_age"],
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {files} orphaned files, {reclaimed} bytes")
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0003_alter_sharedfile_file'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sharedfile',
+            index=models.Index(fields=['project', 'uploaded_at', 'id'], name='file_project_uploaded_at_idx'),
+        ),
+    ]
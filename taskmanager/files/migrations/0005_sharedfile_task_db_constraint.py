@@ -0,0 +1,20 @@
+# Generated by Django 4.2.9 on 2026-10-19 10:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0014_task_completed_at_archivedtask_and_more'),
+        ('files', '0004_sharedfile_project_uploaded_at_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sharedfile',
+            name='task',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shared_files', to='tasks.task'),
+        ),
+    ]
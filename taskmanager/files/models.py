@@ -97,7 +97,22 @@ class SharedFile(models.Model):
         null=True,
         blank=True,
         related_name="shared_files",
+        # The tasks are partitioned, see taskmanager.partitioning.
+        db_constraint=False,
     )
 
+    class Meta:
+        """
+        Meta class that defines the indexes for the SharedFile model.
+        """
+
+        indexes = [
+            # The files of a project, newest first.
+            models.Index(
+                fields=["project", "uploaded_at", "id"],
+                name="file_project_uploaded_at_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.file.name
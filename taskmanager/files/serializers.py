@@ -4,6 +4,8 @@ This module contains the serializers for the SharedFile model.
 
 from rest_framework import serializers
 
+from taskmanager.loaders import IdentityMapHyperlinkedRelatedField
+
 from .models import SharedFile
 
 
@@ -23,6 +25,7 @@ class SharedFileSerializer(serializers.HyperlinkedModelSerializer):
         task (ForeignKey): The task associated with the shared file.
     """
 
+    serializer_related_field = IdentityMapHyperlinkedRelatedField
     uploaded_by: serializers.RelatedField | serializers.ManyRelatedField = (
         serializers.HyperlinkedRelatedField(view_name="user-detail", read_only=True)
     )
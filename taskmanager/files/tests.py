@@ -6,18 +6,26 @@ The test cases cover the following scenarios:
 2. Test the file download API endpoint.
 3. Test the file sharing API endpoint.
 4. Test the file deletion API endpoint.
+5. Test the garbage collector of the storage.
 """
 
 import os
+import tempfile
+import time
+from io import StringIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from taskmanager.garbage import collect_garbage, referenced_names
+
 from .models import Project, SharedFile, Task
 
 User = get_user_model()
@@ -242,3 +250,78 @@ class FileTests(APITestCase):
                 os.remove(file_path)
 
         super().tearDown()
+
+
+class StorageGarbageTestCase(TestCase):
+    """
+    Test cases for the garbage collector of the storage.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=user,
+        )
+        SharedFile.objects.create(
+            file=self._write("shared_files/kept.txt", b"kept"),
+            uploaded_by=user,
+            project=project,
+        )
+        self._write("shared_files/orphan.txt", b"orphan")
+        self._write("profile_pics/orphan.jpg", b"jpg")
+        self._write("shared_files/recent.txt", b"recent", age=0)
+
+    def _write(self, name, content, age=60 * 60 * 48):
+        path = os.path.join(self.media_root.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return name
+
+    def _exists(self, name):
+        return os.path.isfile(os.path.join(self.media_root.name, name))
+
+    def test_referenced_names(self):
+        """
+        Test that the names of the files of every file field are loaded.
+        """
+        self.assertEqual(referenced_names(batch_size=1), {"shared_files/kept.txt"})
+
+    def test_dry_run_deletes_nothing(self):
+        """
+        Test that a dry run reports the orphaned files and keeps them.
+        """
+        self.assertEqual(collect_garbage(dry_run=True), (2, 9))
+        self.assertTrue(self._exists("shared_files/orphan.txt"))
+        self.assertTrue(self._exists("profile_pics/orphan.jpg"))
+
+    def test_orphaned_files_are_deleted(self):
+        """
+        Test that the old orphaned files are deleted, and the others kept.
+        """
+        out = StringIO()
+        call_command("collect_garbage", "--batch-size", "1", stdout=out)
+        self.assertIn("Deleted 2 orphaned files, 9 bytes", out.getvalue())
+        self.assertFalse(self._exists("shared_files/orphan.txt"))
+        self.assertFalse(self._exists("profile_pics/orphan.jpg"))
+        self.assertTrue(self._exists("shared_files/kept.txt"))
+        self.assertTrue(self._exists("shared_files/recent.txt"))
+
+    def test_deleted_rows_leave_their_files_to_the_collector(self):
+        """
+        Test that deleting a shared file keeps its file until the collection.
+        """
+        SharedFile.objects.all().delete()
+        self.assertTrue(self._exists("shared_files/kept.txt"))
+        self.assertEqual(collect_garbage(), (3, 13))
+        self.assertFalse(self._exists("shared_files/kept.txt"))
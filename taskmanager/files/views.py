@@ -8,18 +8,24 @@ Classes:
 """
 
 from django.urls import resolve
+from projects.scoping import ProjectScopedMixin
 from rest_framework import viewsets
 from rest_framework.exceptions import ValidationError
 
+from taskmanager.loaders import identity_map
+
 from .models import Project, SharedFile, Task
 from .serializers import SharedFileSerializer
 
 
-class SharedFileViewSet(viewsets.ModelViewSet):
+class SharedFileViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing SharedFile instances.
+
+    A user only sees the files of the projects they own or are a member of.
     """
 
+    project_field = "project"
     serializer_class = SharedFileSerializer
     queryset = (
         SharedFile.objects.all()
@@ -38,7 +44,7 @@ class SharedFileViewSet(viewsets.ModelViewSet):
         project = self.get_project()
         task = self.get_task()
 
-        if task and task.project != project:
+        if task and (project is None or task.project_id != project.pk):
             raise ValidationError("The task does not belong to the project")
         try:
             serializer.save(uploaded_by=self.request.user, project=project, task=task)
@@ -58,7 +64,8 @@ class SharedFileViewSet(viewsets.ModelViewSet):
             if not project_id:
                 raise ValidationError("Inalid project URL")
             try:
-                project = Project.objects.get(pk=project_id)
+                # The serializer resolved it already.
+                project = identity_map(self.request).get(Project, project_id)
             except Project.DoesNotExist as exc:
                 raise ValidationError(
                     "There is no Project with this ID to relate to the file"
@@ -79,7 +86,7 @@ class SharedFileViewSet(viewsets.ModelViewSet):
             if not task_id:
                 raise ValidationError("Invalid task URL")
             try:
-                task = Task.objects.get(pk=task_id)
+                task = identity_map(self.request).get(Task, task_id)
             except Task.DoesNotExist as exc:
                 raise ValidationError(
                     "There is no Task with this ID to relate to project"
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
 
+from taskmanager.purge import mark_user_deleted, purge_user
+
 User = get_user_model()
 
 
@@ -8,7 +10,10 @@ class Command(BaseCommand):
     help = "Rollback users created by populate_db command"
 
     def handle(self, *_args, **_kwargs):
-        users = User.objects.filter(username__contains="_")
-        user_count = users.count()
-        users.delete()
+        # Purged in batches, like the users deleted through the API.
+        users = list(User.objects.filter(username__contains="_"))
+        user_count = len(users)
+        for user in users:
+            mark_user_deleted(user)
+            purge_user(user.pk)
         self.stdout.write(self.style.SUCCESS(f"Deleted {user_count} users"))
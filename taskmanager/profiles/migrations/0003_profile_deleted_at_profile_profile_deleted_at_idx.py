@@ -0,0 +1,22 @@
+# Generated by Django 4.2.9 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_profile_expo_push_token_alter_profile_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='profile_deleted_at_idx'),
+        ),
+    ]
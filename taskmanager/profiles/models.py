@@ -47,6 +47,7 @@ class Profile(models.Model):
         user (User): The user.
         image (Image): The profile picture.
         expo_push_token (str): The Expo push token.
+        deleted_at (datetime): When the user was deleted, None if they weren't.
     """
 
     user = models.OneToOneField(
@@ -56,18 +57,19 @@ class Profile(models.Model):
         upload_to="profile_pics", validators=[validate_image_file_extension]
     )
     expo_push_token = models.CharField(max_length=200, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self) -> str:
         return f"{self.user.get_username()} Profile"
 
-    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
-        if self.image and self.image.name:
-            storage, path = self.image.storage, self.image.path
-            try:
-                storage.delete(path)
-            except (FileNotFoundError, OSError) as e:
-                print(f"Error deleting file {path}: {e}")
-        return super().delete(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="profile_deleted_at_idx",
+            ),
+        ]
 
 
 @receiver(post_save, sender=get_user_model())
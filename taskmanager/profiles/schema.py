@@ -1,6 +1,7 @@
 """
 This module defines the GraphQL schema for the profiles app.
-It includes the definition of the `ProfileType`, `UserType`, and `Query` classes.
+It includes the definition of the `ProfileType`, `UserType`, `UserConnection` and `Query`
+classes.
 
 The `ProfileType` class represents a user profile in the GraphQL schema.
 It defines the fields and behavior of the profile type.
@@ -8,8 +9,11 @@ It defines the fields and behavior of the profile type.
 The `UserType` class represents a user in the GraphQL schema.
 It inherits from `DjangoObjectType` and includes a `profile` field of type `ProfileType`.
 
+The `UserConnection` class represents a keyset paginated page of users.
+
 The `Query` class defines the queries that can be made on the `UserType`.
-It includes a `resolve_all_users` method that returns all users in the system.
+It includes a `resolve_all_users` method that returns all users in the system,
+and a `resolve_users` method that returns them page by page.
 """
 
 # pyright: reportMissingImports=false
@@ -18,6 +22,9 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied
 from graphene_django import DjangoObjectType
 
+from taskmanager.connections import CountableConnection, paginate
+from taskmanager.query_optimizer import optimize_queryset
+
 from .models import Profile
 
 
@@ -94,6 +101,25 @@ class UserType(DjangoObjectType):
         return None
 
 
+class UserConnection(CountableConnection):
+    """
+    Class that defines a page of users.
+
+    Args:
+        CountableConnection: Inherits from CountableConnection.
+    """
+
+    class Meta:
+        """
+        Meta class that defines the node type of the connection.
+
+        Attributes:
+            node: The user type.
+        """
+
+        node = UserType
+
+
 class Query(graphene.ObjectType):
     """
     Class that defines the query for the UserType.
@@ -107,6 +133,9 @@ class Query(graphene.ObjectType):
     """
 
     all_users = graphene.List(UserType)
+    users = graphene.Field(
+        UserConnection, first=graphene.Int(), after=graphene.String()
+    )
 
     def resolve_all_users(self, info):
         """
@@ -121,5 +150,35 @@ class Query(graphene.ObjectType):
         """
         user = info.context.user
         if user.is_authenticated:
-            return get_user_model().objects.all()
+            return optimize_queryset(
+                get_user_model().objects.filter(profile__deleted_at=None), info
+            )
+        raise PermissionDenied("Authentication credentials were not provided.")
+
+    def resolve_users(self, info, first=None, after=None):
+        """
+        Method that resolves a page of users, in the order they joined.
+
+        Args:
+            self: The object itself.
+            info: The information about the request.
+            first (int, optional): The number of users in the page.
+            after (str, optional): The cursor of the user the page starts after.
+
+        Returns:
+            UserConnection: The page of users.
+        """
+        user = info.context.user
+        if user.is_authenticated:
+            return paginate(
+                optimize_queryset(
+                    get_user_model().objects.filter(profile__deleted_at=None),
+                    info,
+                    path=("edges", "node"),
+                ),
+                UserConnection,
+                ("pk",),
+                first,
+                after,
+            )
         raise PermissionDenied("Authentication credentials were not provided.")
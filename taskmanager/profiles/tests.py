@@ -14,18 +14,21 @@ To run the tests:
 
 from io import StringIO
 from pathlib import Path
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import AnonymousUser, Group
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import CommandError, call_command
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from taskmanager.schema import schema
+
 from .models import Profile, validate_image_file_extension
 
 User = get_user_model()
@@ -722,12 +725,108 @@ class UserViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["username"], self.user.username)
 
+    def test_deleted_user_is_hidden_until_purged(self):
+        """
+        Test case for deleting a user.
+
+        The user is deactivated and hidden at once, and purged in the background.
+        """
+        other_user = User.objects.create_user(username="other", password="password")
+        with patch("tasks.tasks.purge_deleted_user.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(f"/profiles/users/{other_user.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        delay.assert_called_once_with(other_user.pk)
+        other_user.refresh_from_db()
+        self.assertFalse(other_user.is_active)
+        response = self.client.get(f"/profiles/users/{other_user.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_user_is_purged(self):
+        """
+        Test case for the purge of a deleted user, with their profile.
+        """
+        other_user = User.objects.create_user(username="other", password="password")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/profiles/users/{other_user.pk}/")
+        self.assertFalse(User.objects.filter(pk=other_user.pk).exists())
+        self.assertFalse(Profile.objects.filter(user_id=other_user.pk).exists())
+
+    def test_only_admin_deletes_users(self):
+        """
+        Test case for deleting a user as a user that isn't an admin.
+        """
+        other_user = User.objects.create_user(username="other", password="password")
+        self.client.force_authenticate(user=other_user)
+        response = self.client.delete(f"/profiles/users/{self.user.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_active)
+
     def tearDown(self):
         self.client.logout()
         self.client.force_authenticate(user=None)
         super().tearDown()
 
 
+class UserConnectionTestCase(TestCase):
+    """
+    Test case for the keyset paginated users connection.
+    """
+
+    query = """
+        query ($after: String) {
+            users(first: 2, after: $after) {
+                edges { node { username profile { expoPushToken } } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+    """
+
+    def setUp(self):
+        """
+        Set up three users.
+        """
+        self.users = [
+            get_user_model().objects.create_user(username=f"user{i}", password="pw")
+            for i in range(3)
+        ]
+
+    def execute(self, user, **variables):
+        """
+        Executes the users query as the given user.
+        """
+        context = RequestFactory().post("/graphql/")
+        context.user = user
+        return schema.execute(
+            self.query, context_value=context, variable_values=variables
+        )
+
+    def test_pages_follow_the_cursor(self):
+        """
+        Test that the users are returned page by page in the order they joined.
+        """
+        result = self.execute(self.users[0])
+        self.assertIsNone(result.errors)
+        page = result.data["users"]
+        self.assertEqual(
+            [edge["node"]["username"] for edge in page["edges"]], ["user0", "user1"]
+        )
+        self.assertTrue(page["pageInfo"]["hasNextPage"])
+        result = self.execute(self.users[0], after=page["pageInfo"]["endCursor"])
+        page = result.data["users"]
+        self.assertEqual(
+            [edge["node"]["username"] for edge in page["edges"]], ["user2"]
+        )
+        self.assertFalse(page["pageInfo"]["hasNextPage"])
+
+    def test_authentication_required(self):
+        """
+        Test that anonymous users can't list users.
+        """
+        result = self.execute(AnonymousUser())
+        self.assertIsNotNone(result.errors)
+
+
 class PopulateDBCommandTest(TestCase):
     """
     Test case for the populate_db management command.
@@ -749,6 +848,19 @@ class PopulateDBCommandTest(TestCase):
         self.assertEqual(Profile.objects.count(), 10)
         self.assertIn("Successfully created all users", out.getvalue())
 
+    def test_rollback_user_command(self):
+        """
+        Test case for the rollback_user management command.
+
+        The users created by populate_db are purged with their profiles.
+        """
+        call_command("populate_db", "3", stdout=StringIO())
+        out = StringIO()
+        call_command("rollback_user", stdout=out)
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Profile.objects.exists())
+        self.assertIn("Deleted 3 users", out.getvalue())
+
     def test_invalid_count_argument(self):
         """
         Test case for an invalid count argument.
@@ -5,7 +5,9 @@ from typing import Any
 from dj_rest_auth.views import LoginView as DjRestAuthLoginView  # type: ignore
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from rest_framework import status, viewsets
+from django.db import transaction
+from projects.tokens import ProjectsRefreshToken
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
@@ -13,9 +15,10 @@ from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication  # type: ignore
-from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.tasks import purge_deleted_user
 
 from profiles.permissions import IsAdminUserOrReadOnly, IsUserOrReadOnly
+from taskmanager.purge import mark_user_deleted
 
 from .models import Profile
 from .serializers import (
@@ -34,7 +37,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
     Requires authentication and permission to access.
     """
 
-    queryset = Profile.objects.all().order_by("pk")
+    queryset = Profile.objects.filter(deleted_at=None).order_by("pk")
     serializer_class = ProfileSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsUserOrReadOnly, IsAuthenticated]
@@ -65,6 +68,9 @@ class ProfileViewSet(viewsets.ModelViewSet):
         """
         Perform the destroy operation.
 
+        Only the profile is deleted, the user is deleted from the users, see
+        UserViewSet. The image is left to the garbage collector of the storage.
+
         Args:
             instance: The Profile instance to be deleted.
         """
@@ -97,18 +103,30 @@ class ProfileViewSet(viewsets.ModelViewSet):
         )
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
     """
-    API endpoint that allows users to view.
+    API endpoint that allows users to view, and admins to delete them.
 
     Inherits from `viewsets.ReadOnlyModelViewSet` and provides read-only actions for users.
     """
 
-    queryset = get_user_model().objects.all().order_by("pk")
+    queryset = get_user_model().objects.filter(profile__deleted_at=None).order_by("pk")
     serializer_class = UserSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAdminUserOrReadOnly, IsAuthenticated]
 
+    def perform_destroy(self, instance: Any) -> None:
+        """
+        Deactivates and hides the user at once, and purges them with their
+        profile, tasks, comments and files in the background, see
+        taskmanager.purge.
+
+        Args:
+            instance: The User instance to be deleted.
+        """
+        mark_user_deleted(instance)
+        transaction.on_commit(lambda: purge_deleted_user.delay(instance.pk))
+
 
 class GroupViewSet(viewsets.ModelViewSet):
     """
@@ -150,7 +168,7 @@ class RegisterView(APIView):
                 serializer.data["email"],
                 serializer.data["password"],
             )
-            refresh = RefreshToken.for_user(user)
+            refresh = ProjectsRefreshToken.for_user(user)
             return Response(
                 {
                     "refresh": str(refresh),
@@ -19,3 +19,13 @@ class ProjectsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "projects"
+
+    def ready(self) -> None:
+        """
+        Method called when the app is ready
+
+        Returns:
+            None
+        """
+        # importing projects.signals to register the signals
+        import projects.signals  # noqa: F401
@@ -0,0 +1,311 @@
+"""
+This module contains the change stream of the projects.
+
+The changes to the tasks, comments and files of a project are published to a
+Redis stream per project, which is both the channel the open event streams
+read from and the replay buffer of the project: the last
+PROJECT_EVENTS_REPLAY_SIZE events are kept. The ids of the stream entries are
+the ids of the server-sent events, so a client reconnecting with
+`Last-Event-ID` gets the events it missed.
+
+The open event streams of a process share one reader, which follows the
+streams of all their projects with a single blocking read, and hands the
+events to the event streams through in-memory queues. The number of Redis
+connections doesn't grow with the number of open event streams.
+
+Events are published once the transaction commits, so a client never sees a
+change that is rolled back, and refetches the changed objects in their
+committed state.
+
+Functions:
+    publish: Publishes an event of a project once the transaction commits.
+    publish_many: Publishes events of projects once the transaction commits.
+    muted: Publishes no events in a block, e.g. while a purge deletes rows.
+    is_muted: Returns whether the events are muted.
+    format_event: Formats a server-sent event.
+    event_stream: Streams the events of a project as server-sent events.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+KEY_PREFIX = "taskmanager:projects:events"
+EVENT_ID = re.compile(r"^\d+-\d+$")
+# How long the reader of a process blocks on the streams, in milliseconds.
+READ_BLOCK = 1000
+
+logger = logging.getLogger(__name__)
+
+_muted: ContextVar[bool] = ContextVar("muted", default=False)
+
+
+def _stream_key(project_id: int) -> str:
+    return f"{KEY_PREFIX}:{project_id}"
+
+
+def _add_many(events: list[tuple[int, str, dict[str, Any]]]) -> None:
+    try:
+        connection = get_redis_connection("default")
+        pipeline = connection.pipeline()
+        for project_id, event, data in events:
+            pipeline.xadd(
+                _stream_key(project_id),
+                {"event": event, "data": json.dumps(data, cls=DjangoJSONEncoder)},
+                maxlen=settings.PROJECT_EVENTS_REPLAY_SIZE,
+                approximate=True,
+            )
+        # The buffer of a project without activity is dropped.
+        for project_id in {project_id for project_id, _event, _data in events}:
+            pipeline.expire(_stream_key(project_id), settings.PROJECT_EVENTS_RETENTION)
+        pipeline.execute()
+    except RedisError:
+        # The change is committed, the clients see it on their next refetch.
+        logger.exception("Could not publish %s events", len(events))
+
+
+def _add(project_id: int, event: str, data: dict[str, Any]) -> None:
+    _add_many([(project_id, event, data)])
+
+
+def publish(project_id: int, event: str, data: dict[str, Any]) -> None:
+    """
+    Publishes an event of a project once the current transaction commits.
+
+    Args:
+        project_id (int): The pk of the project.
+        event (str): The type of the event, e.g. "task.updated".
+        data (dict): The data of the event.
+    """
+    if not _muted.get():
+        transaction.on_commit(lambda: _add(project_id, event, data))
+
+
+def publish_many(events: list[tuple[int, str, dict[str, Any]]]) -> None:
+    """
+    Publishes events of projects once the current transaction commits, in
+    one round trip, e.g. for the tasks written by a bulk mutation.
+
+    Args:
+        events (list[tuple[int, str, dict]]): The pk of the project, the type
+            and the data of every event.
+    """
+    if events and not _muted.get():
+        transaction.on_commit(lambda: _add_many(events))
+
+
+@contextmanager
+def muted() -> Iterator[None]:
+    """
+    Publishes no events in the block.
+
+    The rows a purge deletes are those of a deleted project, whose clients
+    were told, or of a deleted user, which the clients see on their next
+    refetch. Publishing them would cost a query and an event per row.
+    """
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def is_muted() -> bool:
+    """
+    Returns whether the events are muted, see muted.
+
+    Returns:
+        bool: True in a muted block.
+    """
+    return _muted.get()
+
+
+def format_event(event_id: str, event: str, data: str) -> str:
+    """
+    Formats a server-sent event.
+
+    Args:
+        event_id (str): The id of the event.
+        event (str): The type of the event.
+        data (str): The JSON data of the event.
+
+    Returns:
+        str: The event in the text/event-stream format.
+    """
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+def _event_id(value: str) -> tuple[int, int]:
+    milliseconds, sequence = value.split("-")
+    return int(milliseconds), int(sequence)
+
+
+async def _missed_events(client: aioredis.Redis, key: str, last_event_id: str) -> bool:
+    # Events were dropped since the client's last event if the buffer is full
+    # and its oldest event is newer.
+    oldest = await client.xrange(key, count=1)
+    if not oldest or _event_id(oldest[0][0]) <= _event_id(last_event_id):
+        return False
+    return await client.xlen(key) >= settings.PROJECT_EVENTS_REPLAY_SIZE
+
+
+class _Subscriber:
+    # The events of one stream of a project, read by the reader of the
+    # process. A client too slow to keep up overflows and reconnects.
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=settings.PROJECT_EVENTS_REPLAY_SIZE
+        )
+        self.overflowed = False
+
+    def put(self, entry: tuple[str, dict[str, str]]) -> None:
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class _Reader:
+    # Reads the projects followed in the process with one blocking XREAD on
+    # a connection of its own, and fans the events out to their subscribers.
+    # The other commands share a bounded pool.
+
+    def __init__(self) -> None:
+        url = settings.CACHES["default"]["LOCATION"]
+        self.loop = asyncio.get_running_loop()
+        self.client = aioredis.Redis(
+            connection_pool=aioredis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=settings.PROJECT_EVENTS_CONNECTIONS,
+                decode_responses=True,
+            )
+        )
+        self.blocking_client = aioredis.from_url(url, decode_responses=True)
+        self.subscribers: dict[str, set[_Subscriber]] = {}
+        self.positions: dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self, key: str, last_event_id: str) -> _Subscriber:
+        subscriber = _Subscriber()
+        self.subscribers.setdefault(key, set()).add(subscriber)
+        # A stream read already is read on from where it is.
+        self.positions.setdefault(key, last_event_id)
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, key: str, subscriber: _Subscriber) -> None:
+        subscribers = self.subscribers.get(key, set())
+        subscribers.discard(subscriber)
+        if not subscribers:
+            self.subscribers.pop(key, None)
+            self.positions.pop(key, None)
+
+    async def _run(self) -> None:
+        while self.subscribers:
+            try:
+                # A short block, the streams followed since are read from
+                # the next call on.
+                response = await self.blocking_client.xread(
+                    dict(self.positions), count=100, block=READ_BLOCK
+                )
+            except RedisError:
+                logger.exception("Could not read the events of the projects")
+                await asyncio.sleep(READ_BLOCK / 1000)
+                continue
+            for key, entries in response or []:
+                if key not in self.positions:
+                    continue
+                self.positions[key] = entries[-1][0]
+                for subscriber in self.subscribers.get(key, ()):
+                    for entry in entries:
+                        subscriber.put(entry)
+
+
+_reader: Optional[_Reader] = None
+
+
+def _get_reader() -> _Reader:
+    global _reader
+    if _reader is None or _reader.loop is not asyncio.get_running_loop():
+        _reader = _Reader()
+    return _reader
+
+
+async def event_stream(
+    project_id: int, last_event_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Streams the events of a project as server-sent events.
+
+    The stream starts after `last_event_id`, or with the next event if there
+    is none. If events after `last_event_id` were already dropped from the
+    buffer, a "reset" event is sent first: the client has to refetch the
+    project. A comment is sent every PROJECT_EVENTS_KEEPALIVE seconds
+    without events, so that proxies keep the connection open.
+
+    The streams of a process don't hold a Redis connection each: one reader
+    per process follows all the projects streamed, and hands their events to
+    the streams. The events a stream missed are read once, when it starts.
+
+    The stream ends after PROJECT_EVENTS_MAX_DURATION seconds and the
+    client reconnects with the id of its last event, which also makes it
+    authenticate again. It also ends when the client doesn't keep up.
+
+    Args:
+        project_id (int): The pk of the project.
+        last_event_id (str, optional): The id of the last event the client got.
+
+    Yields:
+        str: The events in the text/event-stream format.
+    """
+    key = _stream_key(project_id)
+    reader = _get_reader()
+    client = reader.client
+    deadline = time.monotonic() + settings.PROJECT_EVENTS_MAX_DURATION
+    missed = False
+    if last_event_id is None or not EVENT_ID.match(last_event_id):
+        # Starts after the newest event, "$" would skip the events
+        # published between two reads.
+        newest = await client.xrevrange(key, count=1)
+        last_event_id = newest[0][0] if newest else "0-0"
+    else:
+        missed = await _missed_events(client, key, last_event_id)
+    # Subscribed before the first chunk and before the missed events are
+    # read, so that none is lost in between. The events read twice are
+    # skipped by their id.
+    subscriber = reader.subscribe(key, last_event_id)
+    try:
+        yield f"retry: {settings.PROJECT_EVENTS_RETRY}\n\n"
+        if missed:
+            yield format_event(last_event_id, "reset", "{}")
+        for event_id, fields in await client.xrange(key, min=f"({last_event_id}"):
+            last_event_id = event_id
+            yield format_event(event_id, fields["event"], fields["data"])
+        while time.monotonic() < deadline and not subscriber.overflowed:
+            try:
+                event_id, fields = await asyncio.wait_for(
+                    subscriber.queue.get(), settings.PROJECT_EVENTS_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if _event_id(event_id) <= _event_id(last_event_id):
+                continue
+            last_event_id = event_id
+            yield format_event(event_id, fields["event"], fields["data"])
+    finally:
+        reader.unsubscribe(key, subscriber)
@@ -0,0 +1,259 @@
+"""
+This module contains the project membership of the users.
+
+The permission checks of a write used to query the membership of the user
+once each. The projects a user owns or is a member of are now loaded once,
+in one query, and cached in Redis as a set of project ids per user. A request
+keeps the set of its user, so that every check of the request after the first
+one is free.
+
+The cached sets are deleted when the members or the owner of a project
+change, see projects.signals. They also expire after
+PROJECT_MEMBERSHIP_TIMEOUT seconds, for the changes made without signals.
+
+The access tokens can also carry the projects of their user, in the
+`projects` claim, see projects.tokens. Every change of the projects of a
+user bumps a version counter of the user, and the claim is only trusted
+while its version is the current one: a request with a fresh token checks
+the membership without loading the projects at all.
+
+Functions:
+    user_project_ids: Returns the projects of users by user id.
+    project_ids: Returns the projects of the user of a request.
+    is_member: Returns whether the user of a request belongs to a project.
+    count_members: Counts the users of a list that belong to a project.
+    version: Returns the membership version of a user.
+    claim: Returns the projects claim of a user, for their access tokens.
+    invalidate: Deletes the cached projects of users.
+"""
+
+import base64
+import json
+import time
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from rest_framework_simplejwt.tokens import Token
+
+from .models import Project
+
+CACHE_PREFIX = "taskmanager:projects:members"
+CLAIM = "projects"
+
+
+def _cache_key(user_id: int) -> str:
+    return f"{CACHE_PREFIX}:{user_id}"
+
+
+def _version_key(user_id: int) -> str:
+    return f"{CACHE_PREFIX}:version:{user_id}"
+
+
+def _load(user_ids: set[int]) -> dict[int, frozenset[int]]:
+    # One query for all the users, the (user_id, project_id) index of the
+    # members covers it.
+    if not user_ids:
+        return {}
+    owned = Project.objects.filter(owner_id__in=user_ids).values_list("owner", "pk")
+    joined = Project.users.through.objects.filter(
+        user_id__in=user_ids, project__deleted_at=None
+    ).values_list("user", "project")
+    projects: dict[int, set[int]] = {user_id: set() for user_id in user_ids}
+    for user_id, project_id in owned.order_by().union(joined.order_by()):
+        projects[user_id].add(project_id)
+    return {user_id: frozenset(ids) for user_id, ids in projects.items()}
+
+
+def user_project_ids(user_ids: Iterable[int]) -> dict[int, frozenset[int]]:
+    """
+    Returns the projects users own or are members of, by user id.
+
+    Args:
+        user_ids (Iterable[int]): The ids of the users.
+
+    Returns:
+        dict[int, frozenset[int]]: The ids of the projects of each user.
+    """
+    keys = {_cache_key(user_id): user_id for user_id in set(user_ids)}
+    cached = cache.get_many(keys)
+    projects = {keys[key]: ids for key, ids in cached.items()}
+    missing = _load(set(keys.values()) - projects.keys())
+    if missing:
+        cache.set_many(
+            {_cache_key(user_id): ids for user_id, ids in missing.items()},
+            settings.PROJECT_MEMBERSHIP_TIMEOUT,
+        )
+    return {**projects, **missing}
+
+
+def project_ids(request: Any) -> frozenset[int]:
+    """
+    Returns the projects the user of a request owns or is a member of.
+
+    The projects are kept on the request, later calls don't hit the cache.
+
+    Args:
+        request (Request | HttpRequest): The request.
+
+    Returns:
+        frozenset[int]: The ids of the projects, none for anonymous users.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    token = getattr(request, "auth", None)
+    # The Django request outlives the DRF request wrapping it.
+    request = getattr(request, "_request", request)
+    memo = request.__dict__.setdefault("member_project_ids", {})
+    if user.pk not in memo:
+        claimed = _claimed_project_ids(token, user.pk)
+        if claimed is None:
+            claimed = user_project_ids([user.pk])[user.pk]
+        memo[user.pk] = claimed
+    return memo[user.pk]
+
+
+def is_member(request: Any, project_id: Optional[int]) -> bool:
+    """
+    Returns whether the user of a request owns or is a member of a project.
+
+    Args:
+        request (Request | HttpRequest): The request.
+        project_id (int, optional): The pk of the project.
+
+    Returns:
+        bool: True if the user owns or is a member of the project.
+    """
+    return project_id is not None and int(project_id) in project_ids(request)
+
+
+def count_members(project_id: int, user_ids: Iterable[int]) -> int:
+    """
+    Counts the users of a list that own or are members of a project, in one query.
+
+    The query runs on the (user_id, project_id) index of the members, its cost
+    doesn't depend on the number of members of the project.
+
+    Args:
+        project_id (int): The pk of the project.
+        user_ids (Iterable[int]): The pks of the users.
+
+    Returns:
+        int: The number of distinct users of the list in the project.
+    """
+    members = Project.users.through.objects.filter(
+        user_id=OuterRef("pk"), project_id=project_id
+    )
+    # Not a join on the owned projects, a user would count once per project
+    # they own.
+    owns = Project.objects.filter(pk=project_id, owner=OuterRef("pk"))
+    return (
+        get_user_model()
+        .objects.filter(pk__in=set(user_ids))
+        .filter(Exists(owns) | Exists(members))
+        .count()
+    )
+
+
+def version(user_id: int) -> Optional[int]:
+    """
+    Returns the membership version of a user.
+
+    Args:
+        user_id (int): The pk of the user.
+
+    Returns:
+        int: The version, bumped on every change of the projects of the user.
+    """
+    key = _version_key(user_id)
+    # A new counter starts from the clock, so that it doesn't take a value a
+    # counter lost by the cache had.
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def claim(user_id: int) -> Optional[dict[str, Any]]:
+    """
+    Returns the projects claim of a user, for their access tokens.
+
+    The projects are listed, or stored as a bitmap from the smallest pk when
+    that is shorter.
+
+    Args:
+        user_id (int): The pk of the user.
+
+    Returns:
+        dict: The claim, None if it would be longer than
+            PROJECT_MEMBERSHIP_CLAIM_MAX_SIZE characters.
+    """
+    current = version(user_id)
+    if current is None:
+        return None
+    ids = sorted(user_project_ids([user_id])[user_id])
+    claimed: dict[str, Any] = {"v": current, "ids": ids}
+    if ids:
+        base = ids[0]
+        bitmap = bytearray((ids[-1] - base) // 8 + 1)
+        for pk in ids:
+            bitmap[(pk - base) // 8] |= 1 << ((pk - base) % 8)
+        packed = {
+            "v": current,
+            "base": base,
+            "bitmap": base64.urlsafe_b64encode(bitmap).decode(),
+        }
+        if len(json.dumps(packed)) < len(json.dumps(claimed)):
+            claimed = packed
+    if len(json.dumps(claimed)) > settings.PROJECT_MEMBERSHIP_CLAIM_MAX_SIZE:
+        return None
+    return claimed
+
+
+def _claimed_project_ids(token: Any, user_id: int) -> Optional[frozenset[int]]:
+    if not isinstance(token, Token):
+        return None
+    claimed = token.get(CLAIM)
+    if not isinstance(claimed, dict):
+        return None
+    current = version(user_id)
+    if current is None or claimed.get("v") != current:
+        return None
+    if "bitmap" not in claimed:
+        return frozenset(claimed["ids"])
+    bitmap = base64.urlsafe_b64decode(claimed["bitmap"])
+    return frozenset(
+        claimed["base"] + index * 8 + bit
+        for index, byte in enumerate(bitmap)
+        for bit in range(8)
+        if byte & (1 << bit)
+    )
+
+
+def _delete(user_ids: list[int]) -> None:
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+    for user_id in user_ids:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            # No counter, the next one starts from the clock.
+            pass
+
+
+def invalidate(user_ids: Iterable[Optional[int]]) -> None:
+    """
+    Deletes the cached projects of users and bumps their membership version,
+    now and once the transaction commits.
+
+    Doing it again on commit keeps a concurrent request from caching, or
+    putting in a token, the membership of before the change.
+
+    Args:
+        user_ids (Iterable[int]): The ids of the users, None is ignored.
+    """
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if user_ids:
+        _delete(user_ids)
+        transaction.on_commit(lambda: _delete(user_ids))
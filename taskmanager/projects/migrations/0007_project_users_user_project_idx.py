@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes the members of the projects by user, for the scoping of the lists.
+
+    The through table of Project.users is created by Django, its index is
+    added with SQL as it has no model to declare it on.
+    """
+
+    dependencies = [
+        ('projects', '0006_remove_project_project_start_date_lte_end_date_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX project_users_user_project_idx '
+                'ON projects_project_users (user_id, project_id);'
+            ),
+            reverse_sql='DROP INDEX project_users_user_project_idx;',
+        ),
+    ]
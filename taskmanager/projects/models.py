@@ -42,6 +42,18 @@ def validate_end_date(value: datetime) -> None:
         raise ValidationError("End date cannot be in the past.")
 
 
+class ProjectManager(models.Manager):
+    """
+    The manager of the projects that are not deleted.
+
+    A deleted project is hidden at once, and purged in the background, see
+    taskmanager.purge.
+    """
+
+    def get_queryset(self) -> models.QuerySet:
+        return super().get_queryset().filter(deleted_at=None)
+
+
 class Project(models.Model):
     """
     Represents a project in the task manager.
@@ -52,6 +64,7 @@ class Project(models.Model):
         start_date (datetime): The start date of the project.
         end_date (datetime): The end date of the project.
         users (ManyToManyField): The users associated with the project.
+        deleted_at (datetime): When the project was deleted, None if it wasn't.
     """
 
     name = models.CharField(max_length=255)
@@ -67,6 +80,10 @@ class Project(models.Model):
         related_name="owned_projects",
         null=True,
     )
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ProjectManager()
+    all_objects = models.Manager()
 
     def __str__(self) -> str:
         return f"{self.name}"
@@ -75,6 +92,13 @@ class Project(models.Model):
         ordering = ["-start_date"]
         verbose_name = "Project"
         verbose_name_plural = "Projects"
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="project_deleted_at_idx",
+            ),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(start_date__lte=models.F("end_date")),
@@ -0,0 +1,84 @@
+"""
+This module contains the row-level scoping of the projects and of what belongs
+to them.
+
+A user sees the projects they own or are a member of, and the tasks, comments
+and files of these projects. The membership is checked with one correlated
+EXISTS on the through table of `Project.users`, served by its
+(user_id, project_id) index, so that the cost of a list depends on the rows
+of the user and not on the size of the tables.
+
+Classes:
+    ProjectScopedMixin: Scopes the queryset of a viewset to the projects of the user.
+
+Functions:
+    visible_to: Returns the filter of the rows of the projects of a user.
+"""
+
+from typing import Any
+
+from django.db.models import Exists, OuterRef, Q, QuerySet
+
+from .models import Project
+
+
+def visible_to(user: Any, project_field: str = "") -> Q:
+    """
+    Returns the filter of the rows of the projects a user owns or is a member
+    of, and that are not deleted.
+
+    Args:
+        user (User): The user, anonymous users see nothing.
+        project_field (str): The path from the filtered model to its project,
+            e.g. "project" for tasks or "task__project" for comments. Empty
+            for the projects themselves.
+
+    Returns:
+        Q: The filter.
+    """
+    if user is None or not user.is_authenticated:
+        # An empty `in` lookup is resolved without querying the database.
+        return Q(pk__in=[])
+    prefix = f"{project_field}__" if project_field else ""
+    members = Project.users.through.objects.filter(
+        user_id=user.pk, project_id=OuterRef(project_field or "pk")
+    )
+    # The deleted projects are hidden until they are purged.
+    return Q(**{f"{prefix}deleted_at": None}) & (
+        Q(**{f"{prefix}owner": user}) | Exists(members)
+    )
+
+
+class ProjectScopedMixin:
+    """
+    Scopes the queryset of a viewset to the projects of the user.
+
+    The lists only show the rows of the projects of the user, and the other
+    rows are not found by the detail routes.
+
+    Attributes:
+        project_field (str): The path from the model to its project, see visible_to.
+    """
+
+    project_field = ""
+
+    def scope(self, queryset: QuerySet) -> QuerySet:
+        """
+        Scopes a queryset of the model of the viewset to the projects of the user.
+
+        Args:
+            queryset (QuerySet): The queryset.
+
+        Returns:
+            QuerySet: The rows of the projects of the user.
+        """
+        return queryset.filter(visible_to(self.request.user, self.project_field))
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Returns the queryset of the viewset, scoped to the projects of the user.
+
+        Returns:
+            QuerySet: The rows of the projects of the user.
+        """
+        return self.scope(super().get_queryset())
@@ -4,12 +4,35 @@ This module contains the serializer classes for the Project model.
 The ProjectSerializer class is responsible for serializing and deserializing
 Project instances into JSON representations.
 
+Functions:
+    expanded_fields: Returns the relations a request asks to expand.
 """
 
+from typing import Any, Optional
+
 from rest_framework import serializers
 
 from .models import Project
 
+# The relations only rendered on request, they can be arbitrarily large.
+EXPANDABLE_FIELDS = ("tasks", "shared_files")
+
+
+def expanded_fields(request: Optional[Any]) -> set[str]:
+    """
+    Returns the relations a request asks to expand, with ?expand=tasks,shared_files.
+
+    Args:
+        request (Request | HttpRequest, optional): The request.
+
+    Returns:
+        set[str]: The expanded relations.
+    """
+    if request is None:
+        return set()
+    expand = getattr(request, "query_params", request.GET).get("expand", "")
+    return {name for name in expand.split(",") if name in EXPANDABLE_FIELDS}
+
 
 class ProjectSerializer(serializers.HyperlinkedModelSerializer[Project]):
     """
@@ -20,9 +43,17 @@ class ProjectSerializer(serializers.HyperlinkedModelSerializer[Project]):
     included in the serialized output and provides validation for incoming
     data.
 
+    The tasks and files of a project are counted, and listed page by page
+    at tasks_url and files_url. Their full lists are only rendered with
+    ?expand=tasks,shared_files.
+
     Attributes:
         users (UserSerializer): Serializer for the related User model.
         owner (UserSerializer): Serializer for the related owner User model.
+        task_count (int): The number of tasks of the project.
+        file_count (int): The number of files of the project.
+        tasks_url (str): The URL of the tasks of the project.
+        files_url (str): The URL of the files of the project.
 
     Meta:
         model (Project): The model class that this serializer is associated with.
@@ -37,6 +68,10 @@ class ProjectSerializer(serializers.HyperlinkedModelSerializer[Project]):
     owner: serializers.RelatedField | serializers.ManyRelatedField = (
         serializers.HyperlinkedRelatedField(view_name="user-detail", read_only=True)
     )
+    task_count = serializers.SerializerMethodField()
+    file_count = serializers.SerializerMethodField()
+    tasks_url = serializers.HyperlinkedIdentityField(view_name="project-tasks")
+    files_url = serializers.HyperlinkedIdentityField(view_name="project-files")
 
     class Meta:
         """
@@ -53,6 +88,52 @@ class ProjectSerializer(serializers.HyperlinkedModelSerializer[Project]):
             "end_date",
             "users",
             "owner",
+            "task_count",
+            "file_count",
+            "tasks_url",
+            "files_url",
             "tasks",
             "shared_files",
         ]
+
+    def get_fields(self) -> dict[str, serializers.Field]:
+        """
+        Returns the fields of the serializer, without the relations not expanded.
+
+        Returns:
+            dict[str, Field]: The fields by name.
+        """
+        fields = super().get_fields()
+        expanded = expanded_fields(self.context.get("request"))
+        for name in EXPANDABLE_FIELDS:
+            if name not in expanded:
+                del fields[name]
+        return fields
+
+    def get_task_count(self, obj: Project) -> int:
+        """
+        Returns the number of tasks of the project, annotated by the viewset.
+
+        Args:
+            obj (Project): The project.
+
+        Returns:
+            int: The number of tasks.
+        """
+        if hasattr(obj, "task_count"):
+            return obj.task_count
+        return obj.tasks.count()
+
+    def get_file_count(self, obj: Project) -> int:
+        """
+        Returns the number of files of the project, annotated by the viewset.
+
+        Args:
+            obj (Project): The project.
+
+        Returns:
+            int: The number of files.
+        """
+        if hasattr(obj, "file_count"):
+            return obj.file_count
+        return obj.shared_files.count()
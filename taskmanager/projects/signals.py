@@ -0,0 +1,226 @@
+"""
+Signals for the projects app
+
+This module publishes the changes to the tasks, comments and files of a
+project to the change stream of the project, see projects.events.
+
+The events only carry the ids of the changed objects, and the clients
+refetch what they display.
+
+It also invalidates the cached projects of the users whose membership
+changes, see projects.membership.
+
+Functions:
+    publish_task_change: Publishes the creation or the update of a task.
+    publish_task_deletion: Publishes the deletion of a task.
+    publish_comment_change: Publishes the creation or the update of a comment.
+    publish_comment_deletion: Publishes the deletion of a comment.
+    publish_file_change: Publishes the upload or the update of a file.
+    publish_file_deletion: Publishes the deletion of a file.
+    invalidate_member_changes: Invalidates the projects of added or removed members.
+    remember_previous_owner: Keeps the owner of a project before it is saved.
+    invalidate_owner_change: Invalidates the projects of the previous and new owners.
+    invalidate_project_deletion: Invalidates the projects of the owner and the members.
+"""
+
+from typing import Any
+
+from django.db.models import Model, QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from files.models import SharedFile
+from tasks.models import Comment, Task
+
+from . import membership
+from .events import is_muted, publish
+from .models import Project
+
+
+def _cascaded(instance: Model, origin: Any) -> bool:
+    # An object deleted with its task or project is covered by the event of
+    # the task, or by the end of the project. The deletions of a purge aren't
+    # published, and their rows aren't looked up.
+    if is_muted():
+        return True
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, type(instance))
+
+
+def _action(created: bool) -> str:
+    return "created" if created else "updated"
+
+
+@receiver(post_save, sender=Task)
+def publish_task_change(instance: Task, created: bool, **_kwargs) -> None:
+    """
+    Publishes the creation or the update of a task.
+
+    Args:
+        instance (Task): The task.
+        created (bool): Whether the task was created.
+    """
+    publish(
+        instance.project_id,
+        f"task.{_action(created)}",
+        {"id": instance.pk, "status": instance.status},
+    )
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deletion(instance: Task, origin: Any = None, **_kwargs) -> None:
+    """
+    Publishes the deletion of a task.
+
+    Args:
+        instance (Task): The task.
+        origin (Any): The object or queryset the deletion started from.
+    """
+    if not _cascaded(instance, origin):
+        publish(instance.project_id, "task.deleted", {"id": instance.pk})
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_change(instance: Comment, created: bool, **_kwargs) -> None:
+    """
+    Publishes the creation or the update of a comment.
+
+    Args:
+        instance (Comment): The comment.
+        created (bool): Whether the comment was created.
+    """
+    publish(
+        instance.task.project_id,
+        f"comment.{_action(created)}",
+        {"id": instance.pk, "task": instance.task_id},
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_deletion(instance: Comment, origin: Any = None, **_kwargs) -> None:
+    """
+    Publishes the deletion of a comment.
+
+    Args:
+        instance (Comment): The comment.
+        origin (Any): The object or queryset the deletion started from.
+    """
+    if not _cascaded(instance, origin):
+        publish(
+            instance.task.project_id,
+            "comment.deleted",
+            {"id": instance.pk, "task": instance.task_id},
+        )
+
+
+@receiver(post_save, sender=SharedFile)
+def publish_file_change(instance: SharedFile, created: bool, **_kwargs) -> None:
+    """
+    Publishes the upload or the update of a file.
+
+    Args:
+        instance (SharedFile): The file.
+        created (bool): Whether the file was uploaded.
+    """
+    publish(
+        instance.project_id,
+        f"file.{_action(created)}",
+        {"id": instance.pk, "task": instance.task_id},
+    )
+
+
+@receiver(post_delete, sender=SharedFile)
+def publish_file_deletion(instance: SharedFile, origin: Any = None, **_kwargs) -> None:
+    """
+    Publishes the deletion of a file.
+
+    Args:
+        instance (SharedFile): The file.
+        origin (Any): The object or queryset the deletion started from.
+    """
+    if not _cascaded(instance, origin):
+        publish(
+            instance.project_id,
+            "file.deleted",
+            {"id": instance.pk, "task": instance.task_id},
+        )
+
+
+@receiver(m2m_changed, sender=Project.users.through)
+def invalidate_member_changes(
+    instance: Any, action: str, reverse: bool, pk_set: Any, **_kwargs
+) -> None:
+    """
+    Invalidates the projects of the users added to or removed from a project.
+
+    Args:
+        instance (Project | User): The project, or the user for changes made
+            from the projects of a user.
+        action (str): The change, e.g. "post_add".
+        reverse (bool): Whether the change is made from the user.
+        pk_set (set, optional): The pks of the users or of the projects.
+    """
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            membership.invalidate([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        membership.invalidate(pk_set)
+    elif action == "pre_clear":
+        # The members are unknown once cleared.
+        membership.invalidate(instance.users.values_list("pk", flat=True))
+
+
+@receiver(pre_save, sender=Project)
+def remember_previous_owner(
+    instance: Project, update_fields: Any = None, **_kwargs
+) -> None:
+    """
+    Keeps the owner of a project before it is saved.
+
+    Args:
+        instance (Project): The project.
+        update_fields (frozenset, optional): The fields saved, all if None.
+    """
+    if update_fields is not None and "owner" not in update_fields:
+        instance._previous_owner_id = instance.owner_id
+    elif instance.pk is None:
+        instance._previous_owner_id = None
+    else:
+        instance._previous_owner_id = (
+            Project.objects.filter(pk=instance.pk)
+            .values_list("owner", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Project)
+def invalidate_owner_change(instance: Project, **_kwargs) -> None:
+    """
+    Invalidates the projects of the previous and the new owner of a project.
+
+    Args:
+        instance (Project): The project.
+    """
+    previous_owner_id = getattr(instance, "_previous_owner_id", None)
+    if instance.owner_id != previous_owner_id:
+        membership.invalidate([previous_owner_id, instance.owner_id])
+
+
+@receiver(pre_delete, sender=Project)
+def invalidate_project_deletion(instance: Project, **_kwargs) -> None:
+    """
+    Invalidates the projects of the owner and the members of a deleted project.
+
+    The members are deleted with the project, without m2m_changed.
+
+    Args:
+        instance (Project): The project.
+    """
+    membership.invalidate(
+        [instance.owner_id, *instance.users.values_list("pk", flat=True)]
+    )
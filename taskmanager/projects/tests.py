@@ -2,20 +2,38 @@
 Test cases for the projects app.
 
 The ProjectViewSetTestCase class is a test case for the ProjectViewSet class.
-It sets up the test case by creating a user, authenticating the client,
+The ProjectSubResourcesTestCase class is a test case for the task and file pages of a project.
+The ProjectScopingTestCase class is a test case for the scoping of the lists to the projects of the user.
+The ProjectMembershipTestCase class is a test case for the cached projects of the users.
+The ProjectMembershipClaimTestCase class is a test case for the projects claim of the access tokens.
+The ProjectEventsTestCase class is a test case for the event stream of a project.
+The ProjectViewSetTestCase sets up the test case by creating a user, authenticating the client,
 creating a profile, and creating a task.
 
 """
 
+import json
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from django_redis import get_redis_connection
+from files.models import SharedFile
 from rest_framework import status
 from rest_framework.test import APITestCase
-from tasks.models import Task
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from tasks.models import Comment, Task
+from tasks.serializers import TaskSerializer
+from tasks.tasks import purge_deleted_project
 
+from projects import events, membership
 from projects.models import Project
+from taskmanager import purge
 
 User = get_user_model()
 
@@ -194,3 +212,666 @@ class ProjectViewSetTestCase(APITestCase):
         """
         response = self.client.delete(f"/projects/{self.project.pk}/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class ProjectDeletionTestCase(APITestCase):
+    """
+    Test case for the deletion of the projects, hidden at once and purged in
+    the background.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.user,
+        )
+        self.project.users.add(self.member)
+        self.task = Task.objects.create(
+            name="Test Task",
+            creator=self.user,
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            project=self.project,
+        )
+        self.task.assigned.add(self.member)
+        self.comment = Comment.objects.create(
+            task=self.task, creator=self.member, content="Hello @owner"
+        )
+        SharedFile.objects.create(
+            file="shared_files/notes.txt",
+            uploaded_by=self.user,
+            project=self.project,
+            task=self.task,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_deleted_project_is_hidden_at_once(self):
+        """
+        Test that a deleted project and its tasks are hidden before the purge.
+        """
+        with patch("tasks.tasks.purge_deleted_project.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(f"/projects/{self.project.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        delay.assert_called_once_with(self.project.pk)
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(
+            membership.user_project_ids([self.member.pk])[self.member.pk], frozenset()
+        )
+        cache.clear()
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get(f"/tasks/{self.task.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_project_is_purged_in_batches(self):
+        """
+        Test that the purge deletes the project and all its dependents.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/projects/{self.project.pk}/")
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(SharedFile.objects.exists())
+        self.assertFalse(Task.assigned.through.objects.exists())
+        self.assertFalse(Project.users.through.objects.exists())
+        self.assertTrue(User.objects.filter(pk=self.member.pk).exists())
+
+    def test_purge_publishes_nothing(self):
+        """
+        Test that the rows of a purge are deleted without loading their task
+        nor publishing their deletion.
+        """
+        for index in range(3):
+            Comment.objects.create(
+                task=self.task, creator=self.member, content=f"Comment {index}"
+            )
+        with patch("projects.events._add") as add:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f"/projects/{self.project.pk}/")
+        self.assertEqual(
+            [call.args[1] for call in add.call_args_list], ["project.deleted"]
+        )
+        self.assertFalse(Comment.objects.exists())
+
+    def test_purge_deletes_the_leaves_first(self):
+        """
+        Test that the dependents are listed before the rows they depend on.
+        """
+        models = [queryset.model for queryset in purge.dependents(Project, 1)]
+        self.assertLess(models.index(Comment), models.index(Task))
+        self.assertLess(models.index(Task.assigned.through), models.index(Task))
+        self.assertLess(models.index(SharedFile), models.index(Task))
+
+    def test_purge_skips_projects_not_deleted(self):
+        """
+        Test that the purge job leaves a project that isn't marked deleted.
+        """
+        purge_deleted_project(self.project.pk)
+        self.assertTrue(Project.objects.filter(pk=self.project.pk).exists())
+
+
+class ProjectSubResourcesTestCase(APITestCase):
+    """
+    Test case for the counts and the task and file pages of a project.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.user,
+        )
+        for index in range(12):
+            Task.objects.create(
+                name=f"Task {index}",
+                description="Test Description",
+                created_at=timezone.now() + timezone.timedelta(minutes=index),
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=self.user,
+                project=self.project,
+            )
+        SharedFile.objects.create(
+            file="shared_files/notes.txt", uploaded_by=self.user, project=self.project
+        )
+
+    def test_counts_instead_of_links(self):
+        """
+        Test that a project has the counts of its tasks and files, not their links.
+        """
+        response = self.client.get(f"/projects/{self.project.pk}/")
+        self.assertEqual(response.data["task_count"], 12)
+        self.assertEqual(response.data["file_count"], 1)
+        self.assertNotIn("tasks", response.data)
+        self.assertNotIn("shared_files", response.data)
+        self.assertTrue(
+            response.data["tasks_url"].endswith(f"/projects/{self.project.pk}/tasks/")
+        )
+
+    def test_expand(self):
+        """
+        Test that the full lists are rendered on request.
+        """
+        response = self.client.get(
+            f"/projects/{self.project.pk}/", {"expand": "tasks,shared_files"}
+        )
+        self.assertEqual(len(response.data["tasks"]), 12)
+        self.assertEqual(len(response.data["shared_files"]), 1)
+
+    def test_list_queries(self):
+        """
+        Test that listing projects doesn't load their tasks.
+        """
+        # The page count, the page with the counts, and the members.
+        with self.assertNumQueries(3):
+            response = self.client.get("/projects/")
+        self.assertEqual(response.data["results"][0]["task_count"], 12)
+
+    def test_task_pages(self):
+        """
+        Test that the tasks of a project are paged by cursor, newest first.
+        """
+        response = self.client.get(f"/projects/{self.project.pk}/tasks/")
+        names = [task["name"] for task in response.data["results"]]
+        self.assertEqual(names, [f"Task {index}" for index in range(11, 1, -1)])
+        response = self.client.get(response.data["next"])
+        names = [task["name"] for task in response.data["results"]]
+        self.assertEqual(names, ["Task 1", "Task 0"])
+        self.assertIsNone(response.data["next"])
+
+    def test_file_pages(self):
+        """
+        Test that the files of a project are paged.
+        """
+        response = self.client.get(f"/projects/{self.project.pk}/files/")
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+class ProjectScopingTestCase(APITestCase):
+    """
+    Test case for the scoping of the lists to the projects of the user.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.outsider = User.objects.create_user(
+            username="outsider", password="password"
+        )
+        self.projects = []
+        for owner in (self.owner, self.outsider):
+            project = Project.objects.create(
+                name=f"Project of {owner.username}",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                owner=owner,
+            )
+            task = Task.objects.create(
+                name=f"Task of {owner.username}",
+                description="Test Description",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=owner,
+                project=project,
+            )
+            Comment.objects.create(task=task, creator=owner, content="Comment")
+            SharedFile.objects.create(
+                file="shared_files/notes.txt", uploaded_by=owner, project=project
+            )
+            self.projects.append(project)
+        self.projects[0].users.add(self.member)
+
+    def _names(self, url, field="name"):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row[field] for row in response.data["results"]]
+
+    def test_owner_and_member_lists(self):
+        """
+        Test that the owner and the members only list the rows of their projects.
+        """
+        for user in (self.owner, self.member):
+            self.client.force_authenticate(user=user)
+            self.assertEqual(self._names("/projects/"), ["Project of owner"])
+            self.assertEqual(self._names("/tasks/"), ["Task of owner"])
+            self.assertEqual(len(self._names(reverse("comment-list"), "content")), 1)
+            files = self._names(reverse("sharedfile-list"), "project")
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith(f"/projects/{self.projects[0].pk}/"))
+
+    def test_other_projects_not_found(self):
+        """
+        Test that the rows of other projects are not found.
+        """
+        self.client.force_authenticate(user=self.member)
+        project = self.projects[1]
+        task = project.tasks.get()
+        for url in (
+            f"/projects/{project.pk}/",
+            f"/projects/{project.pk}/tasks/",
+            f"/tasks/{task.pk}/",
+            f"/tasks/async/{task.pk}/",
+            reverse("comment-detail", args=[task.comments.get().pk]),
+            reverse("sharedfile-detail", args=[project.shared_files.get().pk]),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, url)
+
+    def test_anonymous_lists_are_empty(self):
+        """
+        Test that anonymous users see no project.
+        """
+        self.assertEqual(self._names("/projects/"), [])
+        response = self.client.get("/tasks/async/")
+        self.assertEqual(json.loads(response.content)["results"], [])
+
+    def test_list_queries(self):
+        """
+        Test that the scoping is a filter of the list query.
+        """
+        self.client.force_authenticate(user=self.member)
+        # The page count and the page of tasks, and their three relations.
+        with self.assertNumQueries(5):
+            self.client.get("/tasks/")
+
+    def test_creator_owns_project(self):
+        """
+        Test that a project is owned by the user creating it.
+        """
+        self.client.force_authenticate(user=self.member)
+        response = self.client.post(
+            "/projects/",
+            {
+                "name": "New Project",
+                "start_date": timezone.now() + timezone.timedelta(days=1),
+                "end_date": timezone.now() + timezone.timedelta(days=2),
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Project.objects.get(name="New Project").owner, self.member)
+        self.assertEqual(len(self._names("/projects/")), 2)
+
+
+class ProjectMembershipTestCase(TestCase):
+    """
+    Test case for the cached projects of the users.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.owner,
+        )
+
+    def _request(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        return request
+
+    def test_memoized_and_cached(self):
+        """
+        Test that the projects of a user are loaded once, then cached.
+        """
+        request = self._request(self.owner)
+        with self.assertNumQueries(1):
+            self.assertTrue(membership.is_member(request, self.project.pk))
+            self.assertTrue(membership.is_member(request, str(self.project.pk)))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                membership.is_member(self._request(self.owner), self.project.pk)
+            )
+        self.assertFalse(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.assertFalse(membership.is_member(self._request(self.owner), None))
+
+    def test_member_changes(self):
+        """
+        Test that adding or removing members invalidates their projects.
+        """
+        self.assertFalse(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.project.users.add(self.member)
+        self.assertTrue(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.member.projects.remove(self.project)
+        self.assertFalse(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.member.projects.add(self.project)
+        self.assertTrue(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.project.users.clear()
+        self.assertFalse(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+
+    def test_owner_change(self):
+        """
+        Test that changing the owner invalidates the projects of both owners.
+        """
+        self.assertFalse(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.project.owner = self.member
+        self.project.save()
+        self.assertTrue(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        self.assertFalse(
+            membership.is_member(self._request(self.owner), self.project.pk)
+        )
+
+    def test_project_deletion(self):
+        """
+        Test that deleting a project invalidates the projects of its members.
+        """
+        self.project.users.add(self.member)
+        self.assertTrue(
+            membership.is_member(self._request(self.member), self.project.pk)
+        )
+        project_id = self.project.pk
+        self.project.delete()
+        self.assertFalse(membership.is_member(self._request(self.member), project_id))
+        self.assertFalse(membership.is_member(self._request(self.owner), project_id))
+
+    def test_assigned_users_checked_at_once(self):
+        """
+        Test that the assigned users of a task are checked with one query.
+        """
+        task = Task.objects.create(
+            name="Test Task",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            creator=self.owner,
+            project=self.project,
+        )
+        others = [
+            User.objects.create_user(username=f"user{index}", password="password")
+            for index in range(3)
+        ]
+        for user in others:
+            self.project.users.add(user)
+        serializer = TaskSerializer(
+            task,
+            data={"assigned": [reverse("user-detail", args=[u.pk]) for u in others]},
+            partial=True,
+        )
+        with self.assertNumQueries(4):
+            # The three assigned users, and the count of the members among them.
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_members_owning_other_projects_count_once(self):
+        """
+        Test that a member owning other projects counts once, and that an
+        outsider isn't counted.
+        """
+        self.project.users.add(self.member)
+        for index in range(2):
+            Project.objects.create(
+                name=f"Other Project {index}",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                owner=self.member,
+            )
+        outsider = User.objects.create_user(username="outsider", password="password")
+        self.assertEqual(
+            membership.count_members(self.project.pk, [self.member.pk, outsider.pk]),
+            1,
+        )
+        self.assertEqual(
+            membership.count_members(self.project.pk, [self.owner.pk, self.member.pk]),
+            2,
+        )
+
+
+class ProjectMembershipClaimTestCase(APITestCase):
+    """
+    Test case for the projects claim of the access tokens.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.projects = [
+            Project.objects.create(
+                name=f"Project {index}",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                owner=self.user,
+            )
+            for index in range(2)
+        ]
+
+    def _access_token(self):
+        response = self.client.post(
+            "/api/token/", {"username": "owner", "password": "password"}
+        )
+        return AccessToken(response.data["access"])
+
+    def _request(self, token):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        request.auth = token
+        return request
+
+    def test_token_claim(self):
+        """
+        Test that the access token lists the projects of the user.
+        """
+        claim = self._access_token()[membership.CLAIM]
+        self.assertEqual(claim["ids"], [project.pk for project in self.projects])
+        self.assertEqual(claim["v"], membership.version(self.user.pk))
+
+    def test_claim_trusted_without_queries(self):
+        """
+        Test that the membership is checked from the claim of a current token.
+        """
+        token = self._access_token()
+        cache.delete(membership._cache_key(self.user.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                membership.is_member(self._request(token), self.projects[0].pk)
+            )
+
+    def test_claim_outdated_by_changes(self):
+        """
+        Test that the claim isn't trusted once the projects of the user change.
+        """
+        token = self._access_token()
+        self.projects[0].owner = None
+        self.projects[0].save()
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                membership.is_member(self._request(token), self.projects[0].pk)
+            )
+
+    def test_refresh_claims_current_projects(self):
+        """
+        Test that a refreshed access token has the current projects.
+        """
+        refresh = RefreshToken.for_user(self.user)
+        self.projects[1].delete()
+        response = self.client.post(
+            "/api-auth/token/refresh/", {"refresh": str(refresh)}
+        )
+        claim = AccessToken(response.data["access"])[membership.CLAIM]
+        self.assertEqual(claim["ids"], [self.projects[0].pk])
+
+    def test_bitmap(self):
+        """
+        Test that many projects are claimed as a bitmap.
+        """
+        for index in range(40):
+            Project.objects.create(
+                name=f"Project {index}",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                owner=self.user,
+            )
+        project_ids = set(self.user.owned_projects.values_list("pk", flat=True))
+        token = self._access_token()
+        self.assertIn("bitmap", token[membership.CLAIM])
+        with self.assertNumQueries(0):
+            self.assertEqual(membership.project_ids(self._request(token)), project_ids)
+
+    @override_settings(PROJECT_MEMBERSHIP_CLAIM_MAX_SIZE=10)
+    def test_claim_size_limit(self):
+        """
+        Test that the claim is left out of the tokens when too long.
+        """
+        self.assertNotIn(membership.CLAIM, self._access_token().payload)
+
+
+class ProjectEventsTestCase(TestCase):
+    """
+    Test case for the event stream of a project.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.user,
+        )
+        get_redis_connection("default").delete(f"{events.KEY_PREFIX}:{self.project.pk}")
+
+    def create_task(self):
+        """
+        Creates a task of the project, publishing its event.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(
+                name="Test Task",
+                description="Test Description",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=self.user,
+                project=self.project,
+            )
+
+    async def read(self, response, count):
+        """
+        Reads chunks of an event stream, then closes it.
+        """
+        stream = response.streaming_content
+        try:
+            return [(await stream.__anext__()).decode() for _ in range(count)]
+        finally:
+            await stream.aclose()
+
+    async def test_authentication(self):
+        """
+        Test that only the members of the project can follow it.
+        """
+        url = reverse("project-events", kwargs={"pk": self.project.pk})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        stranger = await User.objects.acreate(username="stranger")
+        token = RefreshToken.for_user(stranger).access_token
+        response = await self.async_client.get(
+            url, headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        await self.project.users.aadd(stranger)
+        response = await self.async_client.get(
+            url, headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        await self.read(response, 1)
+
+    async def test_resume(self):
+        """
+        Test that a client resuming gets the events after its last event.
+        """
+        task = await sync_to_async(self.create_task)()
+        await sync_to_async(self.client.force_login)(self.user)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(
+            reverse("project-events", kwargs={"pk": self.project.pk}),
+            headers={"Last-Event-ID": "0-0"},
+        )
+        retry, event = await self.read(response, 2)
+        self.assertEqual(retry, "retry: 1000\n\n")
+        event_id, name, data = event.splitlines()[:3]
+        self.assertTrue(event_id.startswith("id: "))
+        self.assertEqual(name, "event: task.created")
+        self.assertEqual(json.loads(data[len("data: ") :])["id"], task.pk)
+
+    async def test_streams_share_the_reader(self):
+        """
+        Test that the streams of a process get the new events from one reader.
+        """
+        streams = [events.event_stream(self.project.pk) for _ in range(2)]
+        try:
+            for stream in streams:
+                await stream.__anext__()
+            reader = events._get_reader()
+            self.assertEqual(
+                len(reader.subscribers[f"{events.KEY_PREFIX}:{self.project.pk}"]), 2
+            )
+            task = await sync_to_async(self.create_task)()
+            for stream in streams:
+                event = await stream.__anext__()
+                self.assertIn("event: task.created", event)
+                self.assertIn(f'"id": {task.pk}', event)
+        finally:
+            for stream in streams:
+                await stream.aclose()
+        self.assertEqual(reader.subscribers, {})
+
+    @override_settings(PROJECT_EVENTS_REPLAY_SIZE=1)
+    async def test_reset_after_missed_events(self):
+        """
+        Test that a client is told to refetch when its events were dropped.
+        """
+        for _ in range(2):
+            await sync_to_async(self.create_task)()
+        await sync_to_async(self.client.force_login)(self.user)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(
+            reverse("project-events", kwargs={"pk": self.project.pk}),
+            {"last_event_id": "1-0"},
+        )
+        _, reset = await self.read(response, 2)
+        self.assertEqual(reset, "id: 1-0\nevent: reset\ndata: {}\n\n")
+
+    def test_cascaded_deletions(self):
+        """
+        Test that deleting a task publishes one event.
+        """
+        task = self.create_task()
+        Comment.objects.create(task=task, creator=self.user, content="Comment")
+        pk = task.pk
+        with patch("projects.signals.publish") as publish:
+            task.delete()
+        publish.assert_called_once_with(self.project.pk, "task.deleted", {"id": pk})
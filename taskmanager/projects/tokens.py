@@ -0,0 +1,69 @@
+"""
+This module contains the JSON Web Tokens carrying the projects of their user.
+
+The access tokens have a `projects` claim with the projects their user owns
+or is a member of, and the membership version of the user when the token was
+issued, see projects.membership. The permission checks trust the claim until
+the projects of the user change. The claim is only added to access tokens, a
+refresh gets the current projects.
+
+Classes:
+    ProjectsRefreshToken: A refresh token issuing access tokens with the projects claim.
+    TokenObtainPairSerializer: Issues a pair of tokens with the projects claim.
+    TokenRefreshSerializer: Refreshes an access token with the projects claim.
+    TokenRefreshView: The token refresh view of dj-rest-auth, with the projects claim.
+"""
+
+from dj_rest_auth.jwt_auth import CookieTokenRefreshSerializer, get_refresh_view
+from django.conf import settings
+from rest_framework_simplejwt import serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import membership
+
+
+class ProjectsRefreshToken(RefreshToken):
+    """
+    A refresh token issuing access tokens with the projects claim.
+    """
+
+    @property
+    def access_token(self) -> AccessToken:
+        """
+        Returns an access token with the claims of the refresh token, and the
+        current projects of the user when PROJECT_MEMBERSHIP_CLAIM is set.
+
+        Returns:
+            AccessToken: The access token.
+        """
+        access = super().access_token
+        if settings.PROJECT_MEMBERSHIP_CLAIM:
+            claim = membership.claim(self[api_settings.USER_ID_CLAIM])
+            if claim is not None:
+                access[membership.CLAIM] = claim
+        return access
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    """
+    Issues a pair of tokens, the access token with the projects claim.
+    """
+
+    token_class = ProjectsRefreshToken
+
+
+class TokenRefreshSerializer(CookieTokenRefreshSerializer):
+    """
+    Refreshes an access token, from the body or the cookie, with the projects claim.
+    """
+
+    token_class = ProjectsRefreshToken
+
+
+class TokenRefreshView(get_refresh_view()):
+    """
+    The token refresh view of dj-rest-auth, with the projects claim.
+    """
+
+    serializer_class = TokenRefreshSerializer
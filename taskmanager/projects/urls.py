@@ -1,17 +1,20 @@
 """
 This module defines the URL patterns for the projects app.
 
-It includes the URL patterns for the projects API endpoints using the Django REST Framework.
+It includes the URL patterns for the projects API endpoints using the Django REST Framework,
+the event stream of a project and the async project detail.
 """
 
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import ProjectViewSet
+from .views import ProjectViewSet, project_detail, project_events
 
 router = DefaultRouter()
 router.register(r"", ProjectViewSet)
 
 urlpatterns = [
+    path("<int:pk>/events/", project_events, name="project-events"),
+    path("<int:pk>/async/", project_detail, name="async-project-detail"),
     path("", include(router.urls)),
 ]
@@ -1,37 +1,256 @@
 """
-This module contains the viewset for managing projects.
+This module contains the views for managing projects.
 
 The ProjectViewSet class is a viewset that provides CRUD operations for the Project model.
+The project_events view streams the changes of a project as server-sent events.
+The project_detail view is an async version of the retrieve action, for the ASGI server.
 
 Attributes:
     queryset (QuerySet): The queryset of all projects.
     serializer_class (Serializer): The serializer class for the Project model.
 """
 
-from rest_framework import viewsets
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from files.models import SharedFile
+from files.serializers import SharedFileSerializer
+from rest_framework import decorators, pagination, viewsets
+from rest_framework.request import Request
+from rest_framework.response import Response
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+from tasks.tasks import purge_deleted_project
+from tasks.views import TASK_PREFETCH
 
+from taskmanager import async_api
+from taskmanager.authentication import aauthenticate
+from taskmanager.purge import mark_project_deleted
+
+from .events import event_stream
 from .models import Project
 from .permissions import IsProjectOwnerOrReadOnly
-from .serializers import ProjectSerializer
+from .scoping import ProjectScopedMixin, visible_to
+from .serializers import ProjectSerializer, expanded_fields
+
+
+def _count(queryset) -> Coalesce:
+    # A correlated count, a join per relation would multiply the rows.
+    counts = (
+        queryset.filter(project=OuterRef("pk"))
+        .order_by()
+        .values("project")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def project_queryset(expanded: set[str]):
+    """
+    Returns the projects with their task and file counts.
+
+    Args:
+        expanded (set[str]): The relations to prefetch, see expanded_fields.
+
+    Returns:
+        QuerySet: The projects.
+    """
+    return (
+        Project.objects.select_related("owner")
+        .prefetch_related("users", *sorted(expanded))
+        .annotate(
+            task_count=_count(Task.objects), file_count=_count(SharedFile.objects)
+        )
+        .order_by("pk")
+    )
+
+
+class ProjectTaskPagination(pagination.CursorPagination):
+    """
+    The pages of the tasks of a project, newest first.
+
+    The (project, created_at, id) index of the tasks serves every page.
+    """
+
+    ordering = ("-created_at", "-id")
+
+
+class ProjectFilePagination(pagination.CursorPagination):
+    """
+    The pages of the files of a project, newest first.
 
+    The (project, uploaded_at, id) index of the files serves every page.
+    """
+
+    ordering = ("-uploaded_at", "-id")
 
-class ProjectViewSet(viewsets.ModelViewSet):
+
+class ProjectViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     """
     A viewset for managing projects.
 
     This viewset provides CRUD operations (Create, Retrieve, Update, Delete)
-    for the Project model.
+    for the Project model, and lists the tasks and files of a project. A user
+    only sees the projects they own or are a member of.
 
     Attributes:
         queryset (QuerySet): The queryset of all projects.
         serializer_class (Serializer): The serializer class for the Project model.
     """
 
-    queryset = (
-        Project.objects.all()
-        .prefetch_related("tasks", "users", "shared_files")
-        .select_related("owner")
-        .order_by("pk")
-    )
+    queryset = Project.objects.all().order_by("pk")
     serializer_class = ProjectSerializer
     permission_classes = [IsProjectOwnerOrReadOnly]
+
+    def get_queryset(self):
+        """
+        Returns the projects of the user with their counts, and the expanded
+        relations.
+
+        Returns:
+            QuerySet: The projects.
+        """
+        return self.scope(project_queryset(expanded_fields(self.request)))
+
+    def perform_create(self, serializer) -> None:
+        """
+        Creates the project, owned by the user.
+
+        Args:
+            serializer (Serializer): The serializer instance.
+        """
+        serializer.save(owner=self.request.user)
+
+    def perform_destroy(self, instance: Project) -> None:
+        """
+        Hides the project, and purges it and its dependents in the background,
+        see taskmanager.purge.
+
+        Args:
+            instance (Project): The project.
+        """
+        mark_project_deleted(instance)
+        transaction.on_commit(lambda: purge_deleted_project.delay(instance.pk))
+
+    def _page(self, request: Request, queryset, paginator, serializer_class):
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @decorators.action(detail=True, methods=["get"])
+    def tasks(self, request: Request, pk=None) -> Response:
+        """
+        Lists the tasks of the project, newest first, by cursor.
+
+        Args:
+            request (Request): The request.
+            pk (int): The pk of the project.
+
+        Returns:
+            Response: A page of tasks.
+        """
+        project = self.get_object()
+        return self._page(
+            request,
+            Task.objects.filter(project=project).prefetch_related(*TASK_PREFETCH),
+            ProjectTaskPagination(),
+            TaskSerializer,
+        )
+
+    @decorators.action(detail=True, methods=["get"])
+    def files(self, request: Request, pk=None) -> Response:
+        """
+        Lists the files of the project, newest first, by cursor.
+
+        Args:
+            request (Request): The request.
+            pk (int): The pk of the project.
+
+        Returns:
+            Response: A page of files.
+        """
+        project = self.get_object()
+        return self._page(
+            request,
+            SharedFile.objects.filter(project=project),
+            ProjectFilePagination(),
+            SharedFileSerializer,
+        )
+
+
+async def project_events(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Streams the changes of a project as server-sent events.
+
+    Only the owner and the members of the project can follow it. The view is
+    async, so an idle stream holds no thread nor database connection and one
+    process serves many clients. A client resuming after a disconnection sends the id of the last
+    event it got in the Last-Event-ID header, or in the `last_event_id`
+    parameter when it can't set headers.
+
+    Args:
+        request (HttpRequest): The request.
+        pk (int): The pk of the project.
+
+    Returns:
+        HttpResponse: The text/event-stream of the project.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    # The connection is released before streaming, an idle stream holds none.
+    async with async_api.database():
+        user = await aauthenticate(request)
+        if user is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."}, status=401
+            )
+        projects = Project.objects.filter(visible_to(user), pk=pk)
+        if not await projects.aexists():
+            return JsonResponse({"detail": "Not found."}, status=404)
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get(
+        "last_event_id"
+    )
+    response = StreamingHttpResponse(
+        event_stream(pk, last_event_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Nginx would buffer the stream otherwise.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def project_detail(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Retrieves a project, as the retrieve action of the ProjectViewSet.
+
+    Args:
+        request (HttpRequest): The request.
+        pk (int): The pk of the project.
+
+    Returns:
+        HttpResponse: The project.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    async with async_api.database():
+        user, error = await async_api.authenticate(request)
+        if error is not None:
+            return error
+        projects = project_queryset(expanded_fields(request)).filter(visible_to(user))
+        try:
+            project = await projects.aget(pk=pk)
+        except Project.DoesNotExist:
+            return async_api.render({"detail": "Not found."}, 404)
+    return async_api.render(
+        ProjectSerializer(project, context={"request": request}).data
+    )
@@ -0,0 +1,154 @@
+"""
+This module contains the helpers of the async read views.
+
+The async views serve the same JSON as the REST API viewsets, with the same
+serializers, authentication, throttling and pagination, but without going
+through DRF's synchronous request cycle. Their querysets load everything the
+serializer reads up front, with the async ORM, so that serializing runs in
+the event loop without querying the database.
+
+Every ORM call of an async request runs in a thread of the request, with a
+database connection of its own. At most ASYNC_DB_CONCURRENCY requests of a
+process use the database at once, the others wait in the event loop, so that
+a burst of requests doesn't exhaust the connections of the database.
+
+Functions:
+    database: Waits for a database slot, and releases the connection after.
+    authenticate: Authenticates and throttles a request.
+    render: Renders data as a JSON response.
+    paginate: Returns a page of a queryset, as the PageNumberPagination of DRF.
+"""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import aauthenticate
+from .db import release_connection
+
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def database() -> AsyncIterator[None]:
+    """
+    Waits for a database slot of the process, and releases the connection after.
+
+    Yields:
+        None
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    async with _semaphores[loop]:
+        try:
+            yield
+        finally:
+            await sync_to_async(release_connection)()
+
+
+def render(data: Any, status: int = 200) -> HttpResponse:
+    """
+    Renders data as a JSON response, as the JSON renderer of the REST API.
+
+    The response varies on the credentials, so that the cache middleware
+    never serves it to another user.
+
+    Args:
+        data (Any): The data.
+        status (int): The status code.
+
+    Returns:
+        HttpResponse: The response.
+    """
+    response = HttpResponse(
+        JSONRenderer().render(data), status=status, content_type="application/json"
+    )
+    patch_vary_headers(response, ("Authorization", "Cookie"))
+    return response
+
+
+def _throttle_wait(request: HttpRequest, user: Optional[Any]) -> Optional[float]:
+    drf_request = Request(request)
+    drf_request.user = user or AnonymousUser()
+    for throttle in (AnonRateThrottle(), UserRateThrottle()):
+        if not throttle.allow_request(drf_request, None):
+            return throttle.wait() or 0
+    return None
+
+
+async def authenticate(
+    request: HttpRequest, required: bool = False
+) -> tuple[Optional[Any], Optional[HttpResponse]]:
+    """
+    Authenticates and throttles a request, as the REST API does.
+
+    Args:
+        request (HttpRequest): The request.
+        required (bool): Whether anonymous requests are rejected.
+
+    Returns:
+        tuple: The user, None if the request is anonymous, and the error
+            response if the request is rejected.
+    """
+    user = await aauthenticate(request)
+    if user is None and required:
+        return None, render(
+            {"detail": "Authentication credentials were not provided."}, 401
+        )
+    wait = await sync_to_async(_throttle_wait)(request, user)
+    if wait is not None:
+        response = render({"detail": "Request was throttled."}, 429)
+        response["Retry-After"] = str(int(wait))
+        return user, response
+    return user, None
+
+
+async def paginate(
+    request: HttpRequest, queryset: QuerySet
+) -> tuple[list[Any], Optional[dict[str, Any]]]:
+    """
+    Returns a page of a queryset, as the PageNumberPagination of DRF.
+
+    Args:
+        request (HttpRequest): The request, with the page number in `page`.
+        queryset (QuerySet): The ordered queryset.
+
+    Returns:
+        tuple: The objects of the page, and the count and links of the page,
+            None if the page doesn't exist.
+    """
+    paginator = Paginator(queryset, settings.REST_FRAMEWORK["PAGE_SIZE"])
+    count = await queryset.acount()
+    # The count is known, the paginator mustn't query it again.
+    paginator.count = count
+    try:
+        page = paginator.page(request.GET.get("page") or 1)
+    except InvalidPage:
+        return [], None
+    objects = [obj async for obj in page.object_list]
+    url = request.build_absolute_uri()
+    links = {"count": count, "next": None, "previous": None}
+    if page.has_next():
+        links["next"] = replace_query_param(url, "page", page.next_page_number())
+    if page.has_previous():
+        previous = page.previous_page_number()
+        links["previous"] = (
+            remove_query_param(url, "page")
+            if previous == 1
+            else replace_query_param(url, "page", previous)
+        )
+    return objects, links
@@ -0,0 +1,42 @@
+"""
+This module contains the authentication of the async views.
+
+DRF views authenticate in the request/response cycle of DRF, which async
+Django views don't go through. `aauthenticate` authenticates a plain Django
+request the way the REST API does: with the JSON Web Token of the
+Authorization header or of the JWT cookie, then with the session.
+
+Functions:
+    aauthenticate: Returns the user of a request, from async code.
+"""
+
+from typing import Any, Optional
+
+from asgiref.sync import sync_to_async
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework.exceptions import APIException
+
+
+def _authenticate(request: Any) -> Optional[Any]:
+    try:
+        authenticated = JWTCookieAuthentication().authenticate(request)
+    except APIException:
+        return None
+    if authenticated is not None:
+        return authenticated[0]
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+async def aauthenticate(request: Any) -> Optional[Any]:
+    """
+    Returns the user of a request, from async code.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        User: The authenticated user, None if the request is not authenticated
+            or its token is invalid.
+    """
+    return await sync_to_async(_authenticate)(request)
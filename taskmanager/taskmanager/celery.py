@@ -4,6 +4,20 @@ Celery configuration file
 This file contains the configuration for the celery app. It is used to run
 background tasks asynchronously.
 
+Jobs are routed to dedicated queues so a burst of one kind of work cannot
+starve the others. Each queue is consumed by its own worker pool, see the
+celery-* services in docker-compose-prod.yaml:
+
+    notifications: push fan-out, I/O bound, many threads and a deep prefetch.
+    scans: the periodic scans and the callbacks of their chords, one job at
+        a time per process.
+    shards: the shards the scans fan out to, on a pool of their own that
+        scales with the number of rows scanned, so that the scans and their
+        callbacks never wait on the pool they are queued on.
+    maintenance: housekeeping jobs, a single process.
+    purges: the purges of the deleted projects and users, so that a long
+        purge never delays the nightly partitions or archive.
+
 Attributes:
 
     app: Celery app instance
@@ -15,6 +29,7 @@ import os
 import environ  # type: ignore
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Queue
 
 env = environ.Env()
 environ.Env.read_env()
@@ -26,14 +41,58 @@ app.autodiscover_tasks()
 
 app.conf.broker_connection_retry_on_startup = True
 
+app.conf.task_default_queue = "default"
+app.conf.task_queues = (
+    Queue("default"),
+    Queue("notifications"),
+    Queue("scans"),
+    Queue("shards"),
+    Queue("maintenance"),
+    Queue("purges"),
+)
+app.conf.task_routes = {
+    "tasks.tasks.send_notification": {"queue": "notifications"},
+    "tasks.tasks.send_mention_digest": {"queue": "notifications"},
+    "tasks.tasks.send_due_date_notifications": {"queue": "scans"},
+    "tasks.tasks.task_send_fcm_notifications": {"queue": "scans"},
+    "tasks.tasks.send_due_date_notifications_shard": {"queue": "shards"},
+    "tasks.tasks.send_new_task_notifications_shard": {"queue": "shards"},
+    "tasks.tasks.aggregate_notification_counts": {"queue": "scans"},
+    "tasks.tasks.archive_completed_tasks": {"queue": "maintenance"},
+    "tasks.tasks.create_future_partitions": {"queue": "maintenance"},
+    "tasks.tasks.purge_deleted_project": {"queue": "purges"},
+    "tasks.tasks.purge_deleted_user": {"queue": "purges"},
+    "tasks.tasks.purge_deleted": {"queue": "purges"},
+    "tasks.tasks.collect_storage_garbage": {"queue": "maintenance"},
+    "celery.backend_cleanup": {"queue": "maintenance"},
+}
+
 
 app.conf.beat_schedule = {
     "send_assigned_task_notifications": {
         "task": "tasks.tasks.task_send_fcm_notifications",
-        "schedule": crontab(minute="0", hour="0"),
+        # Incremental, only the tasks in the outbox are notified.
+        "schedule": crontab(),
     },
     "send_due_date_notifications": {
         "task": "tasks.tasks.send_due_date_notifications",
         "schedule": crontab(minute="7", hour="23"),
     },
+    "archive_completed_tasks": {
+        "task": "tasks.tasks.archive_completed_tasks",
+        "schedule": crontab(minute="37", hour="3"),
+    },
+    "create_future_partitions": {
+        "task": "tasks.tasks.create_future_partitions",
+        "schedule": crontab(minute="17", hour="2"),
+    },
+    "purge_deleted": {
+        "task": "tasks.tasks.purge_deleted",
+        # Only picks up the purges that didn't complete.
+        "schedule": crontab(minute="47"),
+    },
+    "collect_storage_garbage": {
+        "task": "tasks.tasks.collect_storage_garbage",
+        "schedule": crontab(minute="27", hour="4"),
+    },
 }
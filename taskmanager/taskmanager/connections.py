@@ -0,0 +1,184 @@
+"""
+This module contains the keyset paginated Relay connections of the GraphQL schema.
+
+Offset pagination scans and discards every skipped row, and a query without a
+limit returns a whole table. The connections in this module are bounded by
+`first` and continue `after` a cursor holding the ordering values of the last
+row, so every page is one index range scan whatever its position.
+
+Classes:
+    CountableConnection: A Relay connection with an optional total count.
+
+Functions:
+    encode_cursor: Encodes the ordering values of an object into a cursor.
+    decode_cursor: Decodes a cursor into the ordering values it holds.
+    paginate: Resolves one page of a queryset into a connection.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Optional, Sequence
+
+import graphene
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q, QuerySet
+from graphene import relay
+from graphql import GraphQLError
+
+
+class CountableConnection(relay.Connection):
+    """
+    A Relay connection with an optional total count.
+
+    The count runs a separate query, so it only runs when totalCount is
+    selected.
+
+    Attributes:
+        total_count: The number of objects matching the filters.
+    """
+
+    class Meta:
+        """
+        Metadata options for the `CountableConnection` class.
+
+        Attributes:
+            abstract: The connection is only a base for the connections of the types.
+        """
+
+        abstract = True
+
+    total_count = graphene.Int(
+        description="The number of objects matching the filters."
+    )
+
+    def resolve_total_count(self, _):
+        """
+        Resolves the total count of the connection.
+
+        Args:
+            _ (Any): Placeholder argument.
+
+        Returns:
+            int: The number of objects matching the filters.
+        """
+        return self.iterable.count()
+
+
+def _field_name(model: type[Model], name: str) -> str:
+    name = name.lstrip("-")
+    return model._meta.pk.name if name == "pk" else name
+
+
+def encode_cursor(obj: Model, ordering: Sequence[str]) -> str:
+    """
+    Encodes the ordering values of an object into a cursor.
+
+    Args:
+        obj (Model): The object.
+        ordering (Sequence[str]): The fields the connection is ordered by.
+
+    Returns:
+        str: The cursor.
+    """
+    values = [getattr(obj, _field_name(type(obj), name)) for name in ordering]
+    return base64.urlsafe_b64encode(
+        json.dumps(values, cls=DjangoJSONEncoder).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str, model: type[Model], ordering: Sequence[str]) -> list:
+    """
+    Decodes a cursor into the ordering values it holds.
+
+    Args:
+        cursor (str): The cursor.
+        model (type[Model]): The model of the connection.
+        ordering (Sequence[str]): The fields the connection is ordered by.
+
+    Returns:
+        list: The ordering values.
+
+    Raises:
+        GraphQLError: If the cursor is not a cursor of the connection.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError(cursor)
+        return [
+            model._meta.get_field(_field_name(model, name)).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except (ValueError, TypeError, binascii.Error, ValidationError) as e:
+        raise GraphQLError("Invalid cursor") from e
+
+
+def _after(ordering: Sequence[str], values: list) -> Q:
+    # (a, b) > (x, y) is a > x OR (a = x AND b > y), per ordering direction.
+    condition = Q()
+    equal: dict[str, Any] = {}
+    for name, value in zip(ordering, values):
+        field = name.lstrip("-")
+        lookup = "lt" if name.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{field}__{lookup}": value})
+        equal[field] = value
+    return condition
+
+
+def paginate(
+    queryset: QuerySet,
+    connection_type: type[CountableConnection],
+    ordering: Sequence[str],
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+) -> CountableConnection:
+    """
+    Resolves one page of a queryset into a connection.
+
+    The ordering must end with a unique field, usually pk, so that cursors
+    are unambiguous.
+
+    Args:
+        queryset (QuerySet): The filtered queryset.
+        connection_type (type[CountableConnection]): The connection to resolve into.
+        ordering (Sequence[str]): The fields the connection is ordered by.
+        first (int, optional): The size of the page, GRAPHQL_PAGE_SIZE by default.
+        after (str, optional): The cursor of the object the page starts after.
+
+    Returns:
+        CountableConnection: The page.
+
+    Raises:
+        GraphQLError: If first is out of range or after is not a valid cursor.
+    """
+    if first is None:
+        first = settings.GRAPHQL_PAGE_SIZE
+    if not 0 <= first <= settings.GRAPHQL_MAX_PAGE_SIZE:
+        raise GraphQLError(
+            f"first must be between 0 and {settings.GRAPHQL_MAX_PAGE_SIZE}"
+        )
+    page = queryset.order_by(*ordering)
+    if after is not None:
+        page = page.filter(
+            _after(ordering, decode_cursor(after, queryset.model, ordering))
+        )
+    # One more row than requested tells whether there is a next page.
+    rows = list(page[: first + 1])
+    edges = [
+        connection_type.Edge(node=obj, cursor=encode_cursor(obj, ordering))
+        for obj in rows[:first]
+    ]
+    connection = connection_type(
+        edges=edges,
+        page_info=relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_next_page=len(rows) > first,
+            has_previous_page=after is not None,
+        ),
+    )
+    connection.iterable = queryset
+    return connection
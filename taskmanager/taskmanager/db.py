@@ -0,0 +1,49 @@
+"""
+Database helpers shared by the apps.
+
+Functions:
+    statement_timeout: Bounds the run time of every statement in a block.
+    release_connection: Closes the database connection of the thread.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import connection
+
+
+@contextmanager
+def statement_timeout(milliseconds: int) -> Iterator[None]:
+    """
+    Bounds the run time of every statement executed in the block.
+
+    A statement running longer is cancelled by Postgres and raises an
+    OperationalError. Other databases are not bounded.
+
+    Args:
+        milliseconds (int): The timeout of a statement, 0 for none.
+
+    Yields:
+        None
+    """
+    if not milliseconds or connection.vendor != "postgresql":
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SET statement_timeout = %s", [milliseconds])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("RESET statement_timeout")
+
+
+def release_connection() -> None:
+    """
+    Closes the database connection of the thread, unless a transaction is open.
+
+    The ORM calls of an async request run in a thread of the request, with a
+    connection that is otherwise only closed once the response is sent.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
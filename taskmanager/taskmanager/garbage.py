@@ -0,0 +1,162 @@
+"""
+This module contains the garbage collector of the storage.
+
+The files of the profile pictures and of the shared files outlive their rows:
+the rows are deleted by querysets and cascades, which don't touch the
+storage, and a replaced picture stays behind. Deleting the files in the
+request made every delete depend on the filesystem. The files are now left
+to the collector, which walks the upload directories of the file fields and
+deletes the files no row refers to.
+
+The names referred to are loaded into a set, STORAGE_GC_BATCH_SIZE rows at a
+time. The files younger than STORAGE_GC_MIN_AGE seconds are kept, as their
+row may not be committed yet, and the orphans are checked against the
+database again, a chunk at a time, right before they are deleted.
+
+Functions:
+    file_fields: Returns the file fields of the models.
+    referenced_names: Returns the names of the files the rows refer to.
+    collect_garbage: Deletes the files of the storage no row refers to.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Any, Iterator, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import FileField, Model
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def file_fields() -> list[tuple[type[Model], FileField]]:
+    """
+    Returns the file fields of the models, e.g. the image of the profiles.
+
+    Returns:
+        list[tuple[type[Model], FileField]]: The models and their file fields.
+    """
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, FileField)
+    ]
+
+
+def referenced_names(batch_size: Optional[int] = None) -> set[str]:
+    """
+    Returns the names of the files the rows refer to.
+
+    Args:
+        batch_size (int, optional): The number of rows loaded at a time,
+            STORAGE_GC_BATCH_SIZE by default.
+
+    Returns:
+        set[str]: The names of the files, relative to their storage.
+    """
+    batch_size = batch_size or settings.STORAGE_GC_BATCH_SIZE
+    names: set[str] = set()
+    for model, field in file_fields():
+        queryset = (
+            model._base_manager.exclude(**{field.attname: ""})
+            .order_by()
+            .values_list(field.attname, flat=True)
+        )
+        names.update(queryset.iterator(chunk_size=batch_size))
+    return names
+
+
+def _directories() -> set[tuple[Any, str]]:
+    # The upload directories of the file fields, the files of the fields
+    # uploaded to a callable path can't be found.
+    return {
+        (field.storage, field.upload_to.strip("/"))
+        for _model, field in file_fields()
+        if isinstance(field.upload_to, str) and field.upload_to.strip("/")
+    }
+
+
+def _walk(storage: Any, directory: str) -> Iterator[str]:
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f"{directory}/{name}"
+    for name in directories:
+        yield from _walk(storage, f"{directory}/{name}")
+
+
+def _chunks(names: Iterator[str], size: int) -> Iterator[list[str]]:
+    chunk: list[str] = []
+    for name in names:
+        chunk.append(name)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _still_referenced(names: list[str]) -> set[str]:
+    referenced: set[str] = set()
+    for model, field in file_fields():
+        referenced.update(
+            model._base_manager.filter(**{f"{field.attname}__in": names})
+            .order_by()
+            .values_list(field.attname, flat=True)
+        )
+    return referenced
+
+
+def collect_garbage(
+    dry_run: bool = False,
+    batch_size: Optional[int] = None,
+    min_age: Optional[int] = None,
+) -> tuple[int, int]:
+    """
+    Deletes the files of the upload directories no row refers to.
+
+    Args:
+        dry_run (bool): Only count the orphaned files, without deleting them.
+        batch_size (int, optional): The number of rows loaded, and of files
+            checked, at a time, STORAGE_GC_BATCH_SIZE by default.
+        min_age (int, optional): The files modified less than this many
+            seconds ago are kept, STORAGE_GC_MIN_AGE by default.
+
+    Returns:
+        tuple[int, int]: The number of orphaned files and their size in bytes.
+    """
+    batch_size = batch_size or settings.STORAGE_GC_BATCH_SIZE
+    if min_age is None:
+        min_age = settings.STORAGE_GC_MIN_AGE
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    referenced = referenced_names(batch_size)
+    files = reclaimed = 0
+    for storage, directory in sorted(_directories(), key=lambda item: item[1]):
+        orphans = (name for name in _walk(storage, directory) if name not in referenced)
+        for chunk in _chunks(orphans, batch_size):
+            # The rows created since the names were loaded.
+            kept = _still_referenced(chunk)
+            for name in chunk:
+                try:
+                    if name in kept or storage.get_modified_time(name) > cutoff:
+                        continue
+                    size = storage.size(name)
+                except FileNotFoundError:
+                    # Deleted by another run.
+                    continue
+                if not dry_run:
+                    storage.delete(name)
+                files += 1
+                reclaimed += size
+    logger.info(
+        "%s %s orphaned files, %s bytes",
+        "Found" if dry_run else "Deleted",
+        files,
+        reclaimed,
+    )
+    return files, reclaimed
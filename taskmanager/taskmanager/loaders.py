@@ -0,0 +1,190 @@
+"""
+This module contains the identity map of a request.
+
+The identity map keeps the objects loaded by primary key during a request,
+so that an object resolved several times, by the operations of a batched
+GraphQL request, by the fields of one operation, or by the permissions, the
+serializer and the view of a REST request, is fetched once. Missing objects
+are loaded together, with one query per model.
+
+The map lives on the request and is discarded with it: it is never shared
+between users or requests. It counts its hits and misses, shown by the
+identity map panel of the debug toolbar, see taskmanager.panels.
+
+Classes:
+    IdentityMap: The objects of a request by model and primary key.
+    IdentityMapPrimaryKeyRelatedField: A primary key field resolved by the identity map.
+    IdentityMapHyperlinkedRelatedField: A hyperlinked field resolved by the identity map.
+
+Functions:
+    identity_map: Returns the identity map of a request.
+"""
+
+from typing import Any, Iterable
+
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db.models import Model, QuerySet
+from rest_framework import serializers
+
+
+class IdentityMap:
+    """
+    The objects of a request by model and primary key.
+
+    Attributes:
+        objects (dict): The objects by model and primary key.
+        hits (int): The number of objects returned from the map.
+        misses (int): The number of objects looked up in the database.
+
+    Methods:
+        add: Adds loaded objects to the map.
+        get_many: Returns objects by primary key, loading the missing ones.
+        get: Returns an object by primary key.
+    """
+
+    def __init__(self):
+        self.objects: dict[tuple[type[Model], Any], Model] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, *instances: Model) -> None:
+        """
+        Adds loaded objects to the map.
+
+        Args:
+            *instances (Model): The objects.
+        """
+        for instance in instances:
+            if instance.pk is not None:
+                self.objects[(instance._meta.concrete_model, instance.pk)] = instance
+
+    def get_many(self, model: type[Model], pks: Iterable[Any]) -> dict[Any, Model]:
+        """
+        Returns objects by primary key, loading the missing ones in one query.
+
+        Args:
+            model (type[Model]): The model of the objects.
+            pks (Iterable): The primary keys.
+
+        Returns:
+            dict: The objects by primary key, without the ones that don't exist.
+        """
+        model = model._meta.concrete_model
+        # The primary keys of URLs and request bodies are strings.
+        pks = {model._meta.pk.to_python(pk) for pk in pks}
+        missing = [pk for pk in pks if (model, pk) not in self.objects]
+        self.hits += len(pks) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            self.add(*model._default_manager.filter(pk__in=missing))
+        return {
+            pk: self.objects[(model, pk)] for pk in pks if (model, pk) in self.objects
+        }
+
+    def get(self, model: type[Model], pk: Any) -> Model:
+        """
+        Returns an object by primary key.
+
+        Args:
+            model (type[Model]): The model of the object.
+            pk (Any): The primary key.
+
+        Returns:
+            Model: The object.
+
+        Raises:
+            DoesNotExist: If there is no object with this primary key.
+            ValidationError: If the primary key is not valid.
+        """
+        pk = model._meta.pk.to_python(pk)
+        instance = self.get_many(model, [pk]).get(pk)
+        if instance is None:
+            raise model.DoesNotExist(f"{model.__name__} {pk} does not exist.")
+        return instance
+
+
+def identity_map(request: Any) -> IdentityMap:
+    """
+    Returns the identity map of a request, creating it on first use.
+
+    The map of a REST request starts with its authenticated user.
+
+    Args:
+        request (Any): The request, or the context of a GraphQL operation.
+
+    Returns:
+        IdentityMap: The identity map of the request.
+    """
+    # The Django request outlives the DRF request wrapping it.
+    django_request = getattr(request, "_request", request)
+    if getattr(django_request, "identity_map", None) is None:
+        django_request.identity_map = IdentityMap()
+        if request is not django_request and request.user.is_authenticated:
+            django_request.identity_map.add(request.user)
+    return django_request.identity_map
+
+
+def _mapped(field: serializers.RelatedField) -> bool:
+    # Only the querysets of the default manager the map loads with, a
+    # filtered one may exclude the object.
+    queryset = field.get_queryset()
+    return (
+        field.context.get("request") is not None
+        and isinstance(queryset, QuerySet)
+        and queryset.query.where == queryset.model._default_manager.all().query.where
+    )
+
+
+def _get(field: serializers.RelatedField, pk: Any) -> Model:
+    return identity_map(field.context["request"]).get(field.get_queryset().model, pk)
+
+
+class IdentityMapPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    A primary key field resolving its object by the identity map of the request.
+    """
+
+    def to_internal_value(self, data: Any) -> Model:
+        """
+        Returns the object of a primary key.
+
+        Args:
+            data (Any): The primary key.
+
+        Returns:
+            Model: The object.
+        """
+        if self.pk_field is not None or not _mapped(self):
+            return super().to_internal_value(data)
+        try:
+            return _get(self, data)
+        except ObjectDoesNotExist:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError, ValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class IdentityMapHyperlinkedRelatedField(serializers.HyperlinkedRelatedField):
+    """
+    A hyperlinked field resolving its object by the identity map of the request.
+    """
+
+    def get_object(self, view_name: str, view_args: Any, view_kwargs: Any) -> Model:
+        """
+        Returns the object of a URL.
+
+        Args:
+            view_name (str): The name of the view of the URL.
+            view_args (list): The positional arguments of the URL.
+            view_kwargs (dict): The keyword arguments of the URL.
+
+        Returns:
+            Model: The object.
+        """
+        if self.lookup_field != "pk" or not _mapped(self):
+            return super().get_object(view_name, view_args, view_kwargs)
+        try:
+            return _get(self, view_kwargs[self.lookup_url_kwarg])
+        except ValidationError as exc:
+            # Reported as an invalid hyperlink.
+            raise ValueError(exc) from exc
@@ -0,0 +1,146 @@
+"""
+Distributed locks for the periodic Celery jobs.
+
+Several beat and worker nodes run in production, so a periodic job can be
+started twice: by a duplicated beat, or by a retry. The helpers in this module
+make such a second run return cheaply, before it does any work.
+
+Functions:
+    lease_lock: Holds a Redis lease lock, renewing it while the holder runs.
+    claim_run: Claims a run id so the same run is only ever executed once.
+    release_run: Releases a claimed run id so the run can be retried.
+    exclusive: Decorator combining the two for a periodic job.
+"""
+
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+KEY_PREFIX = "taskmanager:locks"
+
+logger = logging.getLogger(__name__)
+
+
+def _renew_lease(lock: Any, ttl: float, stop: threading.Event) -> None:
+    while not stop.wait(ttl / 3):
+        try:
+            lock.reacquire()
+        except LockError:
+            logger.warning("Lost the lease of %s", lock.name)
+            return
+
+
+@contextmanager
+def lease_lock(name: str, ttl: float) -> Iterator[bool]:
+    """
+    Holds a Redis lease lock for the duration of the block.
+
+    The lease expires after ttl seconds if the holder dies, and is renewed
+    every ttl / 3 seconds while the holder is alive, so long runs keep it.
+
+    Args:
+        name (str): The name of the lock.
+        ttl (float): The lease time in seconds.
+
+    Yields:
+        bool: True if the lock was acquired, False if another holder has it.
+    """
+    connection = get_redis_connection("default")
+    # The lease is renewed from another thread, so the token can't be thread local.
+    lock = connection.lock(f"{KEY_PREFIX}:{name}", timeout=ttl, thread_local=False)
+    if not lock.acquire(blocking=False):
+        yield False
+        return
+    stop = threading.Event()
+    renewer = threading.Thread(target=_renew_lease, args=(lock, ttl, stop), daemon=True)
+    renewer.start()
+    try:
+        yield True
+    finally:
+        stop.set()
+        renewer.join()
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("The lease of %s expired before it was released", name)
+
+
+def claim_run(name: str, run_id: str, ttl: int) -> bool:
+    """
+    Claims a run of a job.
+
+    Args:
+        name (str): The name of the job.
+        run_id (str): The id of the run, e.g. the date the run is for.
+        ttl (int): How long the claim is remembered, in seconds.
+
+    Returns:
+        bool: True if the run was claimed, False if it was claimed before.
+    """
+    connection = get_redis_connection("default")
+    return bool(
+        connection.set(f"{KEY_PREFIX}:{name}:runs:{run_id}", 1, nx=True, ex=ttl)
+    )
+
+
+def release_run(name: str, run_id: str) -> None:
+    """
+    Releases the claim of a run of a job, so that the run can be retried.
+
+    Args:
+        name (str): The name of the job.
+        run_id (str): The id of the run.
+    """
+    get_redis_connection("default").delete(f"{KEY_PREFIX}:{name}:runs:{run_id}")
+
+
+def exclusive(
+    name: str,
+    ttl: float,
+    run_id: Optional[Callable[[], str]] = None,
+    run_ttl: int = 60 * 60 * 24 * 2,
+) -> Callable:
+    """
+    Decorator that skips a job while another run of it holds its lock.
+
+    If run_id is given, a run id that already completed (or is in progress)
+    is skipped as well. A run that raises releases its run id, so a retry of
+    it is executed.
+
+    Args:
+        name (str): The name of the job.
+        ttl (float): The lease time of the lock in seconds.
+        run_id (Callable[[], str], optional): Returns the id of the current run.
+        run_ttl (int): How long a completed run id is remembered, in seconds.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with lease_lock(name, ttl) as acquired:
+                if not acquired:
+                    logger.info("Skipping %s, another run holds the lock", name)
+                    return None
+                if run_id is None:
+                    return func(*args, **kwargs)
+                current_run = run_id()
+                if not claim_run(name, current_run, run_ttl):
+                    logger.info("Skipping %s, run %s already ran", name, current_run)
+                    return None
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    release_run(name, current_run)
+                    raise
+
+        return wrapper
+
+    return decorator
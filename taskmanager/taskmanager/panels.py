@@ -0,0 +1,76 @@
+"""
+This module contains the panels of the debug toolbar.
+
+Classes:
+    IdentityMapPanel: Shows the hit rate of the identity map of the request.
+"""
+
+from collections import Counter
+
+from debug_toolbar.panels import Panel
+from django.http import HttpRequest, HttpResponse
+from django.utils.html import format_html, format_html_join
+
+from .loaders import IdentityMap
+
+
+class IdentityMapPanel(Panel):
+    """
+    Shows the hit rate of the identity map of the request, and the objects it
+    holds by model, see taskmanager.loaders.
+    """
+
+    title = "Identity map"
+
+    @property
+    def nav_subtitle(self) -> str:
+        """
+        Returns the hits and misses of the request.
+
+        Returns:
+            str: The subtitle of the panel.
+        """
+        stats = self.get_stats()
+        if not stats:
+            return ""
+        return f"{stats['hits']} hits, {stats['misses']} misses"
+
+    @property
+    def content(self) -> str:
+        """
+        Returns the hit rate and the objects by model.
+
+        Returns:
+            str: The HTML content of the panel.
+        """
+        stats = self.get_stats()
+        lookups = stats["hits"] + stats["misses"]
+        rate = f"{stats['hits'] / lookups:.0%}" if lookups else "-"
+        return format_html(
+            "<p>Hit rate: {} ({} hits, {} misses)</p>"
+            "<table><thead><tr><th>Model</th><th>Objects</th></tr></thead>"
+            "<tbody>{}</tbody></table>",
+            rate,
+            stats["hits"],
+            stats["misses"],
+            format_html_join("", "<tr><td>{}</td><td>{}</td></tr>", stats["objects"]),
+        )
+
+    def generate_stats(self, request: HttpRequest, response: HttpResponse) -> None:
+        """
+        Records the hits, the misses and the objects of the identity map.
+
+        Args:
+            request (HttpRequest): The request.
+            response (HttpResponse): The response.
+        """
+        # The requests that looked nothing up have no map.
+        identity_map = getattr(request, "identity_map", None) or IdentityMap()
+        objects = Counter(model._meta.label for model, _pk in identity_map.objects)
+        self.record_stats(
+            {
+                "hits": identity_map.hits,
+                "misses": identity_map.misses,
+                "objects": sorted(objects.items()),
+            }
+        )
@@ -0,0 +1,510 @@
+"""
+Range partitioning of the largest tables by month.
+
+The tasks and the comments are partitioned by the month of their
+`created_at`, see the migrations of the tasks app. A query that filters on
+`created_at` only reads the partitions of its range, each partition is
+vacuumed and indexed on its own, and the partitions of the old months are
+detached from their table without touching their rows.
+
+Postgres requires the primary key of a partitioned table to contain its
+partition key, so the key of these tables is (id, created_at). Django keeps
+using `id`, which stays unique as every id is drawn from one sequence. Other
+tables can't reference a partitioned table by `id` alone: the foreign keys to
+the tasks and the comments are enforced by Django only (`db_constraint=False`),
+and the rows referring to a detached partition are moved with it, in batches.
+
+A table is partitioned in place: it becomes the first partition of the new
+table, up to the next month, so that its rows are not copied. A default
+partition takes the rows of no other partition, e.g. a task restored from the
+archive into a detached month. The partitions of the next
+PARTITION_MONTHS_AHEAD months are created ahead of time by the
+`create_future_partitions` job.
+
+Classes:
+    PartitionByRange: Migration operation that partitions a table by month.
+
+Functions:
+    partitioned_tables: Returns the partitioned tables of the database.
+    partitions: Returns the partitions of a table, with their bounds.
+    create_partitions: Creates the partitions of the next months of a table.
+    detach_partitions: Detaches the partitions of a table before a date.
+    partition_table: Partitions a table by month, keeping its rows in place.
+    unpartition_table: Copies the rows of a partitioned table back into a plain table.
+"""
+
+import re
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import Any, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.migrations.operations.base import Operation
+from django.db.models import CASCADE, FileField, QuerySet
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+Partition = tuple[str, Optional[datetime], Optional[datetime]]
+
+_BOUNDS = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def _quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _month(value: datetime) -> datetime:
+    return value.astimezone(dt_timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return parse_datetime(value.strip("'"))
+
+
+def partitioned_tables() -> list[str]:
+    """
+    Returns the partitioned tables of the database.
+
+    Returns:
+        list[str]: The names of the tables.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'p' AND pg_table_is_visible(oid) ORDER BY relname"
+        )
+        return [name for (name,) in cursor.fetchall()]
+
+
+def partitions(table: str) -> list[Partition]:
+    """
+    Returns the partitions of a table, with their bounds.
+
+    Args:
+        table (str): The name of the partitioned table.
+
+    Returns:
+        list[tuple]: The name, the first date and the end date of each
+            partition, the dates of an unbounded side are None, and both are
+            None for the default partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.oid = %s::regclass ORDER BY child.relname",
+            [table],
+        )
+        rows = cursor.fetchall()
+    result = []
+    for name, bound in rows:
+        match = _BOUNDS.search(bound)
+        if match is None:
+            result.append((name, None, None))
+        else:
+            result.append((name, _bound(match[1]), _bound(match[2])))
+    return result
+
+
+def create_partitions(
+    table: str, months: Optional[int] = None, now: Optional[datetime] = None
+) -> list[str]:
+    """
+    Creates the monthly partitions of a table up to a number of months ahead.
+
+    The partitions start after the last bounded one, the months already
+    covered are skipped. Creating a partition scans the default partition,
+    which only holds the rows of detached months.
+
+    Args:
+        table (str): The name of the partitioned table.
+        months (int, optional): The number of months after the current one,
+            PARTITION_MONTHS_AHEAD by default.
+        now (datetime, optional): The current date.
+
+    Returns:
+        list[str]: The names of the created partitions.
+    """
+    if months is None:
+        months = settings.PARTITION_MONTHS_AHEAD
+    current = _month(now or timezone.now())
+    ends = [end for _name, _start, end in partitions(table) if end is not None]
+    start = max([current, *ends])
+    created = []
+    with connection.cursor() as cursor:
+        while start < _add_months(current, months + 1):
+            end = _add_months(start, 1)
+            name = f"{table}_p{start:%Y%m}"
+            cursor.execute(
+                f"CREATE TABLE {_quote(name)} PARTITION OF {_quote(table)} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            created.append(name)
+            start = end
+    return created
+
+
+def _model(table: str) -> Any:
+    return next(
+        model
+        for model in apps.get_models(include_auto_created=True)
+        if model._meta.db_table == table
+    )
+
+
+def _dependents(model: Any, lookup: str, path: tuple) -> list[tuple[Any, str]]:
+    # The models deleted with the rows of a model, and their lookup to its
+    # pk, leaves first.
+    dependents: list[tuple[Any, str]] = []
+    for relation in get_candidate_relations_to_delete(model._meta):
+        related = relation.related_model
+        if relation.on_delete is not CASCADE or related in path:
+            continue
+        related_lookup = f"{relation.field.name}__{lookup}"
+        dependents += _dependents(related, related_lookup, (*path, related))
+        dependents.append((related, related_lookup))
+    return dependents
+
+
+def _dependent_rows(table: str, name: str) -> list[QuerySet]:
+    # The rows of the other tables that refer to the rows of a partition,
+    # leaves first.
+    model = _model(table)
+    pks = RawSQL(f"SELECT {_quote(model._meta.pk.column)} FROM {_quote(name)}", ())
+    return [
+        related._base_manager.filter(**{f"{lookup}__in": pks})
+        for related, lookup in _dependents(model, "pk", (model,))
+    ]
+
+
+def _move(cursor: Any, queryset: QuerySet, name: str) -> None:
+    # Moves the rows into a table named after the detached partition.
+    table = queryset.model._meta.db_table
+    moved = _quote(f"{name}_{table}")
+    sql, params = queryset.values("pk").query.sql_with_params()
+    pk = _quote(queryset.model._meta.pk.column)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {moved} (LIKE {_quote(table)})")
+    cursor.execute(
+        f"INSERT INTO {moved} SELECT * FROM {_quote(table)} WHERE {pk} IN ({sql})",
+        params,
+    )
+    cursor.execute(f"DELETE FROM {_quote(table)} WHERE {pk} IN ({sql})", params)
+
+
+def _move_in_batches(queryset: QuerySet, name: str, batch_size: int) -> None:
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            pks = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+            if pks:
+                _move(cursor, queryset.model._base_manager.filter(pk__in=pks), name)
+        if len(pks) < batch_size:
+            return
+
+
+def _has_files(model: Any) -> bool:
+    return any(isinstance(field, FileField) for field in model._meta.concrete_fields)
+
+
+def detach_partitions(
+    table: str, before: datetime, batch_size: Optional[int] = None
+) -> list[str]:
+    """
+    Detaches the partitions of a table that end before a date.
+
+    The detached partitions are left as tables of their own, to be archived
+    or dropped.
+
+    The foreign keys to the partitioned tables aren't enforced by the
+    database, the rows that would be deleted with the rows of a partition,
+    e.g. the assignments, the comments and the mentions of its tasks, are
+    moved with it: into tables named after the partition, e.g.
+    tasks_task_p202401_tasks_comment. Moving them costs a copy and a delete
+    of every such row, they are moved batch_size rows per transaction before
+    the partition is detached. The detach itself only changes the catalog,
+    but locks the whole table: it runs in a short transaction of its own,
+    which only moves the rows written since.
+
+    The rows holding files can't be moved, as the storage collector would
+    delete their files, the partitions are not detached while such rows refer
+    to them. A month with a file shared on one of its tasks can't be detached
+    until the file is deleted, or the task is done and archived.
+
+    Args:
+        table (str): The name of the partitioned table.
+        before (datetime): The partitions ending on or before it are detached.
+        batch_size (int, optional): The number of rows moved per transaction,
+            PARTITION_DETACH_BATCH_SIZE by default.
+
+    Returns:
+        list[str]: The names of the detached partitions.
+
+    Raises:
+        ValueError: If rows holding files refer to the partitions.
+    """
+    batch_size = batch_size or settings.PARTITION_DETACH_BATCH_SIZE
+    names = [
+        name
+        for name, _start, end in partitions(table)
+        if end is not None and end <= before
+    ]
+    dependents = {name: _dependent_rows(table, name) for name in names}
+    for name, querysets in dependents.items():
+        for queryset in querysets:
+            if _has_files(queryset.model) and queryset.exists():
+                raise ValueError(
+                    f"{queryset.model._meta.db_table} refers to {name}, "
+                    "its rows hold files"
+                )
+    for name in names:
+        for queryset in dependents[name]:
+            _move_in_batches(queryset, name, batch_size)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}"
+            )
+            # The rows written since they were moved.
+            for queryset in dependents[name]:
+                _move(cursor, queryset, name)
+    return names
+
+
+def _definitions(cursor: Any, table: str) -> tuple[list, list]:
+    # The indexes other than the primary key, and the foreign keys, with
+    # their SQL.
+    cursor.execute(
+        "SELECT index.relname, pg_get_indexdef(index.oid) FROM pg_index "
+        "JOIN pg_class index ON index.oid = pg_index.indexrelid "
+        "WHERE pg_index.indrelid = %s::regclass AND NOT pg_index.indisprimary",
+        [table],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    return indexes, cursor.fetchall()
+
+
+def _sequence_state(cursor: Any, table: str, column: str) -> tuple[str, int, bool]:
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, column])
+    (sequence,) = cursor.fetchone()
+    cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+    return (sequence, *cursor.fetchone())
+
+
+def _rename_indexes(cursor: Any, table: str, suffix: str) -> None:
+    cursor.execute(
+        "SELECT index.relname FROM pg_index "
+        "JOIN pg_class index ON index.oid = pg_index.indexrelid "
+        "WHERE pg_index.indrelid = %s::regclass",
+        [table],
+    )
+    for (name,) in cursor.fetchall():
+        renamed = f"{name[: 63 - len(suffix)]}{suffix}"
+        cursor.execute(f"ALTER INDEX {_quote(name)} RENAME TO {_quote(renamed)}")
+
+
+def _recreate(cursor: Any, table: str, indexes: list, foreign_keys: list) -> None:
+    # The definitions name the table, now the new one.
+    for _name, definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {definition}"
+        )
+
+
+def _own_sequence(
+    cursor: Any, table: str, column: str, state: tuple[str, int, bool]
+) -> None:
+    sequence = f"{table}_{column}_seq"
+    cursor.execute(f"CREATE SEQUENCE {_quote(sequence)}")
+    cursor.execute(
+        f"ALTER SEQUENCE {_quote(sequence)} OWNED BY {_quote(table)}.{_quote(column)}"
+    )
+    cursor.execute("SELECT setval(%s, %s, %s)", [sequence, state[1], state[2]])
+    cursor.execute(
+        f"ALTER TABLE {_quote(table)} ALTER COLUMN {_quote(column)} "
+        f"SET DEFAULT nextval('{sequence}')"
+    )
+
+
+def _drop_sequence(cursor: Any, table: str, column: str, sequence: str) -> None:
+    cursor.execute(
+        "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass "
+        "AND attname = %s",
+        [table, column],
+    )
+    (identity,) = cursor.fetchone()
+    alter = f"ALTER TABLE {_quote(table)} ALTER COLUMN {_quote(column)}"
+    if identity:
+        cursor.execute(f"{alter} DROP IDENTITY")
+    else:
+        cursor.execute(f"{alter} DROP DEFAULT")
+        cursor.execute(f"DROP SEQUENCE {sequence}")
+
+
+def partition_table(table: str, column: str, pk: str) -> None:
+    """
+    Partitions a table by month of a date column, keeping its rows in place.
+
+    Args:
+        table (str): The name of the table.
+        column (str): The date column.
+        pk (str): The primary key column.
+    """
+    initial = f"{table}_initial"
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = _definitions(cursor, table)
+        state = _sequence_state(cursor, table, pk)
+        cursor.execute(f"SELECT max({_quote(column)}) FROM {_quote(table)}")
+        (latest,) = cursor.fetchone()
+        # Partitions can't have identity columns, the ids are drawn from a
+        # sequence of the partitioned table.
+        _drop_sequence(cursor, table, pk, state[0])
+        cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(initial)}")
+        _rename_indexes(cursor, initial, "_initial")
+        # The key of the partitions is the key of the partitioned table.
+        cursor.execute(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'p'",
+            [initial],
+        )
+        for (name,) in cursor.fetchall():
+            cursor.execute(
+                f"ALTER TABLE {_quote(initial)} DROP CONSTRAINT {_quote(name)}"
+            )
+        cursor.execute(
+            f"CREATE TABLE {_quote(table)} (LIKE {_quote(initial)} "
+            "INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({_quote(column)})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + '_pkey')} "
+            f"PRIMARY KEY ({_quote(pk)}, {_quote(column)})"
+        )
+        _recreate(cursor, table, indexes, foreign_keys)
+        _own_sequence(cursor, table, pk, state)
+        end = _add_months(_month(max(filter(None, [latest, timezone.now()]))), 1)
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(initial)} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{end.isoformat()}')"
+        )
+        cursor.execute(
+            f"CREATE TABLE {_quote(table + '_default')} "
+            f"PARTITION OF {_quote(table)} DEFAULT"
+        )
+    create_partitions(table)
+
+
+def unpartition_table(table: str, pk: str) -> None:
+    """
+    Copies the rows of a partitioned table back into a plain table.
+
+    The detached partitions are not copied.
+
+    Args:
+        table (str): The name of the partitioned table.
+        pk (str): The primary key column.
+    """
+    partitioned = f"{table}_partitioned"
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = _definitions(cursor, table)
+        state = _sequence_state(cursor, table, pk)
+        _drop_sequence(cursor, table, pk, state[0])
+        cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(partitioned)}")
+        _rename_indexes(cursor, partitioned, "_partitioned")
+        cursor.execute(
+            f"CREATE TABLE {_quote(table)} (LIKE {_quote(partitioned)} "
+            "INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(partitioned)}"
+        )
+        cursor.execute(f"DROP TABLE {_quote(partitioned)}")
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + '_pkey')} "
+            f"PRIMARY KEY ({_quote(pk)})"
+        )
+        _recreate(cursor, table, indexes, foreign_keys)
+        _own_sequence(cursor, table, pk, state)
+
+
+class PartitionByRange(Operation):
+    """
+    Migration operation that partitions the table of a model by month of a
+    date field, see partition_table.
+
+    The model keeps its primary key, the state of the models isn't changed.
+
+    Attributes:
+        model_name (str): The name of the model.
+        field_name (str): The name of the date field.
+    """
+
+    reversible = True
+    reduces_to_sql = False
+
+    def __init__(self, model_name: str, field_name: str) -> None:
+        self.model_name = model_name
+        self.field_name = field_name
+
+    def state_forwards(self, app_label: str, state: Any) -> None:
+        """
+        Leaves the state of the models unchanged.
+        """
+
+    def database_forwards(
+        self, app_label: str, schema_editor: Any, from_state: Any, to_state: Any
+    ) -> None:
+        """
+        Partitions the table of the model.
+        """
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            partition_table(
+                model._meta.db_table,
+                model._meta.get_field(self.field_name).column,
+                model._meta.pk.column,
+            )
+
+    def database_backwards(
+        self, app_label: str, schema_editor: Any, from_state: Any, to_state: Any
+    ) -> None:
+        """
+        Copies the rows of the table of the model back into a plain table.
+        """
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            unpartition_table(model._meta.db_table, model._meta.pk.column)
+
+    def describe(self) -> str:
+        """
+        Returns:
+            str: The description of the operation.
+        """
+        return f"Partition {self.model_name} by month of {self.field_name}"
+
+    @property
+    def migration_name_fragment(self) -> str:
+        """
+        Returns:
+            str: The name of the migration of the operation.
+        """
+        return f"partition_{self.model_name.lower()}"
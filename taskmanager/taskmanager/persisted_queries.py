@@ -0,0 +1,155 @@
+"""
+This module contains the persisted queries and the document cache of the GraphQL endpoint.
+
+Clients following the automatic persisted queries protocol send the sha256
+hash of a query in `extensions.persistedQuery.sha256Hash` instead of the query.
+An unknown hash is answered with a `PersistedQueryNotFound` error, upon which
+the client sends the hash with the query once, and the query is stored for
+later requests.
+
+Queries can also be registered ahead of time in the manifest file at
+GRAPHQL_PERSISTED_QUERIES_MANIFEST. With GRAPHQL_PERSISTED_QUERIES_ONLY, only
+the queries of the manifest are accepted.
+
+Parsing and validating a query against the schema is done once per query
+text: the results are kept in an LRU cache of GRAPHQL_DOCUMENT_CACHE_SIZE
+documents.
+
+Functions:
+    query_hash: Returns the sha256 hash of a query.
+    load_manifest: Loads the queries of a persisted query manifest.
+    resolve_query: Returns the query of a request, looking up persisted queries.
+    parse_and_validate: Parses and validates a query, caching the result.
+"""
+
+import functools
+import hashlib
+import json
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import (
+    ASTValidationRule,
+    DocumentNode,
+    GraphQLError,
+    GraphQLSchema,
+    parse,
+    validate,
+)
+
+CACHE_PREFIX = "taskmanager:graphql:persisted"
+
+
+def query_hash(query: str) -> str:
+    """
+    Returns the sha256 hash of a query.
+
+    Args:
+        query (str): The query.
+
+    Returns:
+        str: The hex digest of the query.
+    """
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+@functools.cache
+def load_manifest(path: str) -> dict[str, str]:
+    """
+    Loads the queries of a persisted query manifest.
+
+    The manifest is the JSON file generated from the client's operations,
+    in the Apollo persisted query manifest format:
+    {"operations": [{"id": "<sha256>", "name": "...", "body": "<query>"}]}.
+
+    Args:
+        path (str): The path of the manifest.
+
+    Returns:
+        dict[str, str]: The queries by hash.
+
+    Raises:
+        ValueError: If the id of an operation is not the hash of its body.
+    """
+    with open(path, encoding="utf-8") as manifest:
+        operations = json.load(manifest)["operations"]
+    queries = {}
+    for operation in operations:
+        if query_hash(operation["body"]) != operation["id"]:
+            raise ValueError(f"The id of {operation.get('name')} is not its hash")
+        queries[operation["id"]] = operation["body"]
+    return queries
+
+
+def _registered_queries() -> dict[str, str]:
+    path = settings.GRAPHQL_PERSISTED_QUERIES_MANIFEST
+    return load_manifest(str(path)) if path else {}
+
+
+def resolve_query(query: Optional[str], extensions: Optional[dict[str, Any]]) -> str:
+    """
+    Returns the query of a request, looking up persisted queries.
+
+    Args:
+        query (str, optional): The query of the request.
+        extensions (dict, optional): The extensions of the request.
+
+    Returns:
+        str: The query to execute.
+
+    Raises:
+        GraphQLError: If the persisted query is unknown or not allowed, or
+            the hash doesn't match the query.
+    """
+    persisted = (extensions or {}).get("persistedQuery")
+    if not isinstance(persisted, dict) or "sha256Hash" not in persisted:
+        if settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+            raise GraphQLError("PersistedQueryNotAllowed")
+        return query
+    sha256_hash = str(persisted["sha256Hash"])
+    registered = _registered_queries().get(sha256_hash)
+    if registered is not None:
+        return registered
+    if settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+        raise GraphQLError("PersistedQueryNotAllowed")
+    key = f"{CACHE_PREFIX}:{sha256_hash}"
+    if not query:
+        query = cache.get(key)
+        if query is None:
+            raise GraphQLError("PersistedQueryNotFound")
+        return query
+    if query_hash(query) != sha256_hash:
+        raise GraphQLError("provided sha does not match query")
+    cache.set(key, query, settings.GRAPHQL_PERSISTED_QUERY_TIMEOUT)
+    return query
+
+
+@functools.lru_cache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+def parse_and_validate(
+    schema: GraphQLSchema,
+    query: str,
+    rules: Iterable[type[ASTValidationRule]],
+    max_errors: Optional[int] = None,
+) -> tuple[Optional[DocumentNode], list[GraphQLError]]:
+    """
+    Parses and validates a query, caching the result.
+
+    Only rules that depend on nothing but the document may be given, the
+    result is shared by every request with the same query.
+
+    Args:
+        schema (GraphQLSchema): The schema to validate against.
+        query (str): The query.
+        rules (Iterable[type[ASTValidationRule]]): The validation rules, as a tuple.
+        max_errors (int, optional): The validation stops after this many errors.
+
+    Returns:
+        tuple[Optional[DocumentNode], list[GraphQLError]]: The document, None
+            if the query has a syntax error, and the validation errors.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError as e:
+        return None, [e]
+    return document, validate(schema, document, rules, max_errors)
@@ -0,0 +1,166 @@
+"""
+This module contains the deletion of the projects and the users.
+
+Deleting a project or a user cascades through its tasks, comments, mentions,
+files and memberships. Run by the request, the cascade loaded every dependent
+row, and held the locks of all of them until it committed. A project or a
+user is now only marked deleted by the request, which hides it at once, and a
+background job purges it: the dependent rows are deleted leaves first,
+PURGE_BATCH_SIZE rows per transaction, and the project or the user last, with
+the little that is left.
+
+The dependents are found from the relations of the models, the cascades added
+by later models are purged without changes here.
+
+Functions:
+    delete_in_batches: Deletes the rows of a queryset, a batch per transaction.
+    dependents: Returns the rows deleted with an object, leaves first.
+    mark_project_deleted: Hides a project until it is purged.
+    mark_user_deleted: Deactivates and hides a user until they are purged.
+    purge_project: Deletes a project and its dependents in batches.
+    purge_user: Deletes a user and their dependents in batches.
+"""
+
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import CASCADE, QuerySet
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+from profiles.models import Profile
+from projects import membership
+from projects.events import muted, publish
+from projects.models import Project
+
+
+def delete_in_batches(queryset: QuerySet, batch_size: Optional[int] = None) -> int:
+    """
+    Deletes the rows of a queryset, a batch per transaction.
+
+    Args:
+        queryset (QuerySet): The rows to delete.
+        batch_size (int, optional): The number of rows per transaction,
+            PURGE_BATCH_SIZE by default.
+
+    Returns:
+        int: The number of rows deleted, without the cascades.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    model = queryset.model
+    total = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+            if pks:
+                # Deleted with the ORM, for the leftover cascades. The
+                # deletions aren't published, see projects.events.muted.
+                with muted():
+                    model._base_manager.filter(pk__in=pks).delete()
+        total += len(pks)
+        if len(pks) < batch_size:
+            return total
+
+
+def dependents(model: Any, pk: int) -> list[QuerySet]:
+    """
+    Returns the rows deleted with an object, leaves first.
+
+    Deleting the querysets in order leaves nothing for the cascade of the
+    object itself but its direct, non cascading, relations.
+
+    Args:
+        model (Model): The model of the object.
+        pk (int): The pk of the object.
+
+    Returns:
+        list[QuerySet]: The dependent rows, one queryset per relation path.
+    """
+    return _dependents(model, "pk", pk, (model,))
+
+
+def _dependents(model: Any, lookup: str, pk: int, path: tuple) -> list[QuerySet]:
+    querysets: list[QuerySet] = []
+    for relation in get_candidate_relations_to_delete(model._meta):
+        related = relation.related_model
+        if relation.on_delete is not CASCADE or related in path:
+            continue
+        related_lookup = f"{relation.field.name}__{lookup}"
+        querysets += _dependents(related, related_lookup, pk, (*path, related))
+        querysets.append(related._base_manager.filter(**{related_lookup: pk}))
+    return querysets
+
+
+def mark_project_deleted(project: Project) -> None:
+    """
+    Hides a project until it is purged.
+
+    Its users lose it at once, and the clients of its event stream are told.
+
+    Args:
+        project (Project): The project.
+    """
+    project.deleted_at = timezone.now()
+    project.save(update_fields=["deleted_at"])
+    membership.invalidate(
+        [project.owner_id, *project.users.values_list("pk", flat=True)]
+    )
+    publish(project.pk, "project.deleted", {"id": project.pk})
+
+
+def mark_user_deleted(user: Any) -> None:
+    """
+    Deactivates and hides a user until they are purged.
+
+    A deactivated user can't log in, and their tokens are refused.
+
+    Args:
+        user (User): The user.
+    """
+    # Without the signals, that save the profile of the user.
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    user.is_active = False
+    # A user whose profile was deleted gets one, to be marked.
+    Profile.objects.update_or_create(user=user, defaults={"deleted_at": timezone.now()})
+
+
+def _purge(model: Any, pk: int, batch_size: Optional[int]) -> int:
+    total = sum(
+        delete_in_batches(queryset, batch_size) for queryset in dependents(model, pk)
+    )
+    with transaction.atomic(), muted():
+        deleted, _ = model._base_manager.filter(pk=pk).delete()
+    return total + deleted
+
+
+def purge_project(pk: int, batch_size: Optional[int] = None) -> int:
+    """
+    Deletes a project and its dependents in batches.
+
+    Args:
+        pk (int): The pk of the project.
+        batch_size (int, optional): The number of rows per transaction,
+            PURGE_BATCH_SIZE by default.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    return _purge(Project, pk, batch_size)
+
+
+def purge_user(pk: int, batch_size: Optional[int] = None) -> int:
+    """
+    Deletes a user and their dependents in batches.
+
+    The projects the user owns are kept, without an owner.
+
+    Args:
+        pk (int): The pk of the user.
+        batch_size (int, optional): The number of rows per transaction,
+            PURGE_BATCH_SIZE by default.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    return _purge(get_user_model(), pk, batch_size)
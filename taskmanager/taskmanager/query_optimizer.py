@@ -0,0 +1,142 @@
+"""
+This module plans the related lookups of a GraphQL query.
+
+Resolvers such as `TaskType.resolve_assigned` or `UserType.profile` read a
+relation of every object they resolve. Without planning, a list of N tasks
+issues one query per task and per relation. `optimize_queryset` walks the
+selection set of the field being resolved, including fragments, and turns
+every selected relation into a `select_related` (forward foreign keys and
+one-to-one relations, joined into the root query) or a `prefetch_related`
+(many-to-many and reverse foreign keys, one query per relation), so a query
+resolves in a fixed number of queries whatever its nesting depth.
+
+Selected fields are matched to model fields by name, which is how
+`DjangoObjectType` exposes them.
+
+Functions:
+    optimize_queryset: Adds the related lookups a GraphQL query needs to a queryset.
+    plan_related_lookups: Returns the related lookups of a selection set.
+"""
+
+from typing import Iterator, Sequence
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, QuerySet
+from graphene.utils.str_converters import to_snake_case
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLResolveInfo,
+    InlineFragmentNode,
+    SelectionSetNode,
+)
+
+
+def _selected_fields(
+    selection_set: SelectionSetNode, info: GraphQLResolveInfo
+) -> Iterator[FieldNode]:
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments[selection.name.value]
+            yield from _selected_fields(fragment.selection_set, info)
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _selected_fields(selection.selection_set, info)
+
+
+def plan_related_lookups(
+    model: type[Model],
+    selection_set: SelectionSetNode,
+    info: GraphQLResolveInfo,
+    prefix: str = "",
+    joinable: bool = True,
+) -> tuple[list[str], list[str]]:
+    """
+    Returns the related lookups of a selection set.
+
+    Relations below a prefetched relation are prefetched as well, a join can
+    only extend the query it is part of.
+
+    Args:
+        model (type[Model]): The model the selection set is resolved on.
+        selection_set (SelectionSetNode): The selection set of the field.
+        info (GraphQLResolveInfo): The resolve info, for the fragments.
+        prefix (str): The lookup path of the model from the root model.
+        joinable (bool): Whether the model is joined into the root query.
+
+    Returns:
+        tuple[list[str], list[str]]: The select_related and prefetch_related lookups.
+    """
+    select_related: list[str] = []
+    prefetch_related: list[str] = []
+    for node in _selected_fields(selection_set, info):
+        if node.selection_set is None:
+            continue
+        name = to_snake_case(node.name.value)
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if not field.is_relation or field.related_model is None:
+            continue
+        lookup = f"{prefix}{name}"
+        join = joinable and (field.many_to_one or field.one_to_one)
+        if join:
+            select_related.append(lookup)
+        else:
+            prefetch_related.append(lookup)
+        nested_select, nested_prefetch = plan_related_lookups(
+            field.related_model, node.selection_set, info, f"{lookup}__", join
+        )
+        select_related.extend(nested_select)
+        prefetch_related.extend(nested_prefetch)
+    return select_related, prefetch_related
+
+
+def _descend(
+    selection_sets: list[SelectionSetNode],
+    path: Sequence[str],
+    info: GraphQLResolveInfo,
+) -> list[SelectionSetNode]:
+    for name in path:
+        selection_sets = [
+            node.selection_set
+            for selection_set in selection_sets
+            for node in _selected_fields(selection_set, info)
+            if node.name.value == name and node.selection_set is not None
+        ]
+    return selection_sets
+
+
+def optimize_queryset(
+    queryset: QuerySet, info: GraphQLResolveInfo, path: Sequence[str] = ()
+) -> QuerySet:
+    """
+    Adds the related lookups the field being resolved needs to a queryset.
+
+    Args:
+        queryset (QuerySet): The queryset the field resolves to.
+        info (GraphQLResolveInfo): The resolve info of the field.
+        path (Sequence[str]): The fields between the field and the objects of
+            the queryset, e.g. ("edges", "node") for a connection.
+
+    Returns:
+        QuerySet: The queryset with select_related and prefetch_related applied.
+    """
+    select_related: list[str] = []
+    prefetch_related: list[str] = []
+    selection_sets = [
+        field_node.selection_set
+        for field_node in info.field_nodes
+        if field_node.selection_set is not None
+    ]
+    for selection_set in _descend(selection_sets, path, info):
+        selected, prefetched = plan_related_lookups(queryset.model, selection_set, info)
+        select_related.extend(selected)
+        prefetch_related.extend(prefetched)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
@@ -0,0 +1,158 @@
+"""
+This module contains the result cache of the GraphQL endpoint.
+
+Caching is opt-in per operation, either with the `@cached` directive on the
+query:
+
+    query Dashboard @cached(ttl: 30) { ... }
+
+or by listing the hash of the query in GRAPHQL_CACHED_OPERATIONS, for the
+persisted queries of clients that can't be changed. A cached result is
+returned without executing any resolver.
+
+Results are keyed on the hash of the query, the operation name, the variables
+and the user, so a user never gets a result computed for another user. Every
+write to a task, project or profile bumps a generation counter that is part
+of the key, which invalidates every cached result at once.
+
+Attributes:
+    CachedDirective: The @cached directive.
+
+Functions:
+    cache_timeout: Returns how long the result of an operation is cached.
+    result_key: Returns the cache key of the result of an operation.
+    get_result: Returns a cached result.
+    set_result: Caches a result.
+    invalidate_results: Invalidates every cached result once the transaction commits.
+"""
+
+import hashlib
+import json
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from graphql import (
+    DirectiveLocation,
+    GraphQLArgument,
+    GraphQLDirective,
+    GraphQLInt,
+    OperationDefinitionNode,
+    OperationType,
+    get_directive_values,
+)
+
+CACHE_PREFIX = "taskmanager:graphql:results"
+GENERATION_KEY = f"{CACHE_PREFIX}:generation"
+
+CachedDirective = GraphQLDirective(
+    name="cached",
+    description="Caches the result of the query for ttl seconds.",
+    locations=[DirectiveLocation.QUERY],
+    args={
+        "ttl": GraphQLArgument(
+            GraphQLInt, description="The number of seconds the result is cached."
+        )
+    },
+)
+
+
+def cache_timeout(
+    operation: Optional[OperationDefinitionNode],
+    sha256_hash: str,
+    variables: Optional[dict[str, Any]],
+) -> Optional[int]:
+    """
+    Returns how long the result of an operation is cached.
+
+    Args:
+        operation (OperationDefinitionNode, optional): The operation.
+        sha256_hash (str): The hash of the query.
+        variables (dict, optional): The variables of the operation.
+
+    Returns:
+        int: The timeout in seconds, None if the result is not cached.
+    """
+    if operation is None or operation.operation != OperationType.QUERY:
+        return None
+    directive = get_directive_values(CachedDirective, operation, variables)
+    if directive is not None:
+        timeout = directive.get("ttl") or settings.GRAPHQL_RESULT_CACHE_TIMEOUT
+    else:
+        timeout = settings.GRAPHQL_CACHED_OPERATIONS.get(sha256_hash)
+    if not timeout or timeout <= 0:
+        return None
+    return min(timeout, settings.GRAPHQL_RESULT_CACHE_MAX_TIMEOUT)
+
+
+def result_key(
+    sha256_hash: str,
+    operation_name: Optional[str],
+    variables: Optional[dict[str, Any]],
+    user: Any,
+) -> str:
+    """
+    Returns the cache key of the result of an operation.
+
+    Args:
+        sha256_hash (str): The hash of the query.
+        operation_name (str, optional): The name of the operation.
+        variables (dict, optional): The variables of the operation.
+        user (Any): The user of the request.
+
+    Returns:
+        str: The cache key.
+    """
+    scope = "anonymous" if user.is_anonymous else f"user:{user.pk}"
+    arguments = hashlib.sha256(
+        json.dumps(
+            [operation_name, variables or {}], sort_keys=True, cls=DjangoJSONEncoder
+        ).encode()
+    ).hexdigest()
+    generation = cache.get(GENERATION_KEY, 0)
+    return f"{CACHE_PREFIX}:{generation}:{scope}:{sha256_hash}:{arguments}"
+
+
+def get_result(key: str) -> Optional[dict[str, Any]]:
+    """
+    Returns a cached result.
+
+    Args:
+        key (str): The cache key of the result.
+
+    Returns:
+        dict: The data of the result, None if it is not cached.
+    """
+    return cache.get(key)
+
+
+def set_result(key: str, data: dict[str, Any], timeout: int) -> None:
+    """
+    Caches a result.
+
+    Args:
+        key (str): The cache key of the result.
+        data (dict): The data of the result.
+        timeout (int): The number of seconds the result is cached.
+    """
+    cache.set(key, data, timeout)
+
+
+def _bump_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
+
+
+def invalidate_results(**_kwargs) -> None:
+    """
+    Invalidates every cached result once the current transaction commits.
+
+    Invalidating on commit keeps a concurrent request from caching the data
+    of before the write again. It is a signal receiver for the writes to the
+    models the results are read from.
+    """
+    transaction.on_commit(_bump_generation)
@@ -20,6 +20,9 @@ import graphene
 import graphql_jwt
 import profiles.schema
 import tasks.schema
+from graphql import specified_directives
+
+from .result_cache import CachedDirective
 
 
 class Query(tasks.schema.Query, profiles.schema.Query, graphene.ObjectType):
@@ -60,4 +63,6 @@ class Mutation(tasks.schema.Mutation, graphene.ObjectType):
     refresh_token = graphql_jwt.Refresh.Field()
 
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+schema = graphene.Schema(
+    query=Query, mutation=Mutation, directives=(*specified_directives, CachedDirective)
+)
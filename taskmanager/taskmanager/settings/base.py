@@ -16,7 +16,11 @@ from typing import Any
 
 import environ  # type: ignore
 
-env = environ.Env(CSP_REPORT_URI=(str, None))
+env = environ.Env(
+    CSP_REPORT_URI=(str, None),
+    GRAPHQL_PERSISTED_QUERIES_MANIFEST=(str, None),
+    GRAPHQL_PERSISTED_QUERIES_ONLY=(bool, False),
+)
 environ.Env.read_env()
 
 BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
@@ -150,15 +154,75 @@ REST_AUTH = {
     "USE_JWT": True,
     "JWT_AUTH_COOKIE": "taskmanager-jwt",
     "JWT_AUTH_REFRESH_COOKIE": "taskmanager-refresh-token",
+    "JWT_TOKEN_CLAIMS_SERIALIZER": "projects.tokens.TokenObtainPairSerializer",
+}
+
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "projects.tokens.TokenObtainPairSerializer",
 }
 
 GRAPHENE = {
     "SCHEMA": "taskmanager.schema.schema",
     "MIDDLEWARE": [
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
+        "taskmanager.tracing.TracingMiddleware",
     ],
 }
 
+# The default and maximum number of objects in a page of a GraphQL connection,
+# the maximum is also the size of a list without `first` for the query cost.
+GRAPHQL_PAGE_SIZE = 20
+GRAPHQL_MAX_PAGE_SIZE = 100
+# The maximum number of tasks of a GraphQL bulk mutation.
+GRAPHQL_MAX_BULK_SIZE = 500
+# The maximum nesting of fields and the maximum cost of a GraphQL operation.
+GRAPHQL_MAX_DEPTH = 8
+GRAPHQL_COST_BUDGETS = {
+    "anonymous": 1000,
+    "authenticated": 5000,
+    "staff": 50000,
+}
+# Statements of a GraphQL request are cancelled after this many milliseconds.
+GRAPHQL_STATEMENT_TIMEOUT = 5000
+# The default and maximum number of seconds of the GraphQL result cache, and
+# the hashes of the queries cached without the @cached directive, with their timeout.
+GRAPHQL_RESULT_CACHE_TIMEOUT = 60
+GRAPHQL_RESULT_CACHE_MAX_TIMEOUT = 60 * 10
+GRAPHQL_CACHED_OPERATIONS: dict[str, int] = {}
+# The number of parsed and validated GraphQL documents kept per process.
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+# The manifest of the persisted queries of the clients, see taskmanager.persisted_queries.
+GRAPHQL_PERSISTED_QUERIES_MANIFEST = env("GRAPHQL_PERSISTED_QUERIES_MANIFEST")
+# Only accept the queries of the manifest.
+GRAPHQL_PERSISTED_QUERIES_ONLY = env("GRAPHQL_PERSISTED_QUERIES_ONLY")
+# How long automatically persisted queries are kept, in seconds.
+GRAPHQL_PERSISTED_QUERY_TIMEOUT = 60 * 60 * 24 * 7
+# The maximum number of operations of a batched GraphQL request.
+GRAPHQL_MAX_BATCH_SIZE = 10
+
+# The number of events kept per project for Last-Event-ID resume, and how many
+# seconds the events of a project without activity are kept.
+PROJECT_EVENTS_REPLAY_SIZE = 1000
+PROJECT_EVENTS_RETENTION = 60 * 60 * 24
+# The seconds between keepalive comments of an idle event stream, the seconds
+# after which a stream ends, and the milliseconds clients wait to reconnect.
+PROJECT_EVENTS_KEEPALIVE = 15
+PROJECT_EVENTS_MAX_DURATION = 60 * 5
+PROJECT_EVENTS_RETRY = 1000
+# The Redis connections the event streams of a process share, besides the one
+# the reader of the process blocks on, see projects.events.
+PROJECT_EVENTS_CONNECTIONS = 10
+# How many seconds the projects of a user are cached, the changes made
+# without signals are seen after at most that long, see projects.membership.
+PROJECT_MEMBERSHIP_TIMEOUT = 60 * 60
+# Whether the access tokens carry the projects of their user, up to the size
+# of the claim in characters, see projects.tokens.
+PROJECT_MEMBERSHIP_CLAIM = True
+PROJECT_MEMBERSHIP_CLAIM_MAX_SIZE = 1024
+# The number of async requests of a process using the database at once, each
+# with a connection of its own, see taskmanager.async_api.
+ASYNC_DB_CONCURRENCY = 20
+
 AUTHENTICATION_BACKENDS = [
     "graphql_jwt.backends.JSONWebTokenBackend",
     "django.contrib.auth.backends.ModelBackend",
@@ -197,6 +261,45 @@ CACHES = {
 
 CACHE_MIDDLEWARE_SECONDS = 60
 
+# Push notifications
+
+# Mentions of a user are coalesced into one push per window (seconds).
+NOTIFICATION_DIGEST_WINDOW = 60
+# At most NOTIFICATION_RATE_LIMIT pushes per user per NOTIFICATION_RATE_PERIOD seconds.
+NOTIFICATION_RATE_LIMIT = 10
+NOTIFICATION_RATE_PERIOD = 60 * 60
+# The periodic notification scans fan out one Celery job per shard of this many rows.
+NOTIFICATION_SCAN_SHARD_SIZE = 1000
+
+# Task archive
+
+# The tasks done for longer than this many seconds are moved to the archive,
+# this many tasks per transaction, see tasks.archive.
+TASK_ARCHIVE_AGE = 60 * 60 * 24 * 90
+TASK_ARCHIVE_CHUNK_SIZE = 500
+
+# Partitioning
+
+# The tasks and comments are partitioned by month, the partitions of this
+# many months after the current one are created ahead, see
+# taskmanager.partitioning.
+PARTITION_MONTHS_AHEAD = 3
+# The rows referring to a detached partition are moved this many rows per
+# transaction, see taskmanager.partitioning.detach_partitions.
+PARTITION_DETACH_BATCH_SIZE = 1000
+
+# Deletion
+
+# The deleted projects and users are purged in the background, this many rows
+# per transaction, see taskmanager.purge.
+PURGE_BATCH_SIZE = 500
+
+# The files no row refers to are deleted from the storage, checked this many
+# at a time. The files younger than this many seconds are kept, their row may
+# not be committed yet, see taskmanager.garbage.
+STORAGE_GC_BATCH_SIZE = 1000
+STORAGE_GC_MIN_AGE = 60 * 60 * 24
+
 # Content Security Policy
 
 CSP_IMG_SRC = "'self'"
@@ -1,4 +1,7 @@
+from debug_toolbar.settings import PANELS_DEFAULTS
+
 from .base import *  # noqa F403
+
 # ruff : noqa : F405
 
 DEBUG = True
@@ -30,6 +33,11 @@ MIDDLEWARE += [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+DEBUG_TOOLBAR_PANELS = [
+    *PANELS_DEFAULTS,
+    "taskmanager.panels.IdentityMapPanel",
+]
+
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
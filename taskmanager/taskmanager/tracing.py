@@ -0,0 +1,248 @@
+"""
+This module contains the resolver instrumentation of the GraphQL endpoint.
+
+`TracingMiddleware` measures the wall time and the number of database queries
+of every resolver of an object or list field. The measurements are aggregated
+per field, as `ParentType.field`, into in-process histograms that
+`render_metrics` exports in the Prometheus text format. Each worker process
+keeps its own histograms.
+
+Leaf fields (scalars and enums) are not measured: they read an attribute of
+an object that is already loaded, and measuring them would cost more than
+resolving them.
+
+A list field resolving to a queryset is evaluated inside the measurement, so
+that its query is attributed to the field instead of to the serialization of
+the result.
+
+The resolvers of a request are also recorded on the request, and staff users
+can ask for them with `"extensions": {"tracing": true}`. They are then
+returned in the `extensions.tracing` block of the response, in the Apollo
+tracing format with an additional query count per resolver.
+
+Classes:
+    Histogram: A histogram with fixed buckets.
+    TracingMiddleware: Graphene middleware measuring the resolvers.
+
+Functions:
+    record: Records a measurement of a field.
+    render_metrics: Renders the histograms in the Prometheus text format.
+    reset_metrics: Clears the histograms.
+    start_tracing: Starts recording the resolvers of a request.
+    tracing_extension: Returns the extensions.tracing block of a request.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Optional, Sequence
+
+from django.db import connection
+from django.db.models import QuerySet
+from graphql import get_named_type, is_leaf_type
+
+DURATION_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """
+    A histogram with fixed buckets.
+
+    Attributes:
+        buckets (Sequence[float]): The upper bounds of the buckets.
+        counts (list[int]): The number of observations per bucket, the last
+            one for the observations above every bound.
+        total (float): The sum of the observations.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Records an observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.total += value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        Returns the cumulative counts per upper bound, as Prometheus expects.
+
+        Returns:
+            list[tuple[str, int]]: The counts per bound, ending with "+Inf".
+        """
+        running, cumulative = 0, []
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            running += count
+            cumulative.append((str(bound), running))
+        return cumulative
+
+
+_lock = threading.Lock()
+_durations: dict[str, Histogram] = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+_queries: dict[str, Histogram] = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+
+
+def record(field: str, duration_ms: float, queries: int) -> None:
+    """
+    Records a measurement of a field.
+
+    Args:
+        field (str): The field, as ParentType.field.
+        duration_ms (float): The wall time of the resolver in milliseconds.
+        queries (int): The number of queries of the resolver.
+    """
+    with _lock:
+        _durations[field].observe(duration_ms)
+        _queries[field].observe(queries)
+
+
+def reset_metrics() -> None:
+    """
+    Clears the histograms.
+    """
+    with _lock:
+        _durations.clear()
+        _queries.clear()
+
+
+def _render_histogram(name: str, help_text: str, histograms) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for field, histogram in sorted(histograms.items()):
+        cumulative = histogram.cumulative()
+        for bound, count in cumulative:
+            lines.append(f'{name}_bucket{{field="{field}",le="{bound}"}} {count}')
+        lines.append(f'{name}_sum{{field="{field}"}} {histogram.total}')
+        lines.append(f'{name}_count{{field="{field}"}} {cumulative[-1][1]}')
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    Renders the histograms in the Prometheus text format.
+
+    Returns:
+        str: The exposition of the histograms of this process.
+    """
+    with _lock:
+        lines = [
+            *_render_histogram(
+                "graphql_resolver_duration_milliseconds",
+                "Wall time of the GraphQL resolvers.",
+                _durations,
+            ),
+            *_render_histogram(
+                "graphql_resolver_queries",
+                "Database queries of the GraphQL resolvers.",
+                _queries,
+            ),
+        ]
+    return "\n".join(lines) + "\n"
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class TracingMiddleware:
+    """
+    Graphene middleware measuring the resolvers of object and list fields.
+
+    Methods:
+        resolve: Resolves a field, measuring its resolver.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        """
+        Resolves a field, measuring its resolver.
+
+        Args:
+            next (Callable): The next middleware or the resolver.
+            root (Any): The parent object.
+            info (GraphQLResolveInfo): The resolve info of the field.
+            **kwargs: The arguments of the field.
+
+        Returns:
+            Any: The value of the field.
+        """
+        if is_leaf_type(get_named_type(info.return_type)):
+            return next(root, info, **kwargs)
+        counter = _QueryCounter()
+        start = time.perf_counter_ns()
+        with connection.execute_wrapper(counter):
+            result = next(root, info, **kwargs)
+            if isinstance(result, QuerySet):
+                # Evaluates the queryset, its result cache is used afterwards.
+                len(result)
+        duration = time.perf_counter_ns() - start
+        record(
+            f"{info.parent_type.name}.{info.field_name}",
+            duration / 1_000_000,
+            counter.count,
+        )
+        resolvers = getattr(info.context, "graphql_resolvers", None)
+        if resolvers is not None:
+            resolvers.append(
+                {
+                    "path": info.path.as_list(),
+                    "parentType": info.parent_type.name,
+                    "fieldName": info.field_name,
+                    "returnType": str(info.return_type),
+                    "startOffset": start - info.context.graphql_start,
+                    "duration": duration,
+                    "queries": counter.count,
+                }
+            )
+        return result
+
+
+def start_tracing(request: Any) -> None:
+    """
+    Starts recording the resolvers of a request.
+
+    Args:
+        request (Any): The context of the request.
+    """
+    request.graphql_started_at = datetime.now(timezone.utc)
+    request.graphql_start = time.perf_counter_ns()
+    request.graphql_resolvers = []
+
+
+def tracing_extension(request: Any) -> Optional[dict[str, Any]]:
+    """
+    Returns the extensions.tracing block of a request.
+
+    Args:
+        request (Any): The context of the request.
+
+    Returns:
+        dict: The tracing block, None if the resolvers were not recorded.
+    """
+    resolvers = getattr(request, "graphql_resolvers", None)
+    if resolvers is None:
+        return None
+    return {
+        "version": 1,
+        "startTime": request.graphql_started_at.isoformat(),
+        "endTime": datetime.now(timezone.utc).isoformat(),
+        "duration": time.perf_counter_ns() - request.graphql_start,
+        "execution": {"resolvers": resolvers},
+    }
@@ -27,11 +27,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 from profiles.views import LoginView, RegisterView
+from projects.tokens import TokenRefreshView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .views import APIRootView
+from .views import APIRootView, GraphQLMetricsView, GraphQLView
 
 urlpatterns = [
     path("", APIRootView.as_view(), name="api-root"),
@@ -48,9 +48,12 @@ urlpatterns = [
         PasswordResetConfirmView.as_view(),
         name="password_reset_confirm",
     ),
+    # Before the refresh view of dj-rest-auth, to add the projects claim.
+    path("api-auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api-auth/", include("dj_rest_auth.urls")),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql/metrics/", GraphQLMetricsView.as_view(), name="graphql-metrics"),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,260 @@
+"""
+This module contains the validation rules that bound the cost of a GraphQL query.
+
+The rules run with the other validation rules, before any resolver, so an
+expensive query is rejected without touching the database.
+
+The cost of a query is the number of objects it can resolve: every field
+costs 1, and the cost of the fields below a list is multiplied by the size
+of the list. The size is the `first` argument of the field if it has one, at
+least 1 and at most GRAPHQL_MAX_PAGE_SIZE, or GRAPHQL_MAX_PAGE_SIZE otherwise:
+a list without `first` isn't paginated, and is priced as the largest page. A
+negative `first` or `skip` is rejected. A connection passes its `first` on to its
+`edges` list. Introspection fields are free.
+
+Functions:
+    query_cost: Computes the static cost of an operation.
+    query_depth: Computes the depth of an operation.
+    cost_limit_rule: Returns a rule rejecting operations over a cost budget.
+    depth_limit_rule: Returns a rule rejecting operations deeper than a limit.
+    cost_budget: Returns the cost budget of a user.
+"""
+
+import functools
+from typing import Any, Optional
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    ValidationContext,
+    ValidationRule,
+    get_named_type,
+    get_nullable_type,
+    is_list_type,
+    value_from_ast_untyped,
+)
+
+
+def _fields(
+    selection_set: SelectionSetNode,
+    parent_type: Any,
+    context: ValidationContext,
+    visited: frozenset = frozenset(),
+):
+    # Yields the fields of a selection set with the type they are selected on,
+    # expanding fragments. A fragment cycle is reported by NoFragmentCyclesRule.
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            if not selection.name.value.startswith("__"):
+                yield selection, parent_type
+        elif isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            fragment = context.get_fragment(name)
+            if fragment is None or name in visited:
+                continue
+            fragment_type = context.schema.get_type(fragment.type_condition.name.value)
+            yield from _fields(
+                fragment.selection_set, fragment_type, context, visited | {name}
+            )
+        elif isinstance(selection, InlineFragmentNode):
+            fragment_type = parent_type
+            if selection.type_condition is not None:
+                fragment_type = context.schema.get_type(
+                    selection.type_condition.name.value
+                )
+            yield from _fields(selection.selection_set, fragment_type, context, visited)
+
+
+def _argument(node: FieldNode, name: str, variables: dict[str, Any]) -> Optional[int]:
+    for argument in node.arguments:
+        if argument.name.value == name:
+            value = value_from_ast_untyped(argument.value, variables)
+            return value if isinstance(value, int) else None
+    return None
+
+
+def _page_size(first: int) -> int:
+    # The size of a page of first objects, as the resolvers bound it.
+    return min(max(first, 1), settings.GRAPHQL_MAX_PAGE_SIZE)
+
+
+def _cost(
+    selection_set: SelectionSetNode,
+    parent_type: Any,
+    context: ValidationContext,
+    variables: dict[str, Any],
+    page_size: Optional[int] = None,
+) -> int:
+    cost = 0
+    for node, field_parent in _fields(selection_set, parent_type, context):
+        if not isinstance(field_parent, GraphQLObjectType):
+            cost += 1
+            continue
+        field = field_parent.fields.get(node.name.value)
+        if field is None:
+            # Unknown fields are reported by FieldsOnCorrectTypeRule.
+            continue
+        first = _argument(node, "first", variables)
+        if first is not None:
+            first = _page_size(first)
+        multiplier, child_page_size = 1, None
+        if is_list_type(get_nullable_type(field.type)):
+            multiplier = page_size or first or settings.GRAPHQL_MAX_PAGE_SIZE
+        elif first is not None:
+            child_page_size = first
+        children = 0
+        if node.selection_set is not None:
+            children = _cost(
+                node.selection_set,
+                get_named_type(field.type),
+                context,
+                variables,
+                child_page_size,
+            )
+        cost += multiplier * (1 + children)
+    return cost
+
+
+def _depth(
+    selection_set: SelectionSetNode, parent_type: Any, context: ValidationContext
+) -> int:
+    depth = 0
+    for node, field_parent in _fields(selection_set, parent_type, context):
+        children = 0
+        field = getattr(field_parent, "fields", {}).get(node.name.value)
+        if node.selection_set is not None and field is not None:
+            children = _depth(node.selection_set, get_named_type(field.type), context)
+        depth = max(depth, 1 + children)
+    return depth
+
+
+def _root_type(context: ValidationContext, operation: OperationDefinitionNode):
+    return context.schema.get_root_type(operation.operation)
+
+
+def query_cost(
+    context: ValidationContext,
+    operation: OperationDefinitionNode,
+    variables: Optional[dict[str, Any]] = None,
+) -> int:
+    """
+    Computes the static cost of an operation.
+
+    Args:
+        context (ValidationContext): The validation context of the document.
+        operation (OperationDefinitionNode): The operation.
+        variables (dict, optional): The variables of the request.
+
+    Returns:
+        int: The maximum number of objects the operation can resolve.
+    """
+    return _cost(
+        operation.selection_set,
+        _root_type(context, operation),
+        context,
+        variables or {},
+    )
+
+
+def query_depth(context: ValidationContext, operation: OperationDefinitionNode) -> int:
+    """
+    Computes the depth of an operation.
+
+    Args:
+        context (ValidationContext): The validation context of the document.
+        operation (OperationDefinitionNode): The operation.
+
+    Returns:
+        int: The number of nested fields of the deepest path.
+    """
+    return _depth(operation.selection_set, _root_type(context, operation), context)
+
+
+def cost_limit_rule(
+    budget: int, variables: Optional[dict[str, Any]] = None
+) -> type[ValidationRule]:
+    """
+    Returns a rule rejecting operations over a cost budget.
+
+    Args:
+        budget (int): The maximum cost of an operation.
+        variables (dict, optional): The variables of the request, for `first`
+            arguments given as variables.
+
+    Returns:
+        type[ValidationRule]: The validation rule.
+    """
+
+    class CostLimitRule(ValidationRule):
+        def enter_field(self, node, *_):
+            # A negative page would cancel out the cost of the other fields.
+            for name in ("first", "skip"):
+                value = _argument(node, name, variables or {})
+                if value is not None and value < 0:
+                    self.report_error(
+                        GraphQLError(f"{name} must not be negative.", node)
+                    )
+
+        def enter_operation_definition(self, node, *_):
+            cost = query_cost(self.context, node, variables)
+            if cost > budget:
+                self.report_error(
+                    GraphQLError(
+                        f"Query cost {cost} exceeds the budget of {budget}.", node
+                    )
+                )
+
+    return CostLimitRule
+
+
+@functools.cache
+def depth_limit_rule(max_depth: int) -> type[ValidationRule]:
+    """
+    Returns a rule rejecting operations deeper than a limit.
+
+    The rule only depends on the document, the same rule is returned for the
+    same limit so that validation results can be cached.
+
+    Args:
+        max_depth (int): The maximum depth of an operation.
+
+    Returns:
+        type[ValidationRule]: The validation rule.
+    """
+
+    class DepthLimitRule(ValidationRule):
+        def enter_operation_definition(self, node, *_):
+            depth = query_depth(self.context, node)
+            if depth > max_depth:
+                self.report_error(
+                    GraphQLError(
+                        f"Query depth {depth} exceeds the maximum depth of {max_depth}.",
+                        node,
+                    )
+                )
+
+    return DepthLimitRule
+
+
+def cost_budget(user: Any) -> int:
+    """
+    Returns the cost budget of a user.
+
+    Args:
+        user (Any): The user of the request.
+
+    Returns:
+        int: The maximum cost of an operation of the user.
+    """
+    budgets = settings.GRAPHQL_COST_BUDGETS
+    if user.is_staff:
+        return budgets["staff"]
+    if user.is_authenticated:
+        return budgets["authenticated"]
+    return budgets["anonymous"]
@@ -4,17 +4,48 @@ This file has the views for the taskmanager app.
 
 Attributes:
     APIRootView (APIView): The API root view.
+    GraphQLView (GraphQLView): The GraphQL endpoint, with bounded query cost,
+        persisted queries and batched requests.
+    GraphQLMetricsView (APIView): The resolver metrics of the GraphQL endpoint.
 
 
 Methods:
     get: Gets the API root.
 """
 
+import json
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django import views as graphene_views
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    get_operation_ast,
+    specified_rules,
+    validate,
+    validate_schema,
+)
+from graphql_jwt.utils import get_http_authorization
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 
+from .db import statement_timeout
+from .loaders import identity_map
+from .persisted_queries import parse_and_validate, query_hash, resolve_query
+from .result_cache import cache_timeout, get_result, result_key, set_result
+from .tracing import render_metrics, start_tracing, tracing_extension
+from .validation import cost_budget, cost_limit_rule, depth_limit_rule
+
 
 class APIRootView(APIView):
     """API root view.
@@ -48,3 +79,281 @@ class APIRootView(APIView):
                 "files": reverse("sharedfile-list", request=request),
             }
         )
+
+
+class GraphQLView(graphene_views.GraphQLView):
+    """The GraphQL endpoint, with bounded query cost, persisted queries and batches.
+
+    Queries deeper than GRAPHQL_MAX_DEPTH or costlier than the budget of the
+    user in GRAPHQL_COST_BUDGETS are rejected during validation, and every
+    statement of a request is cancelled after GRAPHQL_STATEMENT_TIMEOUT
+    milliseconds.
+
+    Queries may be sent as persisted query hashes, and the parsed and
+    validated documents are cached, see `taskmanager.persisted_queries`.
+    Only the cost, which depends on the user and the variables, is validated
+    on every request.
+
+    Staff users can ask for the timings of the resolvers with
+    `"extensions": {"tracing": true}`, see `taskmanager.tracing`.
+
+    The results of the queries opting in are cached, see
+    `taskmanager.result_cache`.
+
+    A POST body that is a JSON array is a batch: its operations, at most
+    GRAPHQL_MAX_BATCH_SIZE, are executed in order and their results are
+    returned in an array. The operations of a batch share the request, so
+    the user is authenticated once and the objects loaded by one operation
+    are reused by the next ones, see `taskmanager.loaders`.
+
+    Methods:
+        parse_body: Parses the body of the request, detecting batches.
+        get_user: Gets the user of the request.
+        get_extensions: Gets the extensions of the request.
+        execute_graphql_request: Validates and executes a GraphQL request.
+        json_encode: Encodes a response, with the extensions of the request.
+    """
+
+    def parse_body(self, request):
+        """Parses the body of the request, detecting batches.
+
+        Args:
+            request (HttpRequest): The request.
+
+        Returns:
+            dict | list: The body, a list of operations for a batch.
+
+        Raises:
+            HttpError: If the body is invalid or the batch is too large.
+        """
+        if self.get_content_type(request) == "application/json":
+            self.batch = request.body.lstrip()[:1] == b"["
+        data = super().parse_body(request)
+        if self.batch:
+            if not all(isinstance(entry, dict) for entry in data):
+                raise graphene_views.HttpError(
+                    HttpResponseBadRequest(
+                        "Every operation of a batch must be an object."
+                    )
+                )
+            if len(data) > settings.GRAPHQL_MAX_BATCH_SIZE:
+                raise graphene_views.HttpError(
+                    HttpResponseBadRequest(
+                        f"A batch can have at most {settings.GRAPHQL_MAX_BATCH_SIZE} "
+                        "operations."
+                    )
+                )
+        return data
+
+    def get_user(self, request):
+        """Gets the user of the request.
+
+        The JSON Web Token middleware of graphene only authenticates the
+        request once resolvers run, the budget is needed before. The user is
+        set on the request, so that the middleware doesn't authenticate it
+        again, and added to its identity map.
+
+        Args:
+            request (HttpRequest): The request.
+
+        Returns:
+            User: The user of the request, or an anonymous user.
+        """
+        if getattr(self, "user", None) is None:
+            self.user = request.user
+            if self.user.is_anonymous and get_http_authorization(request) is not None:
+                self.user = authenticate(request=request) or self.user
+                request.user = self.user
+            if self.user.is_authenticated:
+                identity_map(request).add(self.user)
+        return self.user
+
+    def get_extensions(self, request, data):
+        """Gets the extensions of the request.
+
+        Args:
+            request (HttpRequest): The request.
+            data (dict): The body of the request.
+
+        Returns:
+            dict: The extensions, empty if the request has none.
+
+        Raises:
+            HttpError: If the extensions are invalid JSON.
+        """
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise graphene_views.HttpError(
+                    HttpResponseBadRequest("Extensions are invalid JSON.")
+                )
+        return extensions if isinstance(extensions, dict) else {}
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        """Validates and executes a GraphQL request.
+
+        Args:
+            request (HttpRequest): The request.
+            data (dict): The body of the request.
+            query (str): The GraphQL document.
+            variables (dict): The variables of the operation.
+            operation_name (str): The name of the operation to execute.
+            show_graphiql (bool): Whether GraphiQL is rendered.
+
+        Returns:
+            ExecutionResult: The result of the operation.
+
+        Raises:
+            HttpError: If there is no query, or a mutation is sent with GET.
+        """
+        extensions = self.get_extensions(request, data)
+        # The previous operation of a batch may have failed.
+        setattr(request, MUTATION_ERRORS_FLAG, False)
+        request.graphql_resolvers = None
+        if extensions.get("tracing") is True and self.get_user(request).is_staff:
+            start_tracing(request)
+        if not query and "persistedQuery" not in extensions:
+            if show_graphiql:
+                return None
+            raise graphene_views.HttpError(
+                HttpResponseBadRequest("Must provide query string.")
+            )
+        try:
+            query = resolve_query(query, extensions)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+        # The rules of the view replace the specified rules, as in graphene.
+        rules = self.validation_rules or specified_rules
+        document, validation_errors = parse_and_validate(
+            schema,
+            query,
+            (*rules, depth_limit_rule(settings.GRAPHQL_MAX_DEPTH)),
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if document is None or validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise graphene_views.HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    f"Can only perform a {operation_ast.operation.value} operation "
+                    "from a POST request.",
+                )
+            )
+
+        validation_errors = validate(
+            schema,
+            document,
+            [cost_limit_rule(cost_budget(self.get_user(request)), variables)],
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        try:
+            timeout = None
+            if request.graphql_resolvers is None:
+                timeout = cache_timeout(operation_ast, query_hash(query), variables)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+        if timeout:
+            key = result_key(
+                query_hash(query), operation_name, variables, self.get_user(request)
+            )
+            data = get_result(key)
+            if data is not None:
+                return ExecutionResult(data=data)
+
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+        try:
+            with statement_timeout(settings.GRAPHQL_STATEMENT_TIMEOUT):
+                if (
+                    operation_ast is not None
+                    and operation_ast.operation == OperationType.MUTATION
+                    and (
+                        graphene_settings.ATOMIC_MUTATIONS is True
+                        or connection.settings_dict.get("ATOMIC_MUTATIONS", False)
+                        is True
+                    )
+                ):
+                    with transaction.atomic():
+                        result = execute(schema, document, **execute_options)
+                        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                            transaction.set_rollback(True)
+                    return result
+                result = execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+        if timeout and not result.errors:
+            set_result(key, result.data, timeout)
+        return result
+
+    def json_encode(self, request, d, pretty=False):
+        """Encodes a response, with the extensions of the request.
+
+        Args:
+            request (HttpRequest): The request.
+            d (dict): The response.
+            pretty (bool): Whether to indent the JSON.
+
+        Returns:
+            str: The JSON of the response.
+        """
+        tracing = tracing_extension(request)
+        if tracing is not None:
+            d = {**d, "extensions": {"tracing": tracing}}
+        return super().json_encode(request, d, pretty)
+
+
+class GraphQLMetricsView(APIView):
+    """The resolver metrics of the GraphQL endpoint.
+
+    Only staff users can read the metrics. They are the histograms of the
+    process serving the request.
+
+    Attributes:
+        permission_classes (list): The permission classes of the view.
+
+    Methods:
+        get: Gets the metrics in the Prometheus text format.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request) -> HttpResponse:
+        """Gets the metrics in the Prometheus text format.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            HttpResponse: The metrics.
+        """
+        return HttpResponse(
+            render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -0,0 +1,207 @@
+"""
+This module contains the archive of the done tasks.
+
+The tasks done for longer than TASK_ARCHIVE_AGE seconds make up most of the
+tasks table, and every index and scan of the open tasks pays for them. They
+are moved to the archive tables, with their comments, mentions and assigned
+users, TASK_ARCHIVE_CHUNK_SIZE tasks per transaction, so that a run never
+holds the locks of more than a chunk at once.
+
+The rows are copied with one INSERT ... SELECT per table, in the database,
+and keep their pk. A restored task gets its URL, comments and mentions back.
+The files shared on an archived task stay with its project, and are linked to
+the task again when it is restored.
+
+Functions:
+    archive_done_tasks: Moves the tasks done before a date to the archive.
+    archive_chunk: Moves one chunk of the tasks done before a date to the archive.
+    restore_task: Moves an archived task back to the tasks.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from files.models import SharedFile
+
+from taskmanager.result_cache import invalidate_results
+
+from .models import (
+    ArchivedComment,
+    ArchivedMention,
+    ArchivedTask,
+    Comment,
+    Mention,
+    Task,
+)
+
+
+def _table(model: Any) -> str:
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _copy(
+    source: Any,
+    target: Any,
+    where: str,
+    params: list[Any],
+    renamed: Optional[dict[str, str]] = None,
+    values: Optional[dict[str, Any]] = None,
+) -> None:
+    # INSERT INTO target SELECT FROM source, for the columns the two tables
+    # share. `renamed` maps the columns of target to other columns of source,
+    # `values` sets columns of target to parameters. The rows of the through
+    # tables of many-to-many fields get new pks.
+    renamed = renamed or {}
+    values = values or {}
+    source_columns = {field.column for field in source._meta.concrete_fields}
+    columns, selected = [], []
+    for field in target._meta.concrete_fields:
+        column = renamed.get(field.column, field.column)
+        if field.primary_key and target._meta.auto_created:
+            continue
+        if field.column in values:
+            selected.append("%s")
+        elif column in source_columns:
+            selected.append(connection.ops.quote_name(column))
+        else:
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+    sql = (
+        f"INSERT INTO {_table(target)} ({', '.join(columns)}) "
+        f"SELECT {', '.join(selected)} FROM {_table(source)} WHERE {where}"
+    )
+    placeholders = [
+        values[field.column]
+        for field in target._meta.concrete_fields
+        if field.column in values
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, placeholders + params)
+
+
+def archive_chunk(before: datetime, chunk_size: int) -> int:
+    """
+    Moves one chunk of the tasks done before a date to the archive.
+
+    Must run in a transaction. The tasks are locked, and those locked by
+    another transaction, e.g. being reopened, are skipped until the next run.
+
+    Args:
+        before (datetime): The tasks done before this date are archived.
+        chunk_size (int): The maximum number of tasks to move.
+
+    Returns:
+        int: The number of tasks moved.
+    """
+    pks = list(
+        Task.objects.filter(status="DONE", completed_at__lt=before)
+        .order_by("completed_at", "pk")
+        .select_for_update(skip_locked=True)
+        .values_list("pk", flat=True)[:chunk_size]
+    )
+    if not pks:
+        return 0
+    _copy(
+        Task,
+        ArchivedTask,
+        "id = ANY(%s)",
+        [pks],
+        values={"archived_at": timezone.now()},
+    )
+    _copy(Comment, ArchivedComment, "task_id = ANY(%s)", [pks])
+    _copy(
+        Mention,
+        ArchivedMention,
+        f"comment_id IN (SELECT id FROM {_table(Comment)} WHERE task_id = ANY(%s))",
+        [pks],
+    )
+    _copy(
+        Task.assigned.through,
+        ArchivedTask.assigned.through,
+        "task_id = ANY(%s)",
+        [pks],
+        renamed={"archivedtask_id": "task_id"},
+    )
+    _copy(
+        SharedFile,
+        ArchivedTask.shared_files.through,
+        "task_id = ANY(%s)",
+        [pks],
+        renamed={"archivedtask_id": "task_id", "sharedfile_id": "id"},
+    )
+    # The files would be deleted with their task.
+    SharedFile.objects.filter(task_id__in=pks).update(task=None)
+    # Deleted with the ORM, for the signals of the tasks and comments.
+    Task.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archive_done_tasks(
+    before: Optional[datetime] = None, chunk_size: Optional[int] = None
+) -> int:
+    """
+    Moves the tasks done before a date to the archive, one chunk per transaction.
+
+    Args:
+        before (datetime, optional): The tasks done before this date are
+            archived, TASK_ARCHIVE_AGE seconds ago by default.
+        chunk_size (int, optional): The number of tasks per transaction,
+            TASK_ARCHIVE_CHUNK_SIZE by default.
+
+    Returns:
+        int: The number of tasks moved.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(seconds=settings.TASK_ARCHIVE_AGE)
+    chunk_size = chunk_size or settings.TASK_ARCHIVE_CHUNK_SIZE
+    total = 0
+    while True:
+        with transaction.atomic():
+            moved = archive_chunk(before, chunk_size)
+        total += moved
+        if moved < chunk_size:
+            return total
+
+
+@transaction.atomic
+def restore_task(pk: int) -> Task:
+    """
+    Moves an archived task back to the tasks, with its comments, mentions,
+    assigned users and files.
+
+    The restored task is done as of now, so that it isn't archived again
+    before TASK_ARCHIVE_AGE seconds.
+
+    Args:
+        pk (int): The pk of the archived task.
+
+    Returns:
+        Task: The restored task.
+
+    Raises:
+        ArchivedTask.DoesNotExist: If the task isn't archived.
+    """
+    archived = ArchivedTask.objects.select_for_update().get(pk=pk)
+    _copy(ArchivedTask, Task, "id = %s", [pk], values={"completed_at": timezone.now()})
+    _copy(ArchivedComment, Comment, "task_id = %s", [pk])
+    _copy(
+        ArchivedMention,
+        Mention,
+        f"comment_id IN (SELECT id FROM {_table(ArchivedComment)} WHERE task_id = %s)",
+        [pk],
+    )
+    _copy(
+        ArchivedTask.assigned.through,
+        Task.assigned.through,
+        "archivedtask_id = %s",
+        [pk],
+        renamed={"task_id": "archivedtask_id"},
+    )
+    SharedFile.objects.filter(archived_tasks=archived).update(task_id=pk)
+    archived.delete()
+    # The tasks were written without signals.
+    invalidate_results()
+    return Task.objects.get(pk=pk)
@@ -0,0 +1,56 @@
+"""Detach the partitions of the old months of the partitioned tables."""
+
+from datetime import datetime, time
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils.dateparse import parse_date
+
+from taskmanager.partitioning import detach_partitions, partitioned_tables
+
+
+class Command(BaseCommand):
+    """
+    Django command to detach the partitions of the old months of the
+    partitioned tables, see taskmanager.partitioning.
+
+    The detached partitions are left as tables of their own, to be dumped and
+    dropped, with the rows moved with them, e.g. the comments of the tasks of
+    a detached month written in a later month. Moving them takes as long as
+    there are such rows, PARTITION_DETACH_BATCH_SIZE rows per transaction,
+    then each partition is detached in a short transaction that locks its
+    table. Nothing is detached while files are shared on the tasks of a
+    detached month, until the files are deleted or the tasks archived.
+    """
+
+    help = "Detach the partitions of the old months of the partitioned tables"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--before",
+            required=True,
+            help="Detach the partitions ending on or before this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--table",
+            action="append",
+            dest="tables",
+            help="The partitioned table, every partitioned table by default",
+        )
+
+    def handle(self, *args, **options):
+        before = parse_date(options["before"])
+        if before is None:
+            raise CommandError(f"Invalid date: {options['before']}")
+        before = datetime.combine(before, time.min, tzinfo=dt_timezone.utc)
+        tables = partitioned_tables()
+        for table in options["tables"] or tables:
+            if table not in tables:
+                raise CommandError(f"{table} is not partitioned")
+            try:
+                detached = detach_partitions(table, before)
+            except ValueError as error:
+                raise CommandError(f"Can't detach from {table}: {error}") from error
+            for name in detached:
+                self.stdout.write(f"Detached {name} from {table}")
+        self.stdout.write(self.style.SUCCESS("Done"))
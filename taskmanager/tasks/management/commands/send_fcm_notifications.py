@@ -1,32 +1,71 @@
 """Send notifications to frontend using Firebase Cloud Messaging."""
 
-from django.core.management.base import BaseCommand
-from django.utils import timezone
+from celery import chord
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
 
-from tasks.models import Task
-from tasks.tasks import send_notification
+from tasks.models import NewTaskNotification
+from tasks.tasks import aggregate_notification_counts, send_new_task_notifications_shard
 
 
 class Command(BaseCommand):
-    """Django command to send notifications to frontend using Firebase Cloud Messaging."""
+    """
+    Django command to send notifications to frontend using Firebase Cloud Messaging.
+
+    New tasks are found through an outbox: the NewTaskNotification rows written
+    in the transactions of the tasks. Every task is notified once it's
+    committed, no matter how late it commits or how often the command runs.
+    Each chunk of the outbox is enqueued and deleted in one transaction, the
+    rows locked by another run are skipped.
+
+    The command only reads the keys of the new tasks: every chunk is fanned out
+    as shards of NOTIFICATION_SCAN_SHARD_SIZE tasks to the shards worker pool.
+    """
 
     help = "Send notifications to frontend using Firebase Cloud Messaging"
 
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of tasks to process per transaction",
+        )
+
     def handle(self, *args, **options):
-        new_tasks = self.get_new_tasks()
-        for task in new_tasks:
-            self.send_task_notifications(task)
-
-    def get_new_tasks(self):
-        """Get tasks created in the last 24 hours"""
-        one_day_ago = timezone.now() - timezone.timedelta(days=1)
-        return Task.objects.filter(created_at__gte=one_day_ago)
-
-    def send_task_notifications(self, task):
-        """Send notification to users when a new task is created"""
-        subject = "New task created"
-        message = f"New task {task.name} created"
-        for user in task.assigned.all():
-            expo_push_token = user.profile.expo_push_token
-            if expo_push_token:
-                send_notification.delay(subject, message, expo_push_token)
+        processed = 0
+        while True:
+            count = self.process_chunk(options["chunk_size"])
+            if not count:
+                break
+            processed += count
+        self.stdout.write(self.style.SUCCESS(f"Notified {processed} new tasks"))
+
+    @transaction.atomic
+    def process_chunk(self, chunk_size):
+        """Enqueue the next chunk of new tasks and delete their rows"""
+        new_tasks = list(self.get_new_tasks(chunk_size))
+        if new_tasks:
+            self.send_task_notifications([task_pk for _, task_pk in new_tasks])
+            NewTaskNotification.objects.filter(
+                pk__in=[pk for pk, _ in new_tasks]
+            ).delete()
+        return len(new_tasks)
+
+    def get_new_tasks(self, chunk_size):
+        """Lock the rows of the next new tasks, oldest first"""
+        return (
+            NewTaskNotification.objects.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values_list("pk", "task_id")[:chunk_size]
+        )
+
+    def send_task_notifications(self, task_pks):
+        """Fan out the notifications of the new tasks to the shard workers"""
+        shard_size = settings.NOTIFICATION_SCAN_SHARD_SIZE
+        shards = [
+            send_new_task_notifications_shard.s(task_pks[start : start + shard_size])
+            for start in range(0, len(task_pks), shard_size)
+        ]
+        chord(shards)(aggregate_notification_counts.s("send_fcm_notifications"))
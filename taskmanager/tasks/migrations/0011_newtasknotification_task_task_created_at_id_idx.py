@@ -0,0 +1,25 @@
+# Generated by Django 4.2.9 on 2026-10-19 08:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_alter_comment_creator_alter_mention_mentioned_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewTaskNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.task')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_at', 'id'], name='task_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_newtasknotification_task_task_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='task_project_created_at_idx'),
+        ),
+    ]
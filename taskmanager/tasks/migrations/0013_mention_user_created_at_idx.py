@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_task_project_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mention',
+            index=models.Index(fields=['mentioned_user', 'created_at', 'id'], name='mention_user_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models.functions import Now
+
+
+def stamp_done_tasks(apps, _schema_editor):
+    # When the tasks done before were done is unknown, they are archived
+    # TASK_ARCHIVE_AGE seconds after the migration.
+    Task = apps.get_model("tasks", "Task")
+    Task.objects.filter(status="DONE").update(completed_at=Now())
+
+
+class Migration(migrations.Migration):
+    """
+    Adds when the tasks were done, and the tables of the archived tasks.
+    """
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('files', '0004_sharedfile_project_uploaded_at_idx'),
+        ('projects', '0007_project_users_user_project_idx'),
+        ('tasks', '0013_mention_user_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('content', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMention',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('start_date', models.DateTimeField()),
+                ('end_date', models.DateTimeField()),
+                ('description', models.TextField()),
+                ('priority', models.CharField(choices=[('ASAP', 'Asap'), ('MEDIUM', 'Medium'), ('LOW', 'Low')], max_length=6)),
+                ('status', models.CharField(choices=[('TODO', 'To Do'), ('INPROGRESS', 'In Progress'), ('DONE', 'Done')], max_length=20)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(stamp_done_tasks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 'DONE')), fields=['completed_at', 'id'], name='task_done_completed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='assigned',
+            field=models.ManyToManyField(related_name='archived_tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_created_tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to='projects.project'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='shared_files',
+            field=models.ManyToManyField(blank=True, related_name='archived_tasks', to='files.sharedfile'),
+        ),
+        migrations.AddField(
+            model_name='archivedmention',
+            name='comment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='tasks.archivedcomment'),
+        ),
+        migrations.AddField(
+            model_name='archivedmention',
+            name='mentioned_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_mentions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='tasks.archivedtask'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['project', 'completed_at', 'id'], name='archived_task_project_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.9 on 2026-10-19 10:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from taskmanager.partitioning import PartitionByRange
+
+
+class Migration(migrations.Migration):
+    """
+    Partitions the tasks and the comments by month of creation.
+
+    The foreign keys to the tasks and the comments are dropped first, a
+    partitioned table can't be referenced by its id alone.
+    """
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0014_task_completed_at_archivedtask_and_more'),
+        ('files', '0005_sharedfile_task_db_constraint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='task',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='tasks.task'),
+        ),
+        migrations.AlterField(
+            model_name='mention',
+            name='comment',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='tasks.comment'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='assigned',
+            field=models.ManyToManyField(db_constraint=False, related_name='tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        PartitionByRange('task', 'created_at'),
+        PartitionByRange('comment', 'created_at'),
+    ]
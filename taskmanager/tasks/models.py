@@ -5,6 +5,10 @@ Classes:
     Task: A class that represents a task.
     Comment: A class that represents a comment.
     Mention: A class that represents a mention.
+    NewTaskNotification: A class that represents the notifications of a new task to send.
+    ArchivedTask: A class that represents a task moved to the archive.
+    ArchivedComment: A class that represents a comment of an archived task.
+    ArchivedMention: A class that represents a mention of an archived comment.
 
 Functions:
     validate_start_date: A function that validates the start date of a task.
@@ -16,7 +20,7 @@ from datetime import datetime
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from projects.models import Project
 
@@ -61,6 +65,8 @@ class Task(models.Model):
         description (TextField): The description of the task.
         priority (CharField): The priority of the task.
         status (CharField): The status of the task.
+        completed_at (DateTimeField): The date and time the task was done, None
+            while it isn't done.
         assigned (ManyToManyField): The users assigned to the task.
         creator (ForeignKey): The user who created the task.
     """
@@ -90,9 +96,12 @@ class Task(models.Model):
         ("DONE", "Done"),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="TODO")
+    completed_at = models.DateTimeField(null=True, blank=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="tasks")
+    # The tasks are partitioned, their references are enforced by Django only,
+    # see taskmanager.partitioning.
     assigned: models.ManyToManyField = models.ManyToManyField(
-        get_user_model(), related_name="tasks"
+        get_user_model(), related_name="tasks", db_constraint=False
     )
     creator = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="created_tasks"
@@ -116,6 +125,48 @@ class Task(models.Model):
                 name="task_end_date_gte_start_date",
             ),
         ]
+        indexes = [
+            # Keyset scans in (created_at, pk) order.
+            models.Index(fields=["created_at", "id"], name="task_created_at_id_idx"),
+            # The tasks connection of a project, newest first.
+            models.Index(
+                fields=["project", "created_at", "id"],
+                name="task_project_created_at_idx",
+            ),
+            # The done tasks to archive, oldest first, see tasks.archive.
+            models.Index(
+                fields=["completed_at", "id"],
+                condition=models.Q(status="DONE"),
+                name="task_done_completed_at_idx",
+            ),
+        ]
+
+    def set_completed_at(self) -> None:
+        """
+        Sets when the task was done from its status: now when it becomes done,
+        None when it is reopened.
+        """
+        if self.status != "DONE":
+            self.completed_at = None
+        elif self.completed_at is None:
+            self.completed_at = timezone.now()
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Saves the task, and sets when it was done.
+
+        A new task is queued for its notifications in the same transaction,
+        see NewTaskNotification.
+        """
+        self.set_completed_at()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "status" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "completed_at"}
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                NewTaskNotification.objects.create(task=self)
 
     @property
     @admin.display(
@@ -164,7 +215,9 @@ class Comment(models.Model):
         content (TextField): The content of the comment.
     """
 
-    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="comments")
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="comments", db_constraint=False
+    )
     creator = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="comments"
     )
@@ -190,13 +243,185 @@ class Mention(models.Model):
     """
 
     comment = models.ForeignKey(
-        Comment, on_delete=models.CASCADE, related_name="mentions"
+        Comment, on_delete=models.CASCADE, related_name="mentions", db_constraint=False
     )
     mentioned_user = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="mentions"
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        """
+        Meta class that defines the indexes for the Mention model.
+        """
+
+        indexes = [
+            # The mention inbox of a user, newest first.
+            models.Index(
+                fields=["mentioned_user", "created_at", "id"],
+                name="mention_user_created_at_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns:
+            str: The user who was mentioned.
+        """
+        return str(self.mentioned_user)
+
+
+class NewTaskNotification(models.Model):
+    """
+    A class that represents the notifications of a new task to send.
+
+    The outbox of the new tasks: the row is written in the transaction of the
+    task, and deleted once the notifications are enqueued by the send_fcm_notifications command. A task
+    is found once it's committed, however late its transaction commits.
+
+    Attributes:
+        task (ForeignKey): The new task.
+    """
+
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name="+",
+        # The tasks are partitioned, see taskmanager.partitioning.
+        db_constraint=False,
+    )
+
+    def __str__(self) -> str:
+        """
+        Returns:
+            str: The pk of the new task.
+        """
+        return f"New task {self.task_id}"
+
+
+class ArchivedTask(models.Model):
+    """
+    A class that represents a task moved to the archive.
+
+    The tasks done for longer than TASK_ARCHIVE_AGE seconds are moved out of
+    the tasks table with their comments, mentions and assigned users, see
+    tasks.archive. An archived task keeps its pk, so that a restored task
+    gets its URL back.
+
+    Attributes:
+        id (BigIntegerField): The pk the task had, and gets back when restored.
+        name (CharField): The name of the task.
+        created_at (DateTimeField): The date and time the task was created.
+        start_date (DateTimeField): The date and time the task was scheduled to start.
+        end_date (DateTimeField): The date and time the task was scheduled to end.
+        description (TextField): The description of the task.
+        priority (CharField): The priority of the task.
+        status (CharField): The status of the task.
+        completed_at (DateTimeField): The date and time the task was done.
+        archived_at (DateTimeField): The date and time the task was archived.
+        project (ForeignKey): The project of the task.
+        assigned (ManyToManyField): The users assigned to the task.
+        creator (ForeignKey): The user who created the task.
+        shared_files (ManyToManyField): The files that were shared on the task.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField()
+    start_date = models.DateTimeField()
+    end_date = models.DateTimeField()
+    description = models.TextField()
+    priority = models.CharField(max_length=6, choices=Task.PRIORITY_CHOICES)
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="archived_tasks"
+    )
+    assigned: models.ManyToManyField = models.ManyToManyField(
+        get_user_model(), related_name="archived_tasks"
+    )
+    creator = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="archived_created_tasks",
+    )
+    # The files stay with their project while the task is archived.
+    shared_files: models.ManyToManyField = models.ManyToManyField(
+        "files.SharedFile", related_name="archived_tasks", blank=True
+    )
+
+    class Meta:
+        """
+        Meta class that defines the indexes for the ArchivedTask model.
+        """
+
+        indexes = [
+            # The archive of a project, the last done first.
+            models.Index(
+                fields=["project", "completed_at", "id"],
+                name="archived_task_project_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns:
+            str: The name of the task.
+        """
+        return str(self.name)
+
+
+class ArchivedComment(models.Model):
+    """
+    A class that represents a comment of an archived task.
+
+    Attributes:
+        id (BigIntegerField): The pk the comment had.
+        task (ForeignKey): The archived task of the comment.
+        creator (ForeignKey): The user who created the comment.
+        created_at (DateTimeField): The date and time the comment was created.
+        content (TextField): The content of the comment.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    task = models.ForeignKey(
+        ArchivedTask, on_delete=models.CASCADE, related_name="comments"
+    )
+    creator = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="archived_comments"
+    )
+    created_at = models.DateTimeField()
+    content = models.TextField()
+
+    def __str__(self) -> str:
+        """
+        Returns:
+            str: The content of the comment.
+        """
+        return str(self.content)
+
+
+class ArchivedMention(models.Model):
+    """
+    A class that represents a mention of an archived comment.
+
+    Attributes:
+        id (BigIntegerField): The pk the mention had.
+        comment (ForeignKey): The archived comment of the mention.
+        mentioned_user (ForeignKey): The user who was mentioned.
+        created_at (DateTimeField): The date and time the mention was created.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    comment = models.ForeignKey(
+        ArchivedComment, on_delete=models.CASCADE, related_name="mentions"
+    )
+    mentioned_user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="archived_mentions"
+    )
+    created_at = models.DateTimeField()
+
     def __str__(self) -> str:
         """
         Returns:
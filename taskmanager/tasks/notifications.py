@@ -0,0 +1,151 @@
+"""
+This module contains the notification coalescing stage for the tasks app.
+
+Mentions are buffered per user in Redis for a short window and then flushed as
+one summarized push, so a busy comment thread does not send one push (and one
+Celery job) per mention. Flushes are also subject to a per-user rate cap.
+
+Functions:
+    queue_mention_notification: Buffers a mention and schedules the digest flush.
+    drain_mention_digest: Atomically reads and clears the buffered mentions of a user.
+    requeue_mention_digest: Puts drained mentions back into the buffer.
+    acquire_push_slot: Checks and consumes the per-user push rate cap.
+    build_mention_digest: Builds the subject and message of a digest push.
+"""
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+KEY_PREFIX = "taskmanager:notifications"
+
+
+def _digest_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}:mentions:{user_id}"
+
+
+def _pending_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}:mentions:{user_id}:pending"
+
+
+def _rate_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}:rate:{user_id}"
+
+
+def queue_mention_notification(user_id: int, task_id: int) -> None:
+    """
+    Buffers a mention of the user in the task.
+
+    The first mention of a window schedules the digest flush; later mentions in
+    the same window are only counted.
+
+    Args:
+        user_id (int): The pk of the mentioned user.
+        task_id (int): The pk of the task the mention was made in.
+    """
+    # Imported here, tasks.tasks imports this module.
+    from .tasks import send_mention_digest
+
+    window = settings.NOTIFICATION_DIGEST_WINDOW
+    connection = get_redis_connection("default")
+    pipeline = connection.pipeline()
+    pipeline.hincrby(_digest_key(user_id), str(task_id), 1)
+    # The buffer outlives a lost flush job, but not forever.
+    pipeline.expire(_digest_key(user_id), window * 10)
+    pipeline.set(_pending_key(user_id), 1, nx=True, ex=window * 2)
+    _, _, scheduled = pipeline.execute()
+    if scheduled:
+        send_mention_digest.apply_async(args=[user_id], countdown=window)
+
+
+def drain_mention_digest(user_id: int) -> dict[int, int]:
+    """
+    Atomically reads and clears the buffered mentions of the user.
+
+    Args:
+        user_id (int): The pk of the mentioned user.
+
+    Returns:
+        dict[int, int]: The number of mentions per task pk.
+    """
+    connection = get_redis_connection("default")
+    pipeline = connection.pipeline(transaction=True)
+    pipeline.hgetall(_digest_key(user_id))
+    pipeline.delete(_digest_key(user_id), _pending_key(user_id))
+    counts, _ = pipeline.execute()
+    return {int(task_id): int(count) for task_id, count in counts.items()}
+
+
+def requeue_mention_digest(user_id: int, counts: dict[int, int], delay: int) -> None:
+    """
+    Puts drained mentions back into the buffer and reschedules the flush.
+
+    Args:
+        user_id (int): The pk of the mentioned user.
+        counts (dict[int, int]): The number of mentions per task pk.
+        delay (int): The number of seconds to wait before flushing again.
+    """
+    from .tasks import send_mention_digest
+
+    connection = get_redis_connection("default")
+    pipeline = connection.pipeline()
+    for task_id, count in counts.items():
+        pipeline.hincrby(_digest_key(user_id), str(task_id), count)
+    pipeline.expire(
+        _digest_key(user_id), delay + settings.NOTIFICATION_DIGEST_WINDOW * 10
+    )
+    pipeline.set(_pending_key(user_id), 1, ex=delay * 2)
+    pipeline.execute()
+    send_mention_digest.apply_async(args=[user_id], countdown=delay)
+
+
+def acquire_push_slot(user_id: int) -> int:
+    """
+    Consumes one push from the per-user rate cap.
+
+    Args:
+        user_id (int): The pk of the user the push is sent to.
+
+    Returns:
+        int: 0 if the push may be sent, otherwise the number of seconds until
+            the cap resets.
+    """
+    connection = get_redis_connection("default")
+    pipeline = connection.pipeline()
+    pipeline.set(_rate_key(user_id), 0, nx=True, ex=settings.NOTIFICATION_RATE_PERIOD)
+    pipeline.incr(_rate_key(user_id))
+    pipeline.ttl(_rate_key(user_id))
+    _, sent, ttl = pipeline.execute()
+    if sent > settings.NOTIFICATION_RATE_LIMIT:
+        return max(ttl, 1)
+    return 0
+
+
+def build_mention_digest(
+    counts: dict[int, int], names: dict[int, str]
+) -> tuple[str, str]:
+    """
+    Builds the subject and message of a digest push.
+
+    A single mention keeps the wording of an individual notification.
+
+    Args:
+        counts (dict[int, int]): The number of mentions per task pk.
+        names (dict[int, str]): The task names per task pk.
+
+    Returns:
+        tuple[str, str]: The subject and the message of the push.
+    """
+    total = sum(counts.values())
+    if total == 1:
+        (task_id,) = counts
+        return (
+            "You have been mentioned",
+            f"You have been mentioned in the task {names.get(task_id, '')}",
+        )
+    if len(counts) == 1:
+        (task_id,) = counts
+        return (
+            "You have new mentions",
+            f"{total} new mentions in the task {names.get(task_id, '')}",
+        )
+    return "You have new mentions", f"{total} new mentions in {len(counts)} tasks"
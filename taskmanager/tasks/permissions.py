@@ -10,10 +10,14 @@ Classes:
     - IsProjectMember: Custom permission class that allows only project members to view and edit comments associated with the project.
 """
 
+from django.core.exceptions import ValidationError
+from projects import membership
 from rest_framework import permissions
 from rest_framework.request import Request
 from rest_framework.views import APIView
 
+from taskmanager.loaders import identity_map
+
 from .models import Comment, Mention, Task
 
 
@@ -79,10 +83,7 @@ class IsProjectMemberOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        return (
-            obj.project.owner == request.user
-            or obj.project.users.filter(pk=request.user.pk).exists()
-        )
+        return membership.is_member(request, obj.project_id)
 
 
 class IsMentionedUser(permissions.BasePermission):
@@ -140,13 +141,8 @@ class IsProjectMember(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        task = obj.task
-        project = task.project
-
-        return (
-            project.owner == request.user
-            or project.users.filter(pk=request.user.pk).exists()
-        )
+        task = identity_map(request).get(Task, obj.task_id)
+        return membership.is_member(request, task.project_id)
 
     def has_permission(self, request: Request, view: APIView) -> bool:
         """
@@ -162,12 +158,10 @@ class IsProjectMember(permissions.BasePermission):
         if request.method == "POST":
             task_id = request.data.get("task")
             if task_id is not None:
+                # The serializer gets the task from the identity map after.
                 try:
-                    task = Task.objects.get(pk=task_id)
-                    return (
-                        task.project.users.filter(pk=request.user.pk).exists()
-                        or task.project.owner == request.user
-                    )
-                except Task.DoesNotExist:
+                    task = identity_map(request).get(Task, task_id)
+                except (Task.DoesNotExist, ValidationError):
                     return False
+                return membership.is_member(request, task.project_id)
         return True
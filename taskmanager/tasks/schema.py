@@ -3,20 +3,48 @@ This file contains the schema for the tasks app.
 
 Classes:
     TaskType: A class that represents the task type.
+    TaskConnection: A class that represents a page of tasks.
     Query: A class that represents the query type.
+    CreateTask: A class that represents the create task mutation.
+    TaskInput: A class that represents the input of a new task.
+    TaskUpdateInput: A class that represents the changes to a task.
+    TaskStatusInput: A class that represents the new status of a task.
+    TaskResult: A class that represents the result of a bulk mutation for one task.
+    CreateTasks: A class that represents the bulk create tasks mutation.
+    UpdateTasks: A class that represents the bulk update tasks mutation.
+    SetTaskStatuses: A class that represents the bulk set task statuses mutation.
+    Mutation: A class that represents the mutation type.
 
 Functions:
     resolve_all_tasks: A function that resolves all tasks.
     resolve_by_creator: A function that resolves tasks by creator.
+    resolve_tasks: A function that resolves a page of tasks.
+    member_projects: A function that returns the projects a user is a member of.
+    editable_tasks: A function that returns the tasks a user may edit.
 """
 
+from collections import defaultdict
+
 import graphene
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
 from django.db.models import Q
+from django.db.models.functions import Coalesce, Now
 from graphene_django import DjangoObjectType
 from graphql import GraphQLError
 from profiles.schema import UserType
+from projects import membership
+from projects.events import publish_many
+from projects.scoping import visible_to
+
+from taskmanager.connections import CountableConnection, paginate
+from taskmanager.loaders import identity_map
+from taskmanager.query_optimizer import optimize_queryset
+from taskmanager.result_cache import invalidate_results
 
-from .models import Task
+from .models import NewTaskNotification, Project, Task
 
 
 class TaskType(DjangoObjectType):
@@ -62,17 +90,41 @@ class TaskType(DjangoObjectType):
         """
         return self.assigned.all()
 
-    def resolve_creator(self, _):
+    def resolve_creator(self, info):
         """
         Resolves the user who created the task.
 
+        A creator that wasn't selected with the task is looked up in the
+        identity map of the request, so it is fetched once per request.
+
         Args:
             info: The query info.
 
         Returns:
             The user who created the task.
         """
-        return self.creator
+        if Task.creator.is_cached(self):
+            return self.creator
+        return identity_map(info.context).get(get_user_model(), self.creator_id)
+
+
+class TaskConnection(CountableConnection):
+    """
+    A class that represents a page of tasks.
+
+    Methods:
+        Meta: A class that contains the node type.
+    """
+
+    class Meta:
+        """
+        A class that contains the node type.
+
+        Attributes:
+            node: The task type.
+        """
+
+        node = TaskType
 
 
 class Query(graphene.ObjectType):
@@ -82,38 +134,58 @@ class Query(graphene.ObjectType):
     Methods:
         all_tasks: A method that resolves all tasks.
         task_by_creator: A method that resolves tasks by creator.
+        tasks: A method that resolves a page of tasks.
     """
 
+    # Newest first, the task_created_at_id_idx index order.
+    TASK_ORDERING = ("-created_at", "-pk")
+
     all_tasks = graphene.List(
         TaskType, search=graphene.String(), first=graphene.Int(), skip=graphene.Int()
     )
     task_by_creator = graphene.List(TaskType, creator=graphene.String())
+    tasks = graphene.Field(
+        TaskConnection,
+        first=graphene.Int(),
+        after=graphene.String(),
+        search=graphene.String(),
+        status=graphene.String(),
+        priority=graphene.String(),
+        project=graphene.ID(),
+        assignee=graphene.ID(),
+    )
 
-    def resolve_all_tasks(self, _, search=None, first=None, skip=None):
+    def resolve_all_tasks(self, info, search=None, first=None, skip=None):
         """
-        Resolves all tasks.
+        Resolves the tasks of the projects of the user.
+
+        The related users and profiles selected by the query are loaded with
+        the tasks, in a fixed number of queries.
 
         Args:
-            _: The parent resolver info.
+            info: The query info.
             search (str, optional): A string to search for in task names and descriptions.
 
         Returns:
-            A list of all tasks that match the search criteria if provided, otherwise all tasks.
+            A list of the tasks that match the search criteria if provided, otherwise
+            all the tasks of the user.
 
         """
+        tasks = optimize_queryset(visible_tasks(info.context.user), info)
         if search:
             filter_query = Q(name__icontains=search) | Q(description__icontains=search)
-            return Task.objects.filter(filter_query)
-        if first:
-            return Task.objects.all()[:first]
+            tasks = tasks.filter(filter_query)
         if skip:
-            return Task.objects.all()[skip:]
+            tasks = tasks[skip:]
+        if first:
+            # At most a page, as the query cost counts it.
+            return tasks[: min(first, settings.GRAPHQL_MAX_PAGE_SIZE)]
 
-        return Task.objects.all()
+        return tasks
 
-    def resolve_task_by_creator(self, _, creator):
+    def resolve_task_by_creator(self, info, creator):
         """
-        Resolves tasks by creator.
+        Resolves the tasks of the projects of the user by creator.
 
         Args:
             info: The query info.
@@ -122,7 +194,57 @@ class Query(graphene.ObjectType):
         Returns:
             A list of tasks by creator.
         """
-        return Task.objects.filter(creator__username=creator)
+        return optimize_queryset(
+            visible_tasks(info.context.user).filter(creator__username=creator), info
+        )
+
+    def resolve_tasks(
+        self,
+        info,
+        first=None,
+        after=None,
+        search=None,
+        status=None,
+        priority=None,
+        project=None,
+        assignee=None,
+    ):
+        """
+        Resolves a page of the tasks of the projects of the user, newest first.
+
+        Args:
+            info: The query info.
+            first (int, optional): The number of tasks in the page.
+            after (str, optional): The cursor of the task the page starts after.
+            search (str, optional): A string to search for in task names and descriptions.
+            status (str, optional): The status of the tasks.
+            priority (str, optional): The priority of the tasks.
+            project (str, optional): The id of the project of the tasks.
+            assignee (str, optional): The id of a user assigned to the tasks.
+
+        Returns:
+            TaskConnection: The page of tasks.
+        """
+        tasks = visible_tasks(info.context.user)
+        if search:
+            tasks = tasks.filter(
+                Q(name__icontains=search) | Q(description__icontains=search)
+            )
+        if status:
+            tasks = tasks.filter(status=status)
+        if priority:
+            tasks = tasks.filter(priority=priority)
+        if project:
+            tasks = tasks.filter(project_id=project)
+        if assignee:
+            tasks = tasks.filter(assigned=assignee)
+        return paginate(
+            optimize_queryset(tasks, info, path=("edges", "node")),
+            TaskConnection,
+            Query.TASK_ORDERING,
+            first,
+            after,
+        )
 
 
 class StatusEnum(graphene.Enum):
@@ -161,6 +283,7 @@ class CreateTask(graphene.Mutation):
             creator: The creator of the task.
             assigned: The users assigned to the task.
             status: The status of the task.
+            project: The project of the task.
         """
 
         name = graphene.String()
@@ -168,6 +291,7 @@ class CreateTask(graphene.Mutation):
         status = StatusEnum()
         start_date = graphene.DateTime(required=True)
         end_date = graphene.DateTime(required=True)
+        project = graphene.ID(required=True)
 
     def mutate(
         self,
@@ -175,6 +299,7 @@ class CreateTask(graphene.Mutation):
         name,
         status,
         description,
+        project,
         start_date=None,
         end_date=None,
     ):
@@ -188,6 +313,7 @@ class CreateTask(graphene.Mutation):
             status: The status of the task.
             start_date: The start date of the task.
             end_date: The end date of the task.
+            project: The id of the project of the task.
 
         Returns:
             The created task.
@@ -195,6 +321,8 @@ class CreateTask(graphene.Mutation):
         user = info.context.user
         if user.is_anonymous:
             raise GraphQLError("You must be logged in to create a task!")
+        if not member_projects(user, [project]):
+            raise GraphQLError("You are not a member of the project!")
 
         task = Task.objects.create(
             name=name,
@@ -203,17 +331,474 @@ class CreateTask(graphene.Mutation):
             status=status.value,
             start_date=start_date,
             end_date=end_date,
+            project_id=project,
         )
 
         return CreateTask(task=task)
 
 
+def _parse_ids(ids) -> list:
+    parsed = []
+    for pk in ids:
+        try:
+            parsed.append(int(pk))
+        except (TypeError, ValueError):
+            parsed.append(None)
+    return parsed
+
+
+def visible_tasks(user):
+    """
+    Returns the tasks of the projects a user is a member or the owner of.
+
+    Args:
+        user (User): The user.
+
+    Returns:
+        QuerySet: The tasks the user can see.
+
+    Raises:
+        PermissionDenied: If the user is anonymous.
+    """
+    if not user.is_authenticated:
+        raise PermissionDenied("Authentication credentials were not provided.")
+    return Task.objects.filter(visible_to(user, "project"))
+
+
+def member_projects(user, project_ids) -> set[int]:
+    """
+    Returns the projects a user is a member or the owner of, in one query.
+
+    Args:
+        user (User): The user.
+        project_ids (Iterable): The ids of the projects to check.
+
+    Returns:
+        set[int]: The ids of the projects the user is a member or the owner of.
+    """
+    project_ids = {pk for pk in _parse_ids(project_ids) if pk is not None}
+    return set(
+        Project.objects.filter(visible_to(user), pk__in=project_ids)
+        .order_by()
+        .values_list("pk", flat=True)
+    )
+
+
+def editable_tasks(user, task_ids) -> dict[int, Task]:
+    """
+    Returns the tasks a user may edit, in one query.
+
+    As in the REST API, a task may be edited by its creator while they are a
+    member or the owner of its project.
+
+    Args:
+        user (User): The user.
+        task_ids (Iterable): The ids of the tasks to check.
+
+    Returns:
+        dict[int, Task]: The tasks the user may edit by id.
+    """
+    return Task.objects.filter(visible_to(user, "project"), creator=user).in_bulk(
+        task_ids
+    )
+
+
+def _validation_messages(error: ValidationError) -> list[str]:
+    return [
+        f"{field}: {message}"
+        for field, messages in error.message_dict.items()
+        for message in messages
+    ]
+
+
+def _clean(task: Task, fields: list[str]) -> list[str]:
+    # Only the given fields are validated. Related fields are checked set-wise
+    # by the mutations, the date order constraint is checked here instead of
+    # by one query per task.
+    exclude = [
+        field.name for field in Task._meta.concrete_fields if field.name not in fields
+    ]
+    errors = []
+    try:
+        task.clean_fields(exclude=exclude)
+    except ValidationError as e:
+        errors.extend(_validation_messages(e))
+    if task.start_date and task.end_date and task.start_date > task.end_date:
+        errors.append("end_date: End date cannot be earlier than start date")
+    return errors
+
+
+class TaskInput(graphene.InputObjectType):
+    """
+    A class that represents the input of a new task.
+
+    Attributes:
+        name: The name of the task.
+        description: The description of the task.
+        status: The status of the task, one of TODO, INPROGRESS and DONE.
+        priority: The priority of the task, one of ASAP, MEDIUM and LOW.
+        start_date: The start date of the task.
+        end_date: The end date of the task.
+        project: The id of the project of the task.
+        assigned: The ids of the users assigned to the task.
+    """
+
+    name = graphene.String(required=True)
+    description = graphene.String(required=True)
+    status = graphene.String()
+    priority = graphene.String()
+    start_date = graphene.DateTime(required=True)
+    end_date = graphene.DateTime(required=True)
+    project = graphene.ID(required=True)
+    assigned = graphene.List(graphene.NonNull(graphene.ID))
+
+
+class TaskUpdateInput(graphene.InputObjectType):
+    """
+    A class that represents the changes to a task.
+
+    Attributes:
+        id: The id of the task.
+        name: The new name of the task.
+        description: The new description of the task.
+        status: The new status of the task.
+        priority: The new priority of the task.
+        start_date: The new start date of the task.
+        end_date: The new end date of the task.
+    """
+
+    id = graphene.ID(required=True)
+    name = graphene.String()
+    description = graphene.String()
+    status = graphene.String()
+    priority = graphene.String()
+    start_date = graphene.DateTime()
+    end_date = graphene.DateTime()
+
+
+class TaskStatusInput(graphene.InputObjectType):
+    """
+    A class that represents the new status of a task.
+
+    Attributes:
+        id: The id of the task.
+        status: The new status of the task.
+    """
+
+    id = graphene.ID(required=True)
+    status = graphene.String(required=True)
+
+
+class TaskResult(graphene.ObjectType):
+    """
+    A class that represents the result of a bulk mutation for one task.
+
+    Attributes:
+        task: The created or updated task, null if the item failed.
+        errors: The errors of the item, empty if it succeeded.
+    """
+
+    task = graphene.Field(TaskType)
+    errors = graphene.List(graphene.NonNull(graphene.String), required=True)
+
+
+def _results(info, pks, errors) -> list[TaskResult]:
+    # Loads the tasks of the successful items in one query, in input order.
+    saved = {pk for pk, item_errors in zip(pks, errors) if not item_errors}
+    tasks = optimize_queryset(
+        Task.objects.filter(pk__in=saved), info, path=("results", "task")
+    ).in_bulk()
+    return [
+        TaskResult(task=None if item_errors else tasks.get(pk), errors=item_errors)
+        for pk, item_errors in zip(pks, errors)
+    ]
+
+
+def _publish(tasks, action: str) -> None:
+    # Bulk writes send no signals, the events of projects.signals are
+    # published here.
+    publish_many(
+        [
+            (task.project_id, f"task.{action}", {"id": task.pk, "status": task.status})
+            for task in tasks
+        ]
+    )
+
+
+class CreateTasks(graphene.Mutation):
+    """
+    A class that represents the bulk create tasks mutation.
+
+    The valid tasks are inserted with one statement, and their assignments
+    with another, in one transaction. Invalid items are reported in their
+    result and skipped.
+
+    Methods:
+        Arguments: A class that represents the arguments for the mutation.
+        mutate: A method that creates the tasks.
+    """
+
+    results = graphene.List(graphene.NonNull(TaskResult), required=True)
+
+    class Arguments:
+        """
+        A class that represents the arguments for the mutation.
+
+        Attributes:
+            tasks: The tasks to create.
+        """
+
+        tasks = graphene.List(graphene.NonNull(TaskInput), required=True)
+
+    @transaction.atomic
+    def mutate(self, info, tasks):
+        """
+        Creates the tasks.
+
+        Args:
+            info: The query info.
+            tasks: The tasks to create.
+
+        Returns:
+            The result of every task, in input order.
+        """
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("You must be logged in to create tasks!")
+        if len(tasks) > settings.GRAPHQL_MAX_BULK_SIZE:
+            raise GraphQLError(
+                f"At most {settings.GRAPHQL_MAX_BULK_SIZE} tasks can be created at once"
+            )
+
+        project_ids = _parse_ids(item.project for item in tasks)
+        projects = member_projects(user, project_ids)
+        assigned_ids = [_parse_ids(item.assigned or []) for item in tasks]
+        # The projects of all the assigned users at once, the users that don't
+        # exist have none.
+        assigned_projects = membership.user_project_ids(
+            {pk for ids in assigned_ids for pk in ids if pk is not None}
+        )
+
+        new_tasks, errors = [], []
+        for item, project_id, user_ids in zip(tasks, project_ids, assigned_ids):
+            task = Task(
+                name=item.name,
+                description=item.description,
+                status=item.status or "TODO",
+                priority=item.priority or "LOW",
+                start_date=item.start_date,
+                end_date=item.end_date,
+                project_id=project_id,
+                creator=user,
+            )
+            item_errors = _clean(
+                task,
+                ["name", "description", "status", "priority", "start_date", "end_date"],
+            )
+            if project_id not in projects:
+                item_errors.append("project: You are not a member of the project")
+            # Bulk inserts don't call save().
+            task.set_completed_at()
+            if any(project_id not in assigned_projects.get(pk, ()) for pk in user_ids):
+                item_errors.append("assigned: User is not a member of the project")
+            new_tasks.append(task)
+            errors.append(item_errors)
+
+        created = Task.objects.bulk_create(
+            [task for task, item_errors in zip(new_tasks, errors) if not item_errors]
+        )
+        # Queued in the transaction of the tasks, see NewTaskNotification.
+        NewTaskNotification.objects.bulk_create(
+            [NewTaskNotification(task=task) for task in created]
+        )
+        Assigned = Task.assigned.through
+        Assigned.objects.bulk_create(
+            [
+                Assigned(task_id=task.pk, user_id=user_id)
+                for task, user_ids, item_errors in zip(new_tasks, assigned_ids, errors)
+                if not item_errors
+                for user_id in set(user_ids)
+            ]
+        )
+        # Bulk inserts send no signals.
+        invalidate_results()
+        _publish(created, "created")
+        return CreateTasks(
+            results=_results(info, [task.pk for task in new_tasks], errors)
+        )
+
+
+class UpdateTasks(graphene.Mutation):
+    """
+    A class that represents the bulk update tasks mutation.
+
+    The permissions of every task are checked with one query, and the valid
+    changes are written with one statement, in one transaction.
+
+    Methods:
+        Arguments: A class that represents the arguments for the mutation.
+        mutate: A method that updates the tasks.
+    """
+
+    FIELDS = ("name", "description", "status", "priority", "start_date", "end_date")
+
+    results = graphene.List(graphene.NonNull(TaskResult), required=True)
+
+    class Arguments:
+        """
+        A class that represents the arguments for the mutation.
+
+        Attributes:
+            tasks: The changes to the tasks.
+        """
+
+        tasks = graphene.List(graphene.NonNull(TaskUpdateInput), required=True)
+
+    @transaction.atomic
+    def mutate(self, info, tasks):
+        """
+        Updates the tasks.
+
+        Args:
+            info: The query info.
+            tasks: The changes to the tasks.
+
+        Returns:
+            The result of every task, in input order.
+        """
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("You must be logged in to update tasks!")
+        if len(tasks) > settings.GRAPHQL_MAX_BULK_SIZE:
+            raise GraphQLError(
+                f"At most {settings.GRAPHQL_MAX_BULK_SIZE} tasks can be updated at once"
+            )
+
+        pks = _parse_ids(item.id for item in tasks)
+        editable = editable_tasks(user, [pk for pk in pks if pk is not None])
+        changed_fields: set[str] = set()
+        updated, seen, errors = [], set(), []
+        for pk, item in zip(pks, tasks):
+            task = editable.get(pk)
+            if task is None:
+                errors.append(["id: Task not found"])
+                continue
+            if pk in seen:
+                errors.append(["id: The task is updated twice"])
+                continue
+            seen.add(pk)
+            fields = [
+                field for field in UpdateTasks.FIELDS if item.get(field) is not None
+            ]
+            for field in fields:
+                setattr(task, field, item[field])
+            item_errors = _clean(task, fields)
+            errors.append(item_errors)
+            if not item_errors:
+                updated.append(task)
+                changed_fields.update(fields)
+                if "status" in fields:
+                    task.set_completed_at()
+                    changed_fields.add("completed_at")
+
+        if updated and changed_fields:
+            Task.objects.bulk_update(updated, sorted(changed_fields))
+            invalidate_results()
+            _publish(updated, "updated")
+        return UpdateTasks(results=_results(info, pks, errors))
+
+
+class SetTaskStatuses(graphene.Mutation):
+    """
+    A class that represents the bulk set task statuses mutation.
+
+    The permissions of every task are checked with one query, and the tasks
+    are updated with one statement per status, in one transaction.
+
+    Methods:
+        Arguments: A class that represents the arguments for the mutation.
+        mutate: A method that sets the statuses.
+    """
+
+    results = graphene.List(graphene.NonNull(TaskResult), required=True)
+
+    class Arguments:
+        """
+        A class that represents the arguments for the mutation.
+
+        Attributes:
+            statuses: The new statuses of the tasks.
+        """
+
+        statuses = graphene.List(graphene.NonNull(TaskStatusInput), required=True)
+
+    @transaction.atomic
+    def mutate(self, info, statuses):
+        """
+        Sets the statuses of the tasks.
+
+        Args:
+            info: The query info.
+            statuses: The new statuses of the tasks.
+
+        Returns:
+            The result of every task, in input order.
+        """
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("You must be logged in to update tasks!")
+        if len(statuses) > settings.GRAPHQL_MAX_BULK_SIZE:
+            raise GraphQLError(
+                f"At most {settings.GRAPHQL_MAX_BULK_SIZE} tasks can be updated at once"
+            )
+
+        pks = _parse_ids(item.id for item in statuses)
+        editable = editable_tasks(user, [pk for pk in pks if pk is not None])
+        choices = {value for value, _ in Task.STATUS_CHOICES}
+        by_status = defaultdict(list)
+        errors = []
+        for pk, item in zip(pks, statuses):
+            if pk not in editable:
+                errors.append(["id: Task not found"])
+            elif item.status not in choices:
+                errors.append([f"status: Value '{item.status}' is not a valid choice."])
+            else:
+                by_status[item.status].append(pk)
+                errors.append([])
+
+        for status, status_pks in by_status.items():
+            # As Task.set_completed_at, the tasks already done keep their date.
+            completed_at = Coalesce("completed_at", Now()) if status == "DONE" else None
+            Task.objects.filter(pk__in=status_pks).update(
+                status=status, completed_at=completed_at
+            )
+            for pk in status_pks:
+                editable[pk].status = status
+        if by_status:
+            invalidate_results()
+            _publish(
+                [
+                    editable[pk]
+                    for status_pks in by_status.values()
+                    for pk in status_pks
+                ],
+                "updated",
+            )
+        return SetTaskStatuses(results=_results(info, pks, errors))
+
+
 class Mutation(graphene.ObjectType):
     """
     A class that represents the mutation type.
 
     Methods:
         create_task: A method that creates a task.
+        create_tasks: A method that creates tasks in bulk.
+        update_tasks: A method that updates tasks in bulk.
+        set_task_statuses: A method that sets the statuses of tasks in bulk.
     """
 
     create_task = CreateTask.Field()
+    create_tasks = CreateTasks.Field()
+    update_tasks = UpdateTasks.Field()
+    set_task_statuses = SetTaskStatuses.Field()
@@ -10,17 +10,23 @@ Classes:
     MentionSerializer: Serializer class for the Mention model.
     CommentUpdateSerializer: Serializer class for updating a Comment instance.
     CommentReadSerializer: Serializer class for reading a Comment instance.
+    ArchivedCommentSerializer: Serializer class for the ArchivedComment model.
+    ArchivedTaskSerializer: Serializer class for the ArchivedTask model.
 """
 
 import re
 from typing import Any
 
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AbstractUser
-from django.shortcuts import get_object_or_404
+from projects import membership
 from rest_framework import serializers
 
-from .models import Comment, Mention, Project, Task
+from taskmanager.loaders import (
+    IdentityMapHyperlinkedRelatedField,
+    IdentityMapPrimaryKeyRelatedField,
+)
+
+from .models import ArchivedComment, ArchivedTask, Comment, Mention, Task
 
 
 class MentionSerializer(serializers.ModelSerializer):
@@ -84,6 +90,7 @@ class CommentSerializer(serializers.ModelSerializer):
         task: A nested TaskSerializer instance representing the task the comment belongs to.
     """
 
+    serializer_related_field = IdentityMapPrimaryKeyRelatedField
     task = "TaskSerializer"
 
     class Meta:
@@ -205,6 +212,7 @@ class TaskSerializer(serializers.HyperlinkedModelSerializer[Task]):
 
     """
 
+    serializer_related_field = IdentityMapHyperlinkedRelatedField
     comments = CommentSerializer(many=True, read_only=True)
     creator: serializers.RelatedField = serializers.HyperlinkedRelatedField(
         view_name="user-detail", read_only=True
@@ -231,20 +239,22 @@ class TaskSerializer(serializers.HyperlinkedModelSerializer[Task]):
             "end_date",
             "priority",
             "status",
+            "completed_at",
             "duration",
             "project",
             "comments",
             "shared_files",
         ]
 
-        read_only_fields = ["creator"]
+        read_only_fields = ["creator", "completed_at"]
 
     def update(self, instance: Task, validated_data: dict[str, Any]) -> Task:
         """
         Updates an existing task instance.
 
-        This method overrides the default update method to add support for assigning users
-        at the current list of users of the task.
+        This method overrides the default update method to add the assigned users
+        to the current list of users of the task. Only the missing pairs are
+        inserted, the current users are not loaded.
 
         Args:
             instance (Task): The existing task instance to update.
@@ -254,22 +264,20 @@ class TaskSerializer(serializers.HyperlinkedModelSerializer[Task]):
             Task: The updated task instance.
         """
         if "assigned" in validated_data:
-            existing_users = set(instance.assigned.all())
-            new_users = set(validated_data["assigned"])
-            updated_assigned_users = existing_users.union(new_users)
-            instance.assigned.set(updated_assigned_users)
-            validated_data.pop("assigned")
+            instance.assigned.add(*validated_data.pop("assigned"))
         return super().update(instance, validated_data)
 
     def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
         """
-        Custom validation method to ensure that the start_date is before the end_date.
+        Custom validation method to ensure that the start_date is before the end_date,
+        and that the assigned users are members or the owner of the project.
 
         Args:
             attrs (dict): The data to be validated.
 
         Raises:
-            serializers.ValidationError: If the end_date is before the start_date.
+            serializers.ValidationError: If the end_date is before the start_date,
+                or if any assigned user is not a member of the project.
 
         Returns:
             dict: The validated data.
@@ -279,38 +287,86 @@ class TaskSerializer(serializers.HyperlinkedModelSerializer[Task]):
         end_date = attrs.get("end_date")
         if start_date and end_date and start_date > end_date:
             raise serializers.ValidationError("end_date must be after start_date")
+        assigned = attrs.get("assigned")
+        if assigned:
+            project = attrs.get("project")
+            project_id = (
+                project.pk if project else getattr(self.instance, "project_id", None)
+            )
+            if project_id is None:
+                raise serializers.ValidationError(
+                    {"assigned": "The task must be associated with a project."}
+                )
+            user_ids = {user.pk for user in assigned}
+            if membership.count_members(project_id, user_ids) != len(user_ids):
+                raise serializers.ValidationError(
+                    {"assigned": "User is not a member of the project"}
+                )
         return attrs
 
-    def validate_assigned(self, value: list[AbstractUser]) -> list[AbstractUser]:
+
+class ArchivedCommentSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for the ArchivedComment model.
+
+    Attributes:
+        mentions: The pks of the users mentioned in the comment.
+    """
+
+    mentions = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field="mentioned_user_id"
+    )
+
+    class Meta:
         """
-        Validates that all users in the list are members of the project.
+        Meta class for defining metadata options for the ArchivedCommentSerializer class.
 
-        Args:
-            value (list[User]): List of users assigned to the task.
+        Attributes:
+            model (class): The model class that the serializer is based on.
+            fields (list): The list of fields to include in serialized representation of the model.
+        """
 
-        Returns:
-            list[User]: The validated list of users.
+        model = ArchivedComment
+        fields = ["pk", "creator", "created_at", "content", "mentions"]
 
-        Raises:
-            serializers.ValidationError: If any user is not a member of the project.
+
+class ArchivedTaskSerializer(serializers.HyperlinkedModelSerializer):
+    """
+    Serializer class for the ArchivedTask model.
+
+    The archived tasks are read-only, they are changed once restored.
+
+    Attributes:
+        comments: The archived comments of the task.
+    """
+
+    comments = ArchivedCommentSerializer(many=True, read_only=True)
+
+    class Meta:
         """
-        request = self.context.get("request", None)
-        project_url = request.data.get("project", None) if request else None
-        project = None
-
-        if project_url:
-            project_id = project_url.rstrip("/").split("/")[-1]
-            project = get_object_or_404(Project, pk=project_id)
-        elif self.instance and hasattr(self.instance, "project"):
-            project = self.instance.project
-
-        if not project:
-            raise serializers.ValidationError(
-                "The task must be associated with a project."
-            )
+        Meta class for defining metadata options for the ArchivedTaskSerializer class.
 
-        for user in value:
-            if user not in project.users.all():
-                raise serializers.ValidationError("User is not a member of the project")
+        Attributes:
+            model (class): The model class that the serializer is based on.
+            fields (list): The list of fields to include in serialized representation of the model.
+        """
 
-        return value
+        model = ArchivedTask
+        fields = [
+            "url",
+            "pk",
+            "creator",
+            "name",
+            "description",
+            "assigned",
+            "start_date",
+            "end_date",
+            "priority",
+            "status",
+            "completed_at",
+            "archived_at",
+            "project",
+            "comments",
+            "shared_files",
+        ]
+        read_only_fields = fields
@@ -15,12 +15,16 @@ Raises:
     None
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from profiles.models import Profile
+from projects.models import Project
 
+from taskmanager.result_cache import invalidate_results
 from tasks.tasks import send_notification
 
 from .models import Mention, Task
+from .notifications import queue_mention_notification
 
 
 @receiver(post_save, sender=Task)
@@ -46,13 +50,22 @@ def send_notification_on_mention(instance, created, **_kwargs):
     """
     Send notification to users when they are mentioned in a task
 
+    Mentions are coalesced per user, so a burst of mentions results in one
+    summarized push once the digest window closes.
+
     Args:
         instance (Mention): Mention instance
         created (bool): Whether the instance was created or not
     """
     if created:
-        subject = "You have been mentioned"
-        message = f"You have been mentioned in the task {instance.comment.task.name}"
         user = instance.mentioned_user
         if user.profile.expo_push_token:
-            send_notification.delay(subject, message, user.profile.expo_push_token)
+            queue_mention_notification(user.pk, instance.comment.task_id)
+
+
+# The cached GraphQL results read tasks, projects and profiles.
+for model in (Task, Project, Profile):
+    post_save.connect(invalidate_results, sender=model)
+    post_delete.connect(invalidate_results, sender=model)
+for through in (Task.assigned.through, Project.users.through):
+    m2m_changed.connect(invalidate_results, sender=through)
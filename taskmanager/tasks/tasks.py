@@ -3,31 +3,70 @@ This module contains tasks related to sending notifications.
 
 Tasks:
 - send_notification: Sends a notification to the specified Expo push token.
+- send_mention_digest: Sends one summarized push for the buffered mentions of a user.
 - send_due_date_notifications: Sends notifications to users with tasks due tomorrow.
+- send_due_date_notifications_shard: Sends the due date notifications of one pk range.
+- send_new_task_notifications_shard: Sends the new task notifications of one shard.
+- aggregate_notification_counts: Aggregates the counts of the shards of a scan.
 - task_send_fcm_notifications: Executes the 'send_fcm_notifications' management command.
+- archive_completed_tasks: Moves the tasks done long ago to the archive.
+- create_future_partitions: Creates the partitions of the next months.
+- purge_deleted_project: Deletes a deleted project and its dependents in batches.
+- purge_deleted_user: Deletes a deleted user and their dependents in batches.
+- purge_deleted: Purges the deleted projects and users left behind.
+- collect_storage_garbage: Deletes the files of the storage no row refers to.
 """
 
 import logging
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Optional
+from typing import Optional
 
-from celery import shared_task
+import requests
+from celery import chord, shared_task
+from django.conf import settings
 from django.core.management import call_command
-from exponent_server_sdk import PushClient, PushMessage
+from django.db.models import QuerySet
+from exponent_server_sdk import PushClient, PushMessage, PushServerError
+from profiles.models import Profile
+from projects.models import Project
 
+from taskmanager.garbage import collect_garbage
+from taskmanager.locks import exclusive, lease_lock
+from taskmanager.partitioning import create_partitions, partitioned_tables
+from taskmanager.purge import purge_project, purge_user
+
+from .archive import archive_done_tasks
 from .models import Task
+from .notifications import (
+    acquire_push_slot,
+    build_mention_digest,
+    drain_mention_digest,
+    requeue_mention_digest,
+)
 
 logger = logging.getLogger(__name__)
 
-if TYPE_CHECKING:
-    from profiles.models import Profile
+PUSH_TASK_OPTIONS = {
+    # A push is only acknowledged once it was handed to Expo, and is retried
+    # with exponential backoff while Expo or the network is failing.
+    "acks_late": True,
+    "reject_on_worker_lost": True,
+    "autoretry_for": (PushServerError, requests.exceptions.RequestException),
+    "retry_backoff": True,
+    "retry_backoff_max": 600,
+    "retry_jitter": True,
+    "max_retries": 5,
+    "ignore_result": True,
+}
 
 
-@shared_task
+@shared_task(**PUSH_TASK_OPTIONS)
 def send_notification(subject: str, message: str, expo_push_token: str) -> None:
     """
     Sends a notification to the specified Expo push token.
 
+    Failed pushes are retried with exponential backoff.
+
     Args:
         subject (str): The subject of the notification.
         message (str): The body of the notification.
@@ -62,7 +101,99 @@ def send_notification(subject: str, message: str, expo_push_token: str) -> None:
         raise e
 
 
-@shared_task
+@shared_task(ignore_result=True)
+def send_mention_digest(user_id: int) -> None:
+    """
+    Sends one summarized push for the mentions buffered for a user.
+
+    If the user has reached the push rate cap, the mentions are put back into
+    the buffer and the flush is retried once the cap resets.
+
+    Args:
+        user_id (int): The pk of the mentioned user.
+    """
+    counts = drain_mention_digest(user_id)
+    if not counts:
+        return
+    expo_push_token = (
+        Profile.objects.filter(user_id=user_id)
+        .values_list("expo_push_token", flat=True)
+        .first()
+    )
+    if not expo_push_token:
+        return
+    retry_in = acquire_push_slot(user_id)
+    if retry_in:
+        logger.info(
+            "Push rate cap reached for user %s, retrying in %s", user_id, retry_in
+        )
+        requeue_mention_digest(user_id, counts, retry_in)
+        return
+    names = dict(Task.objects.filter(pk__in=counts).values_list("pk", "name"))
+    subject, message = build_mention_digest(counts, names)
+    send_notification.delay(subject, message, expo_push_token)
+
+
+def notify_assignees(task: Task, subject: str, message: str) -> int:
+    """
+    Sends a notification to every user assigned to the task.
+
+    Args:
+        task (Task): The task, with assigned__profile prefetched.
+        subject (str): The subject of the notification.
+        message (str): The body of the notification.
+
+    Returns:
+        int: The number of notifications sent.
+    """
+    sent = 0
+    for user in task.assigned.all():
+        # HACK it doesnt help to recognize the type of user.profile
+        profile: Profile = user.profile
+        expo_push_token: Optional[str] = getattr(profile, "expo_push_token", None)
+        if expo_push_token:
+            send_notification.delay(subject, message, expo_push_token)
+            sent += 1
+    return sent
+
+
+def pk_bounds(queryset: QuerySet, size: int) -> list[tuple[int, int]]:
+    """
+    Splits the rows of a queryset into consecutive pk ranges of size rows.
+
+    The pks are walked in order, a page of size keys after the last one at a
+    time, so sparse pks don't make empty ranges.
+
+    Args:
+        queryset (QuerySet): The rows to split.
+        size (int): The number of rows per range.
+
+    Returns:
+        list[tuple[int, int]]: The inclusive (first, last) pk of each range.
+    """
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    bounds: list[tuple[int, int]] = []
+    page = list(pks[:size])
+    while page:
+        bounds.append((page[0], page[-1]))
+        if len(page) < size:
+            break
+        page = list(pks.filter(pk__gt=page[-1])[:size])
+    return bounds
+
+
+def tomorrow() -> str:
+    """
+    Returns the date the due date notifications are sent for today.
+
+    Returns:
+        str: The ISO date of tomorrow.
+    """
+    return (datetime.now().date() + timedelta(days=1)).isoformat()
+
+
+@shared_task(ignore_result=True)
+@exclusive("send_due_date_notifications", ttl=300, run_id=tomorrow)
 def send_due_date_notifications() -> None:
     """
     Sends notifications to users with tasks due tomorrow.
@@ -70,30 +201,193 @@ def send_due_date_notifications() -> None:
     This task sends a notification to users with tasks due tomorrow. The notification
     is sent to the Expo push token of each user.
 
-    Raises:
-        Exception: If there is an error sending the notification.
+    The task only coordinates the scan: the due tasks are split into pk ranges
+    of NOTIFICATION_SCAN_SHARD_SIZE tasks, shards that run in parallel on the
+    shards worker pool, and their counts are aggregated once all of them are done.
+
+    Only one node runs the scan at a time, and each due date is scanned once.
+    """
+    due_date = tomorrow()
+    shards = [
+        send_due_date_notifications_shard.s(due_date, first_pk, last_pk)
+        for first_pk, last_pk in pk_bounds(
+            Task.objects.filter(end_date__date=due_date),
+            settings.NOTIFICATION_SCAN_SHARD_SIZE,
+        )
+    ]
+    if not shards:
+        return
+    chord(shards)(aggregate_notification_counts.s("send_due_date_notifications"))
+
 
+@shared_task
+def send_due_date_notifications_shard(
+    due_date: str, first_pk: int, last_pk: int
+) -> int:
+    """
+    Sends the due date notifications for the tasks of one pk range.
+
+    Args:
+        due_date (str): The ISO date the tasks are due on.
+        first_pk (int): The first pk of the range.
+        last_pk (int): The last pk of the range.
+
+    Returns:
+        int: The number of notifications sent.
     """
     tasks = Task.objects.filter(
-        end_date__date=datetime.now().date() + timedelta(days=1)
+        pk__range=(first_pk, last_pk), end_date__date=due_date
+    ).prefetch_related("assigned__profile")
+    return sum(
+        notify_assignees(task, "Task due soon", f"The task {task.name} is due tomorrow")
+        for task in tasks
     )
-    for task in tasks:
-        subject = "Task due soon"
-        message = f"The task {task.name} is due tomorrow"
-        for user in task.assigned.all():
-            # HACK it doesnt help to recognize the type of user.profile
-            profile: Profile = user.profile
-            expo_push_token: Optional[str] = getattr(profile, "expo_push_token", None)
-            if expo_push_token:
-                send_notification.delay(subject, message, expo_push_token)
 
 
 @shared_task
+def send_new_task_notifications_shard(task_pks: list[int]) -> int:
+    """
+    Sends the new task notifications for one shard of new tasks.
+
+    Args:
+        task_pks (list[int]): The pks of the new tasks.
+
+    Returns:
+        int: The number of notifications sent.
+    """
+    tasks = Task.objects.filter(pk__in=task_pks).prefetch_related("assigned__profile")
+    return sum(
+        notify_assignees(task, "New task created", f"New task {task.name} created")
+        for task in tasks
+    )
+
+
+@shared_task(ignore_result=True)
+def aggregate_notification_counts(counts: list[int], job: str) -> int:
+    """
+    Aggregates the counts of the shards of a scan.
+
+    Args:
+        counts (list[int]): The number of notifications sent by each shard.
+        job (str): The name of the scan.
+
+    Returns:
+        int: The total number of notifications sent.
+    """
+    total = sum(counts)
+    logger.info("%s sent %s notifications from %s shards", job, total, len(counts))
+    return total
+
+
+@shared_task(ignore_result=True)
+@exclusive("task_send_fcm_notifications", ttl=60)
 def task_send_fcm_notifications():
     """
     Executes the 'send_fcm_notifications' management command.
 
     This task is responsible for sending FCM (Firebase Cloud Messaging) notifications
     using the Django management command 'send_fcm_notifications'.
+
+    Overlapping runs are skipped. The command deletes the new tasks it
+    notifies, a repeated or retried run is already idempotent, so no run id
+    is claimed.
     """
     call_command("send_fcm_notifications")
+
+
+@shared_task(ignore_result=True)
+@exclusive("archive_completed_tasks", ttl=300)
+def archive_completed_tasks() -> None:
+    """
+    Moves the tasks done for longer than TASK_ARCHIVE_AGE seconds to the archive.
+
+    The tasks are moved one chunk per transaction, see tasks.archive. A run
+    that stops halfway leaves the tasks it didn't move for the next one.
+    """
+    moved = archive_done_tasks()
+    logger.info("Archived %s completed tasks", moved)
+
+
+@shared_task(ignore_result=True)
+@exclusive("create_future_partitions", ttl=60)
+def create_future_partitions() -> None:
+    """
+    Creates the partitions of the next PARTITION_MONTHS_AHEAD months of the
+    partitioned tables, see taskmanager.partitioning.
+
+    The months that already have a partition are skipped, so running the job
+    again is harmless.
+    """
+    for table in partitioned_tables():
+        created = create_partitions(table)
+        if created:
+            logger.info("Created the partitions %s", ", ".join(created))
+
+
+@shared_task(ignore_result=True)
+def purge_deleted_project(pk: int) -> None:
+    """
+    Deletes a project marked deleted, and its dependents in batches, see
+    taskmanager.purge.
+
+    Args:
+        pk (int): The pk of the project.
+    """
+    with lease_lock(f"purge_deleted_project:{pk}", ttl=60) as acquired:
+        if (
+            not acquired
+            or not Project.all_objects.filter(pk=pk, deleted_at__isnull=False).exists()
+        ):
+            return
+        deleted = purge_project(pk)
+    logger.info("Purged the project %s, %s rows", pk, deleted)
+
+
+@shared_task(ignore_result=True)
+def purge_deleted_user(pk: int) -> None:
+    """
+    Deletes a user marked deleted, and their dependents in batches, see
+    taskmanager.purge.
+
+    Args:
+        pk (int): The pk of the user.
+    """
+    with lease_lock(f"purge_deleted_user:{pk}", ttl=60) as acquired:
+        if (
+            not acquired
+            or not Profile.objects.filter(user_id=pk, deleted_at__isnull=False).exists()
+        ):
+            return
+        deleted = purge_user(pk)
+    logger.info("Purged the user %s, %s rows", pk, deleted)
+
+
+@shared_task(ignore_result=True)
+@exclusive("purge_deleted", ttl=60)
+def purge_deleted() -> None:
+    """
+    Purges the projects and users marked deleted that are still there, e.g.
+    because the worker purging them died.
+
+    The purges are idempotent, a purge that already runs skips the object.
+    """
+    for pk in Project.all_objects.filter(deleted_at__isnull=False).values_list(
+        "pk", flat=True
+    ):
+        purge_deleted_project.delay(pk)
+    for pk in Profile.objects.filter(deleted_at__isnull=False).values_list(
+        "user_id", flat=True
+    ):
+        purge_deleted_user.delay(pk)
+
+
+@shared_task(ignore_result=True)
+@exclusive("collect_storage_garbage", ttl=300)
+def collect_storage_garbage() -> None:
+    """
+    Deletes the files of the storage no row refers to, see taskmanager.garbage.
+
+    The files of the deleted profiles and shared files are left to this job,
+    the requests deleting them never touch the storage.
+    """
+    collect_garbage()
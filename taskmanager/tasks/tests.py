@@ -2,21 +2,72 @@
 Tests for the tasks app
 """
 
+import json
+import re
+import tempfile
+import time
+from io import StringIO
 from unittest.mock import patch
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django_redis import get_redis_connection
+from files.models import SharedFile
+from graphql import NoSchemaIntrospectionCustomRule
+from graphql_jwt.shortcuts import get_token
 from projects.models import Project
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from taskmanager import locks, persisted_queries, tracing, views
+from taskmanager.celery import app
+from taskmanager.db import statement_timeout
+from taskmanager.loaders import IdentityMap
+from taskmanager.partitioning import (
+    create_partitions,
+    detach_partitions,
+    partitioned_tables,
+    partitions,
+)
+from taskmanager.schema import schema
+from taskmanager.views import GraphQLView
+from tasks import notifications
+from tasks.notifications import queue_mention_notification
+from tasks.tasks import pk_bounds, send_due_date_notifications, send_mention_digest
+
+from .archive import archive_done_tasks
+from .models import (
+    ArchivedTask,
+    Comment,
+    Mention,
+    NewTaskNotification,
+    Task,
+)
+from .serializers import TaskSerializer
 
-from tasks.tasks import send_due_date_notifications
+User = get_user_model()
 
-from .models import Comment, Mention, Task
 
-User = get_user_model()
+def clear_redis_state():
+    """
+    Remove the buffered mentions, rate counters and locks left in Redis by other tests.
+    """
+    connection = get_redis_connection("default")
+    for prefix in (notifications.KEY_PREFIX, locks.KEY_PREFIX):
+        keys = connection.keys(f"{prefix}:*")
+        if keys:
+            connection.delete(*keys)
 
 
 class TaskViewSetTestCase(APITestCase):
@@ -163,6 +214,7 @@ class SendueDateNotificationTestCase(TestCase):
     """
 
     def setUp(self):
+        clear_redis_state()
         self.owner = User.objects.create_user(
             username="owneruser", password="testpassword"
         )
@@ -206,6 +258,89 @@ class SendueDateNotificationTestCase(TestCase):
             self.member.profile.expo_push_token,
         )
 
+    @override_settings(NOTIFICATION_SCAN_SHARD_SIZE=1)
+    @patch("tasks.tasks.aggregate_notification_counts.run")
+    @patch("tasks.tasks.send_notification.delay")
+    def test_send_due_date_notifications_in_shards(
+        self, mock_send_notification, mock_aggregate
+    ):
+        """
+        Test that the scan is split into shards whose counts are aggregated.
+        """
+        other_task = Task.objects.create(
+            name="Other Task",
+            description="Test Description",
+            creator=self.owner,
+            start_date=timezone.now() + timezone.timedelta(hours=1),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            project=self.project,
+        )
+        other_task.assigned.add(self.member)
+
+        send_due_date_notifications()
+
+        self.assertEqual(mock_send_notification.call_count, 2)
+        counts, job = mock_aggregate.call_args.args
+        self.assertEqual(job, "send_due_date_notifications")
+        self.assertEqual(sum(counts), 2)
+        self.assertEqual(len(counts), 2)
+
+    def test_pk_bounds_split_sparse_pks_by_rows(self):
+        """
+        Test that the pk ranges of the scan hold a shard of rows each, however
+        sparse the pks are.
+        """
+        tasks = [
+            Task.objects.create(
+                name=f"Task {index}",
+                description="Test Description",
+                creator=self.owner,
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                project=self.project,
+            )
+            for index in range(5)
+        ]
+        Task.objects.filter(pk__in=[tasks[1].pk, tasks[2].pk]).delete()
+
+        bounds = pk_bounds(Task.objects.filter(name__startswith="Task "), 2)
+
+        self.assertEqual(
+            bounds, [(tasks[0].pk, tasks[3].pk), (tasks[4].pk, tasks[4].pk)]
+        )
+
+    @patch("tasks.tasks.send_notification.delay")
+    def test_send_due_date_notifications_runs_once_per_day(
+        self, mock_send_notification
+    ):
+        """
+        Test that a duplicated run for the same due date does not notify again.
+        """
+        send_due_date_notifications()
+        send_due_date_notifications()
+
+        mock_send_notification.assert_called_once()
+
+    @patch("tasks.tasks.send_notification.delay")
+    def test_overlapping_run_is_skipped(self, mock_send_notification):
+        """
+        Test that a run is skipped while another run holds the lock.
+        """
+        with locks.lease_lock("send_due_date_notifications", ttl=60):
+            send_due_date_notifications()
+
+        mock_send_notification.assert_not_called()
+
+    def test_lease_is_renewed_while_held(self):
+        """
+        Test that a long run keeps its lock after the lease time has passed.
+        """
+        with locks.lease_lock("long_run", ttl=0.3) as acquired:
+            self.assertTrue(acquired)
+            time.sleep(0.6)
+            with locks.lease_lock("long_run", ttl=0.3) as acquired_again:
+                self.assertFalse(acquired_again)
+
 
 class SendNotificationOnMentionTestCase(TestCase):
     """
@@ -213,6 +348,7 @@ class SendNotificationOnMentionTestCase(TestCase):
     """
 
     def setUp(self):
+        clear_redis_state()
         self.owner = User.objects.create_user(
             username="owneruser", password="testpassword"
         )
@@ -265,6 +401,195 @@ class SendNotificationOnMentionTestCase(TestCase):
         )
 
 
+class MentionDigestTestCase(TestCase):
+    """
+    Test case for the coalescing of mention notifications.
+    """
+
+    def setUp(self):
+        clear_redis_state()
+        self.owner = User.objects.create_user(
+            username="owneruser", password="testpassword"
+        )
+        self.member = User.objects.create_user(
+            username="member_user", password="testpassword"
+        )
+        self.member.profile.expo_push_token = "ExponentPushToken[yyyyyyyyyyyyyyyyyyyy]"
+        self.member.profile.save()
+        self.project = Project.objects.create(
+            name="Test Project",
+            description="Test Description",
+            start_date=timezone.now() + timezone.timedelta(days=1),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.owner,
+        )
+        self.task = Task.objects.create(
+            name="Test Task",
+            description="Test Description",
+            creator=self.owner,
+            start_date=timezone.now() + timezone.timedelta(hours=1),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            project=self.project,
+        )
+
+    def tearDown(self):
+        clear_redis_state()
+        super().tearDown()
+
+    @patch("tasks.tasks.send_notification.delay")
+    @patch("tasks.tasks.send_mention_digest.apply_async")
+    def test_mentions_in_window_are_sent_as_one_push(
+        self, mock_schedule_digest, mock_send_notification
+    ):
+        """
+        Test that a burst of mentions schedules one flush and sends one summarized push.
+        """
+        for _ in range(5):
+            queue_mention_notification(self.member.pk, self.task.pk)
+
+        mock_schedule_digest.assert_called_once()
+        send_mention_digest(self.member.pk)
+
+        mock_send_notification.assert_called_once_with(
+            "You have new mentions",
+            "5 new mentions in the task Test Task",
+            self.member.profile.expo_push_token,
+        )
+
+    @override_settings(NOTIFICATION_RATE_LIMIT=1)
+    @patch("tasks.tasks.send_notification.delay")
+    @patch("tasks.tasks.send_mention_digest.apply_async")
+    def test_rate_capped_digest_is_rescheduled(
+        self, mock_schedule_digest, mock_send_notification
+    ):
+        """
+        Test that a digest over the per-user rate cap is kept and rescheduled.
+        """
+        queue_mention_notification(self.member.pk, self.task.pk)
+        send_mention_digest(self.member.pk)
+        queue_mention_notification(self.member.pk, self.task.pk)
+        send_mention_digest(self.member.pk)
+
+        self.assertEqual(mock_send_notification.call_count, 1)
+        self.assertGreater(mock_schedule_digest.call_args.kwargs["countdown"], 0)
+
+
+class CeleryRoutingTestCase(TestCase):
+    """
+    Test case for the routing of the notification jobs to their queues.
+    """
+
+    def test_jobs_are_routed_to_dedicated_queues(self):
+        """
+        Test that push fan-out, the periodic scans and their shards do not
+        share a queue.
+        """
+        routes = {
+            "tasks.tasks.send_notification": "notifications",
+            "tasks.tasks.send_mention_digest": "notifications",
+            "tasks.tasks.send_due_date_notifications": "scans",
+            "tasks.tasks.task_send_fcm_notifications": "scans",
+            "tasks.tasks.send_due_date_notifications_shard": "shards",
+            "tasks.tasks.send_new_task_notifications_shard": "shards",
+            "tasks.tasks.aggregate_notification_counts": "scans",
+            "tasks.tasks.archive_completed_tasks": "maintenance",
+            "tasks.tasks.create_future_partitions": "maintenance",
+            "tasks.tasks.purge_deleted_project": "purges",
+            "tasks.tasks.purge_deleted_user": "purges",
+            "tasks.tasks.purge_deleted": "purges",
+            "tasks.tasks.collect_storage_garbage": "maintenance",
+        }
+        for task_name, queue in routes.items():
+            route = app.amqp.router.route({}, task_name)
+            self.assertEqual(route["queue"].name, queue)
+
+
+class SendFCMNotificationsCommandTestCase(TestCase):
+    """
+    Test case for the send_fcm_notifications command.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username="owneruser", password="testpassword"
+        )
+        self.member = User.objects.create_user(
+            username="member_user", password="testpassword"
+        )
+        self.member.profile.expo_push_token = "ExponentPushToken[yyyyyyyyyyyyyyyyyyyy]"
+        self.member.profile.save()
+        self.project = Project.objects.create(
+            name="Test Project",
+            description="Test Description",
+            start_date=timezone.now() + timezone.timedelta(days=1),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.owner,
+        )
+        self.created_at = timezone.now() - timezone.timedelta(minutes=1)
+
+    def create_task(self, name):
+        task = Task.objects.create(
+            name=name,
+            description="Test Description",
+            creator=self.owner,
+            created_at=self.created_at,
+            start_date=timezone.now() + timezone.timedelta(hours=1),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            project=self.project,
+        )
+        task.assigned.add(self.member)
+        return task
+
+    @patch("tasks.tasks.send_notification.delay")
+    def test_repeated_runs_notify_once(self, mock_send_notification):
+        """
+        Test that running the command again does not notify the same task twice.
+        """
+        self.create_task("Test Task")
+
+        call_command("send_fcm_notifications", stdout=StringIO())
+        call_command("send_fcm_notifications", stdout=StringIO())
+
+        mock_send_notification.assert_called_once_with(
+            "New task created",
+            "New task Test Task created",
+            self.member.profile.expo_push_token,
+        )
+
+    @patch("tasks.tasks.send_notification.delay")
+    def test_chunks_notify_every_task(self, mock_send_notification):
+        """
+        Test that every new task is notified across chunk boundaries.
+        """
+        for i in range(3):
+            self.create_task(f"Test Task {i}")
+
+        call_command("send_fcm_notifications", "--chunk-size=2", stdout=StringIO())
+
+        self.assertEqual(mock_send_notification.call_count, 3)
+        self.assertFalse(NewTaskNotification.objects.exists())
+
+    @patch("tasks.tasks.send_notification.delay")
+    def test_late_commit_is_notified(self, mock_send_notification):
+        """
+        Test that a task committed after a later task was notified, e.g. by a
+        long transaction, is notified by the next run.
+        """
+        self.create_task("Test Task")
+        call_command("send_fcm_notifications", stdout=StringIO())
+        self.created_at = timezone.now() - timezone.timedelta(hours=1)
+        self.create_task("Late Task")
+
+        call_command("send_fcm_notifications", stdout=StringIO())
+
+        mock_send_notification.assert_called_with(
+            "New task created",
+            "New task Late Task created",
+            self.member.profile.expo_push_token,
+        )
+        self.assertEqual(mock_send_notification.call_count, 2)
+
+
 class TaskModelTest(APITestCase):
     """
     Test case for the Task model.
@@ -342,64 +667,1643 @@ class TaskModelTest(APITestCase):
         self.assertEqual(self.task.creator, self.user)
 
 
-class TaskSerializerAPITestCase(APITestCase):
+class TaskSchemaQueryTestCase(TestCase):
     """
-    Test case for the TaskSerializer class.
+    Test case for the related lookups of the task queries.
+    """
+
+    query = """
+        query {
+            allTasks {
+                name
+                creator { username profile { expoPushToken } }
+                assigned { ...UserFields }
+            }
+        }
+        fragment UserFields on UserType { username profile { expoPushToken } }
     """
 
     def setUp(self):
         """
-        Set up the necessary data for the test case.
+        Set up tasks with several assigned users each.
         """
-        self.user = User.objects.create_user(
-            username="testuser", password="testpassword"
-        )
-        self.user2 = User.objects.create_user(
-            username="testuser2", password="testpassword"
-        )
-        self.user_outside = User.objects.create_user(
-            username="testuser3", password="testpassword"
+        self.users = [
+            User.objects.create_user(username=f"user{i}", password="testpassword")
+            for i in range(3)
+        ]
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.users[0],
         )
+        for i in range(5):
+            task = Task.objects.create(
+                name=f"Task {i}",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=self.users[i % 3],
+                project=self.project,
+            )
+            task.assigned.set(self.users)
+
+    def execute(self):
+        """
+        Executes the query as the first user.
+        """
+        context = RequestFactory().post("/graphql/")
+        context.user = self.users[0]
+        return schema.execute(self.query, context_value=context)
+
+    def test_nested_relations_use_fixed_number_of_queries(self):
+        """
+        Test that the tasks, their creators, assignees and profiles are loaded
+        in three queries: tasks joined with creators and their profiles, the
+        assignees, and the assignees' profiles.
+        """
+        with self.assertNumQueries(3):
+            result = self.execute()
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data["allTasks"]), 5)
+        self.assertEqual(len(result.data["allTasks"][0]["assigned"]), 3)
+
+    def test_query_count_does_not_grow_with_tasks(self):
+        """
+        Test that more tasks don't add queries.
+        """
+        for i in range(5, 15):
+            task = Task.objects.create(
+                name=f"Task {i}",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=self.users[0],
+                project=self.project,
+            )
+            task.assigned.set(self.users)
+        with self.assertNumQueries(3):
+            result = self.execute()
+        self.assertEqual(len(result.data["allTasks"]), 15)
+
+
+class TaskConnectionTestCase(TestCase):
+    """
+    Test case for the keyset paginated tasks connection.
+    """
+
+    query = """
+        query ($first: Int, $after: String, $status: String, $assignee: ID) {
+            tasks(first: $first, after: $after, status: $status, assignee: $assignee) {
+                edges { cursor node { name creator { username } } }
+                pageInfo { hasNextPage endCursor }
+                %s
+            }
+        }
+    """
+
+    def setUp(self):
+        """
+        Set up five tasks created a minute apart.
+        """
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.other = User.objects.create_user(username="other", password="password")
         self.project = Project.objects.create(
             name="Test Project",
-            description="Test Description",
-            start_date=timezone.now() + timezone.timedelta(days=1),
+            start_date=timezone.now(),
             end_date=timezone.now() + timezone.timedelta(days=2),
             owner=self.user,
         )
-        self.project.users.add(self.user, self.user2)
-        self.task = Task.objects.create(
-            name="Test Task",
-            start_date=timezone.now() + timezone.timedelta(days=1),
-            end_date=timezone.now() + timezone.timedelta(days=2),
-            description="Test description",
-            priority="MEDIUM",
-            status="TODO",
-            creator=self.user,
-            project=self.project,
+        now = timezone.now()
+        for i in range(5):
+            task = Task.objects.create(
+                name=f"Task {i}",
+                created_at=now + timezone.timedelta(minutes=i),
+                start_date=now,
+                end_date=now + timezone.timedelta(days=1),
+                status="DONE" if i % 2 else "TODO",
+                creator=self.user,
+                project=self.project,
+            )
+            task.assigned.add(self.other if i < 2 else self.user)
+
+    def execute(self, total_count=False, user=None, **variables):
+        """
+        Executes the tasks query with the given variables, as the owner of
+        the project by default.
+        """
+        context = RequestFactory().post("/graphql/")
+        context.user = user or self.user
+        return schema.execute(
+            self.query % ("totalCount" if total_count else ""),
+            context_value=context,
+            variable_values=variables,
         )
-        self.task.assigned.add(self.user)
-        self.client.force_authenticate(user=self.user)
 
-    def test_validate_assigned_with_members(self):
+    def names(self, result):
         """
-        Test the validate_assigned method with members of the project.
+        Returns the task names of a page.
         """
-        task_data = {
-            "assigned": reverse("user-detail", args=[self.user2.pk]),
-        }
-        response = self.client.patch(f"/tasks/{self.task.pk}/", task_data)
+        return [edge["node"]["name"] for edge in result.data["tasks"]["edges"]]
+
+    def test_pages_follow_the_cursor(self):
+        """
+        Test that pages are newest first and continue after the end cursor.
+        """
+        result = self.execute(first=2)
+        self.assertIsNone(result.errors)
+        self.assertEqual(self.names(result), ["Task 4", "Task 3"])
+        self.assertTrue(result.data["tasks"]["pageInfo"]["hasNextPage"])
+
+        after = result.data["tasks"]["pageInfo"]["endCursor"]
+        result = self.execute(first=2, after=after)
+        self.assertEqual(self.names(result), ["Task 2", "Task 1"])
+
+        after = result.data["tasks"]["pageInfo"]["endCursor"]
+        result = self.execute(first=2, after=after)
+        self.assertEqual(self.names(result), ["Task 0"])
+        self.assertFalse(result.data["tasks"]["pageInfo"]["hasNextPage"])
+
+    def test_filters(self):
+        """
+        Test the status and assignee filters.
+        """
+        result = self.execute(status="DONE")
+        self.assertEqual(self.names(result), ["Task 3", "Task 1"])
+        result = self.execute(assignee=str(self.other.pk))
+        self.assertEqual(self.names(result), ["Task 1", "Task 0"])
+
+    def test_total_count_only_when_requested(self):
+        """
+        Test that the count query only runs when totalCount is selected.
+        """
+        with self.assertNumQueries(1):
+            result = self.execute(first=2)
+        self.assertNotIn("totalCount", result.data["tasks"])
+        with self.assertNumQueries(2):
+            result = self.execute(first=2, total_count=True)
+        self.assertEqual(result.data["tasks"]["totalCount"], 5)
+
+    def test_page_size_is_bounded(self):
+        """
+        Test that first can't exceed GRAPHQL_MAX_PAGE_SIZE.
+        """
+        with override_settings(GRAPHQL_MAX_PAGE_SIZE=3):
+            result = self.execute(first=4)
+        self.assertIn("first must be between", result.errors[0].message)
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor is rejected.
+        """
+        result = self.execute(after="not-a-cursor")
+        self.assertEqual(result.errors[0].message, "Invalid cursor")
+
+    def test_anonymous_users_are_refused(self):
+        """
+        Test that anonymous users can't list the tasks.
+        """
+        result = self.execute(user=AnonymousUser())
+        self.assertEqual(
+            result.errors[0].message, "Authentication credentials were not provided."
+        )
+
+    def test_only_the_tasks_of_the_projects_of_the_user(self):
+        """
+        Test that a user who isn't a member of a project doesn't see its tasks,
+        and that a member does.
+        """
+        result = self.execute(user=self.other)
+        self.assertEqual(self.names(result), [])
+        self.project.users.add(self.other)
+        result = self.execute(user=self.other, first=1)
+        self.assertEqual(self.names(result), ["Task 4"])
+
+
+class GraphQLQueryLimitsTestCase(APITestCase):
+    """
+    Test case for the depth, cost and time limits of the GraphQL endpoint.
+    """
+
+    def setUp(self):
+        """
+        Set up a user.
+        """
+        self.user = User.objects.create_user(username="testuser", password="password")
+
+    def post(self, query, **variables):
+        """
+        Posts a query to the GraphQL endpoint.
+        """
+        return self.client.post(
+            "/graphql/", {"query": query, "variables": variables}, format="json"
+        )
+
+    def test_cheap_query(self):
+        """
+        Test that a query within the limits is executed.
+        """
+        self.client.force_login(self.user)
+        response = self.post("{ allTasks { name creator { username } } }")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"data": {"allTasks": []}})
 
-    def test_validate_assigned_with_non_members(self):
+    def test_deep_query_is_rejected(self):
         """
-        Test the validate_assigned method with non-members of the project.
+        Test that a query deeper than GRAPHQL_MAX_DEPTH is rejected.
         """
-        task_data = {
-            "assigned": [self.user_outside.pk],
-        }
-        response = self.client.patch(f"/tasks/{self.task.pk}/", task_data)
+        with override_settings(GRAPHQL_MAX_DEPTH=3):
+            response = self.post(
+                "{ allTasks { creator { profile { user { username } } } } }"
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()["errors"][0]["message"],
+            "Query depth 5 exceeds the maximum depth of 3.",
+        )
+
+    def test_cost_uses_first_and_budget_of_user(self):
+        """
+        Test that the cost multiplies by first and is checked against the
+        budget of the user.
+        """
+        query = """
+            query ($first: Int) {
+                tasks(first: $first) { edges { node { assigned { username } } } }
+            }
+        """
+        # tasks + first * (edges + node + max page size * (assigned + username))
+        budgets = {"anonymous": 50, "authenticated": 1000, "staff": 1000}
+        with override_settings(GRAPHQL_COST_BUDGETS=budgets):
+            response = self.post(query, first=2)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.json()["errors"][0]["message"],
+                "Query cost 405 exceeds the budget of 50.",
+            )
+            self.client.force_login(self.user)
+            response = self.post(query, first=2)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.post(query, first=30)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unpaginated_list_costs_the_max_page_size(self):
+        """
+        Test that a list without first is priced as the largest page.
+        """
+        budgets = {"anonymous": 50, "authenticated": 50, "staff": 50}
+        with override_settings(GRAPHQL_COST_BUDGETS=budgets):
+            response = self.post("{ allTasks { name } }")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.json()["errors"][0]["message"],
+                "Query cost 200 exceeds the budget of 50.",
+            )
+            response = self.post("{ allTasks(first: 20) { name } }")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_negative_first_is_rejected(self):
+        """
+        Test that a negative first can't cancel out the cost of a sibling field.
+        """
+        query = """
+            {
+                a: allTasks(first: -100000000) { id }
+                b: allTasks { assigned { username } }
+            }
+        """
+        budgets = {"anonymous": 1000, "authenticated": 1000, "staff": 1000}
+        with override_settings(GRAPHQL_COST_BUDGETS=budgets):
+            response = self.post(query)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertCountEqual(
+            [error["message"] for error in response.json()["errors"]],
+            [
+                "first must not be negative.",
+                "Query cost 20102 exceeds the budget of 1000.",
+            ],
+        )
+
+    def test_validation_rules_of_the_view(self):
+        """
+        Test that the validation rules of the view replace the specified rules.
+        """
+        view = GraphQLView.as_view(validation_rules=(NoSchemaIntrospectionCustomRule,))
+        request = RequestFactory().post(
+            "/graphql/",
+            {"query": "{ __schema { queryType { name } } }"},
+            content_type="application/json",
+        )
+        response = view(request)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(
+            "introspection", json.loads(response.content)["errors"][0]["message"]
+        )
+
+    def test_validation_stops_after_max_errors(self):
+        """
+        Test that the validation stops after MAX_VALIDATION_ERRORS errors.
+        """
+        with patch.object(views.graphene_settings, "MAX_VALIDATION_ERRORS", 2):
+            response = self.post("{ first: unknown1 second: unknown2 third: unknown3 }")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()["errors"]
+        self.assertEqual(len(errors), 3)
+        self.assertIn("Validation aborted", errors[-1]["message"])
+
+    def test_introspection_is_free(self):
+        """
+        Test that the introspection fields don't count.
+        """
+        with override_settings(GRAPHQL_MAX_DEPTH=1):
+            response = self.post(
+                "{ __schema { types { fields { type { ofType { name } } } } } }"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_statement_timeout(self):
+        """
+        Test that statements are cancelled after the timeout.
+        """
+        with statement_timeout(10), connection.cursor() as cursor:
+            with self.assertRaises(OperationalError), transaction.atomic():
+                cursor.execute("SELECT pg_sleep(1)")
+            cursor.execute("SHOW statement_timeout")
+            self.assertEqual(cursor.fetchone(), ("10ms",))
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            self.assertEqual(cursor.fetchone(), ("0",))
+
+
+class PersistedQueriesTestCase(APITestCase):
+    """
+    Test case for the persisted queries and the document cache of the GraphQL endpoint.
+    """
+
+    query = "{ allTasks { name } }"
+
+    def setUp(self):
+        """
+        Clear the stored persisted queries, and log a user in.
+        """
+        cache.clear()
+        self.sha256_hash = persisted_queries.query_hash(self.query)
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.client.force_login(self.user)
+
+    def post(self, sha256_hash, query=None):
+        """
+        Posts a persisted query to the GraphQL endpoint.
+        """
+        return self.client.post(
+            "/graphql/",
+            {
+                "query": query,
+                "extensions": {
+                    "persistedQuery": {"version": 1, "sha256Hash": sha256_hash}
+                },
+            },
+            format="json",
+        )
+
+    def test_automatic_persisted_query(self):
+        """
+        Test that an unknown hash is persisted once it is sent with its query.
+        """
+        response = self.post(self.sha256_hash)
+        self.assertEqual(
+            response.json()["errors"][0]["message"], "PersistedQueryNotFound"
+        )
+        response = self.post(self.sha256_hash, self.query)
+        self.assertEqual(response.json(), {"data": {"allTasks": []}})
+        response = self.post(self.sha256_hash)
+        self.assertEqual(response.json(), {"data": {"allTasks": []}})
+
+    def test_hash_mismatch(self):
+        """
+        Test that a query is not persisted under another query's hash.
+        """
+        response = self.post(self.sha256_hash, "{ allUsers { username } }")
+        self.assertEqual(
+            response.json()["errors"][0]["message"],
+            "provided sha does not match query",
+        )
+
+    def test_allow_list(self):
+        """
+        Test that only the queries of the manifest are accepted in allow-list mode.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as manifest:
+            json.dump(
+                {
+                    "operations": [
+                        {"id": self.sha256_hash, "name": "Tasks", "body": self.query}
+                    ]
+                },
+                manifest,
+            )
+            manifest.flush()
+            with override_settings(
+                GRAPHQL_PERSISTED_QUERIES_MANIFEST=manifest.name,
+                GRAPHQL_PERSISTED_QUERIES_ONLY=True,
+            ):
+                response = self.post(self.sha256_hash)
+                self.assertEqual(response.json(), {"data": {"allTasks": []}})
+                response = self.client.post(
+                    "/graphql/", {"query": self.query}, format="json"
+                )
+                self.assertEqual(
+                    response.json()["errors"][0]["message"],
+                    "PersistedQueryNotAllowed",
+                )
+                other = "{ allUsers { username } }"
+                response = self.post(persisted_queries.query_hash(other), other)
+                self.assertEqual(
+                    response.json()["errors"][0]["message"],
+                    "PersistedQueryNotAllowed",
+                )
+
+    def test_documents_are_parsed_once(self):
+        """
+        Test that a repeated query is neither parsed nor validated again.
+        """
+        query = "{ allTasks { description } }"
+        with patch(
+            "taskmanager.persisted_queries.parse", wraps=persisted_queries.parse
+        ) as parse:
+            for _ in range(3):
+                response = self.client.post(
+                    "/graphql/", {"query": query}, format="json"
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parse.assert_called_once()
+
+
+class BulkTaskMutationsTestCase(TestCase):
+    """
+    Test case for the bulk task mutations.
+    """
+
+    def setUp(self):
+        """
+        Set up a project with a member, and a project the user is not a member of.
+        """
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.other = User.objects.create_user(username="other", password="password")
+        self.outsider = User.objects.create_user(
+            username="outsider", password="password"
+        )
+        self.start = timezone.now() + timezone.timedelta(days=1)
+        self.end = timezone.now() + timezone.timedelta(days=2)
+        self.project = Project.objects.create(
+            name="Project",
+            start_date=self.start,
+            end_date=self.end,
+            owner=self.other,
+        )
+        self.project.users.add(self.user)
+        self.foreign_project = Project.objects.create(
+            name="Foreign Project",
+            start_date=self.start,
+            end_date=self.end,
+            owner=self.other,
+        )
+
+    def execute(self, query, **variables):
+        """
+        Executes a mutation as the user.
+        """
+        context = RequestFactory().post("/graphql/")
+        context.user = self.user
+        return schema.execute(query, context_value=context, variable_values=variables)
+
+    def task_input(self, name, **fields):
+        """
+        Returns the input of a new task.
+        """
+        return {
+            "name": name,
+            "description": "Description",
+            "startDate": self.start.isoformat(),
+            "endDate": self.end.isoformat(),
+            "project": str(self.project.pk),
+            **fields,
+        }
+
+    def create_task(self, name, creator=None):
+        """
+        Creates a task in the project.
+        """
+        return Task.objects.create(
+            name=name,
+            start_date=self.start,
+            end_date=self.end,
+            creator=creator or self.user,
+            project=self.project,
+        )
+
+    def test_create_tasks(self):
+        """
+        Test that the valid tasks are created with their assignments, and the
+        invalid ones are reported.
+        """
+        query = """
+            mutation ($tasks: [TaskInput!]!) {
+                createTasks(tasks: $tasks) {
+                    results { errors task { name assigned { username } } }
+                }
+            }
+        """
+        tasks = [
+            self.task_input("First", assigned=[str(self.user.pk), str(self.other.pk)]),
+            self.task_input("Foreign", project=str(self.foreign_project.pk)),
+            self.task_input("Second", priority="URGENT"),
+            self.task_input("Third", status="DONE"),
+            self.task_input("Outsider", assigned=[str(self.outsider.pk)]),
+        ]
+        # Permissions, projects of the users, insert tasks, queue their
+        # notifications, insert assignments, load tasks and assignees, and the
+        # savepoint of the transaction.
+        with self.assertNumQueries(9):
+            result = self.execute(query, tasks=tasks)
+        self.assertIsNone(result.errors)
+        results = result.data["createTasks"]["results"]
+        self.assertEqual(results[0]["errors"], [])
+        self.assertEqual(results[0]["task"]["name"], "First")
+        self.assertCountEqual(
+            [user["username"] for user in results[0]["task"]["assigned"]],
+            ["testuser", "other"],
+        )
+        self.assertEqual(
+            results[1],
+            {"errors": ["project: You are not a member of the project"], "task": None},
+        )
+        self.assertEqual(
+            results[2]["errors"],
+            ["priority: Value 'URGENT' is not a valid choice."],
+        )
+        self.assertEqual(results[3]["task"]["name"], "Third")
+        self.assertIsNotNone(Task.objects.get(name="Third").completed_at)
+        self.assertIsNone(Task.objects.get(name="First").completed_at)
+        self.assertCountEqual(
+            NewTaskNotification.objects.values_list("task__name", flat=True),
+            ["First", "Third"],
+        )
+        self.assertEqual(
+            results[4]["errors"], ["assigned: User is not a member of the project"]
+        )
+        self.assertCountEqual(
+            Task.objects.values_list("name", flat=True), ["First", "Third"]
+        )
+
+    def test_update_tasks(self):
+        """
+        Test that the tasks the user may edit are updated in one statement.
+        """
+        first, second = self.create_task("First"), self.create_task("Second")
+        foreign = self.create_task("Foreign", creator=self.other)
+        query = """
+            mutation ($tasks: [TaskUpdateInput!]!) {
+                updateTasks(tasks: $tasks) { results { errors task { name priority } } }
+            }
+        """
+        tasks = [
+            {"id": str(first.pk), "name": "Renamed"},
+            {"id": str(second.pk), "priority": "ASAP"},
+            {"id": str(foreign.pk), "name": "Hijacked"},
+            {"id": str(first.pk), "endDate": timezone.now().isoformat()},
+        ]
+        # Permissions, update, load tasks, and the savepoint of the transaction.
+        with self.assertNumQueries(5):
+            result = self.execute(query, tasks=tasks)
+        self.assertIsNone(result.errors)
+        results = result.data["updateTasks"]["results"]
+        self.assertEqual(results[0]["task"], {"name": "Renamed", "priority": "LOW"})
+        self.assertEqual(results[1]["task"], {"name": "Second", "priority": "ASAP"})
+        self.assertEqual(results[2]["errors"], ["id: Task not found"])
+        self.assertEqual(results[3]["errors"], ["id: The task is updated twice"])
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.name, "Foreign")
+
+    def test_set_task_statuses(self):
+        """
+        Test that the statuses are set with one statement per status.
+        """
+        tasks = [self.create_task(f"Task {i}") for i in range(4)]
+        query = """
+            mutation ($statuses: [TaskStatusInput!]!) {
+                setTaskStatuses(statuses: $statuses) { results { errors task { status } } }
+            }
+        """
+        statuses = [
+            {"id": str(tasks[0].pk), "status": "DONE"},
+            {"id": str(tasks[1].pk), "status": "DONE"},
+            {"id": str(tasks[2].pk), "status": "INPROGRESS"},
+            {"id": str(tasks[3].pk), "status": "LATER"},
+        ]
+        # Permissions, one update per status, load tasks, and the savepoint of
+        # the transaction.
+        with self.assertNumQueries(6):
+            result = self.execute(query, statuses=statuses)
+        self.assertIsNone(result.errors)
+        results = result.data["setTaskStatuses"]["results"]
+        self.assertEqual(
+            [item["task"] and item["task"]["status"] for item in results],
+            ["DONE", "DONE", "INPROGRESS", None],
+        )
+        self.assertEqual(
+            results[3]["errors"], ["status: Value 'LATER' is not a valid choice."]
+        )
+
+    def test_bulk_mutations_publish_events(self):
+        """
+        Test that the tasks written by the bulk mutations are published to the
+        streams of their projects, in one round trip per mutation.
+        """
+        task = self.create_task("Task")
+        mutations = [
+            (
+                """
+                mutation ($tasks: [TaskInput!]!) {
+                    createTasks(tasks: $tasks) { results { task { id } } }
+                }
+                """,
+                {"tasks": [self.task_input("First")]},
+            ),
+            (
+                """
+                mutation ($tasks: [TaskUpdateInput!]!) {
+                    updateTasks(tasks: $tasks) { results { errors } }
+                }
+                """,
+                {"tasks": [{"id": str(task.pk), "name": "Renamed"}]},
+            ),
+            (
+                """
+                mutation ($statuses: [TaskStatusInput!]!) {
+                    setTaskStatuses(statuses: $statuses) { results { errors } }
+                }
+                """,
+                {"statuses": [{"id": str(task.pk), "status": "DONE"}]},
+            ),
+        ]
+        published = []
+        with patch("projects.events._add_many") as add_many:
+            for query, variables in mutations:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertIsNone(self.execute(query, **variables).errors)
+            for call in add_many.call_args_list:
+                published.append(call.args[0])
+        created = Task.objects.get(name="First")
+        self.assertEqual(
+            published,
+            [
+                [
+                    (
+                        self.project.pk,
+                        "task.created",
+                        {"id": created.pk, "status": "TODO"},
+                    )
+                ],
+                [(self.project.pk, "task.updated", {"id": task.pk, "status": "TODO"})],
+                [(self.project.pk, "task.updated", {"id": task.pk, "status": "DONE"})],
+            ],
+        )
+
+    def test_anonymous_user(self):
+        """
+        Test that anonymous users can't create tasks.
+        """
+        context = RequestFactory().post("/graphql/")
+        context.user = AnonymousUser()
+        result = schema.execute(
+            "mutation { createTasks(tasks: []) { results { errors } } }",
+            context_value=context,
+        )
+        self.assertEqual(
+            result.errors[0].message, "You must be logged in to create tasks!"
+        )
+
+
+class GraphQLTracingTestCase(APITestCase):
+    """
+    Test case for the resolver instrumentation of the GraphQL endpoint.
+    """
+
+    query = "{ allTasks { name creator { username } } }"
+
+    def setUp(self):
+        """
+        Set up a staff user, a user and a task.
+        """
+        tracing.reset_metrics()
+        self.staff = User.objects.create_user(
+            username="staff", password="password", is_staff=True
+        )
+        self.user = User.objects.create_user(username="testuser", password="password")
+        project = Project.objects.create(
+            name="Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.user,
+        )
+        Task.objects.create(
+            name="Task",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            creator=self.user,
+            project=project,
+        )
+        project.users.add(self.staff)
+
+    def post(self, user):
+        """
+        Posts the query with tracing requested.
+        """
+        self.client.force_login(user)
+        return self.client.post(
+            "/graphql/",
+            {"query": self.query, "extensions": {"tracing": True}},
+            format="json",
+        )
+
+    def test_tracing_for_staff(self):
+        """
+        Test that staff users get the resolvers of the request.
+        """
+        response = self.post(self.staff)
+        self.assertEqual(response.json()["data"]["allTasks"][0]["name"], "Task")
+        resolvers = response.json()["extensions"]["tracing"]["execution"]["resolvers"]
+        self.assertEqual(
+            [(r["path"], r["queries"]) for r in resolvers],
+            [(["allTasks"], 1), (["allTasks", 0, "creator"], 0)],
+        )
+
+    def test_no_tracing_for_users(self):
+        """
+        Test that other users don't get the resolvers.
+        """
+        response = self.post(self.user)
+        self.assertNotIn("extensions", response.json())
+
+    def test_metrics(self):
+        """
+        Test that the histograms are exported to staff users only.
+        """
+        self.post(self.user)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("graphql-metrics"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse("graphql-metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = response.content.decode()
+        self.assertIn(
+            'graphql_resolver_queries_bucket{field="Query.allTasks",le="1"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'graphql_resolver_duration_milliseconds_count{field="TaskType.creator"} 1',
+            metrics,
+        )
+
+
+class GraphQLResultCacheTestCase(APITestCase):
+    """
+    Test case for the result cache of the GraphQL endpoint.
+    """
+
+    query = "query Dashboard @cached(ttl: 30) { allTasks { name } }"
+
+    def setUp(self):
+        """
+        Set up a project and clear the cache.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.project = Project.objects.create(
+            name="Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.user,
+        )
+        self.member = User.objects.create_user(username="member", password="password")
+        self.project.users.add(self.member)
+        self.client.force_login(self.user)
+
+    def create_task(self, name):
+        """
+        Creates a task, running the invalidation of the cache.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(
+                name=name,
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=self.user,
+                project=self.project,
+            )
+
+    def names(self, query=None):
+        """
+        Posts a query and returns the names of the tasks.
+        """
+        response = self.client.post(
+            "/graphql/", {"query": query or self.query}, format="json"
+        )
+        return [task["name"] for task in response.json()["data"]["allTasks"]]
+
+    def test_repeated_reads_skip_execution(self):
+        """
+        Test that a cached result is returned without querying the tasks.
+        """
+        self.create_task("First")
+        self.assertEqual(self.names(), ["First"])
+        # The session and the user only.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.names(), ["First"])
+
+    def test_writes_invalidate(self):
+        """
+        Test that writing a task invalidates the cached results.
+        """
+        self.assertEqual(self.names(), [])
+        self.create_task("First")
+        self.assertEqual(self.names(), ["First"])
+
+    def test_opt_in(self):
+        """
+        Test that only the operations opting in are cached.
+        """
+        query = "{ allTasks { name } }"
+        self.names(query)
+        # The session, the user, and the tasks within the statement timeout.
+        with self.assertNumQueries(5):
+            self.names(query)
+        with override_settings(
+            GRAPHQL_CACHED_OPERATIONS={persisted_queries.query_hash(query): 30}
+        ):
+            self.names(query)
+            # The session and the user only.
+            with self.assertNumQueries(2):
+                self.names(query)
+
+    def test_results_are_per_user(self):
+        """
+        Test that a user doesn't get the result cached for another user.
+        """
+        self.names()
+        self.client.force_login(self.member)
+        # The session, the user, and the tasks within the statement timeout.
+        with self.assertNumQueries(5):
+            self.names()
+
+
+class GraphQLBatchTestCase(APITestCase):
+    """
+    Test case for the batched requests of the GraphQL endpoint.
+    """
+
+    def setUp(self):
+        """
+        Set up a user with a task.
+        """
+        self.user = User.objects.create_user(username="testuser", password="password")
+        project = Project.objects.create(
+            name="Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.user,
+        )
+        Task.objects.create(
+            name="Task",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            creator=self.user,
+            project=project,
+        )
+        self.headers = {"HTTP_AUTHORIZATION": f"JWT {get_token(self.user)}"}
+
+    def post(self, body):
+        """
+        Posts a body with the token of the user.
+        """
+        return self.client.post("/graphql/", body, format="json", **self.headers)
+
+    def test_batch(self):
+        """
+        Test that the results of a batch are returned in order.
+        """
+        response = self.post(
+            [
+                {"query": "{ allTasks { name } }"},
+                {"query": "query Users { allUsers { username } }", "id": "users"},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            [
+                {"data": {"allTasks": [{"name": "Task"}]}, "id": None, "status": 200},
+                {
+                    "data": {"allUsers": [{"username": "testuser"}]},
+                    "id": "users",
+                    "status": 200,
+                },
+            ],
+        )
+
+    def test_user_is_authenticated_once(self):
+        """
+        Test that the operations of a batch share the user of the request.
+        """
+        # The user, then the tasks within the statement timeout per operation.
+        with self.assertNumQueries(7):
+            response = self.post([{"query": "{ allTasks { name } }"}] * 2)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_single_operation(self):
+        """
+        Test that an object body is still answered with an object.
+        """
+        response = self.post({"query": "{ allTasks { name } }"})
+        self.assertEqual(response.json(), {"data": {"allTasks": [{"name": "Task"}]}})
+
+    def test_invalid_batches(self):
+        """
+        Test that empty, malformed and oversized batches are rejected.
+        """
+        operation = {"query": "{ allTasks { name } }"}
+        for body in ([], [operation, "{ allTasks { name } }"]):
+            response = self.post(body)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(GRAPHQL_MAX_BATCH_SIZE=1):
+            response = self.post([operation, operation])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_identity_map(self):
+        """
+        Test that the identity map fetches an object once.
+        """
+        identity_map = IdentityMap()
+        with self.assertNumQueries(1):
+            self.assertEqual(identity_map.get(User, self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                identity_map.get_many(User, [self.user.pk]), {self.user.pk: self.user}
+            )
+        with self.assertRaises(User.DoesNotExist):
+            identity_map.get(User, 0)
+
+
+class AsyncReadViewsTestCase(APITestCase):
+    """
+    Test case for the async versions of the task, project and mention reads.
+    """
+
+    def setUp(self):
+        """
+        Set up a project with tasks, and a mention of the user.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.project = Project.objects.create(
+            name="Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.user,
+        )
+        self.project.users.add(self.user)
+        for index in range(12):
+            task = Task.objects.create(
+                name=f"Task {index}",
+                description="Description",
+                status="DONE" if index % 2 else "TODO",
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=1),
+                creator=self.user,
+                project=self.project,
+            )
+            task.assigned.add(self.user)
+        self.task = task
+        comment = Comment.objects.create(task=task, creator=self.user, content="Hi")
+        self.mention = Mention.objects.create(comment=comment, mentioned_user=self.user)
+        other = User.objects.create_user(username="other", password="password")
+        Mention.objects.create(comment=comment, mentioned_user=other)
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def assertSameResponse(self, sync_url, async_url):
+        """
+        Asserts that the sync and async views answer the same.
+        """
+        expected = self.client.get(sync_url)
+        response = self.client.get(async_url)
+        self.assertEqual(response.status_code, expected.status_code)
+        # The pagination links point to the view answering.
+        self.assertEqual(
+            response.content.decode().replace("/async/", "/"),
+            expected.content.decode().replace("/async/", "/"),
+        )
+
+    def test_task_list(self):
+        """
+        Test that the async task list pages, filters and searches as the viewset.
+        """
+        for query in ("", "?page=2", "?status=DONE", "?search=Task 1&ordering=-pk"):
+            self.assertSameResponse(f"/tasks/{query}", f"/tasks/async/{query}")
+
+    def test_task_list_queries(self):
+        """
+        Test that the async task list doesn't query per task.
+        """
+        # The user, the count, the page, and its comments, assignees and files.
+        with self.assertNumQueries(6):
+            response = self.client.get("/tasks/async/")
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_task_detail(self):
+        """
+        Test that the async task detail answers as the viewset.
+        """
+        self.assertSameResponse(
+            f"/tasks/{self.task.pk}/", f"/tasks/async/{self.task.pk}/"
+        )
+        response = self.client.get("/tasks/async/0/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_project_detail(self):
+        """
+        Test that the async project detail answers as the viewset.
+        """
+        self.assertSameResponse(
+            f"/projects/{self.project.pk}/", f"/projects/{self.project.pk}/async/"
+        )
+
+    def test_mention_inbox(self):
+        """
+        Test that the inbox lists the mentions of the user only.
+        """
+        response = self.client.get(reverse("mention-inbox"))
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(response.json()["results"][0]["pk"], self.mention.pk)
+
+        self.client.credentials()
+        response = self.client.get(reverse("mention-inbox"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RequestIdentityMapTestCase(APITestCase):
+    """
+    Test case for the identity map of the REST requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.user,
+        )
+        self.task = Task.objects.create(
+            name="Test Task",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            creator=self.user,
+            project=self.project,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _lookups(self, queries, table):
+        # The queries of an object by pk, not the joins nor the membership.
+        # The projects are looked up without the deleted ones.
+        lookup = re.compile(
+            rf'^SELECT "{table}"."id", .* FROM "{table}" WHERE '
+            rf'\(?("{table}"."deleted_at" IS NULL AND )?"{table}"."id" '
+        )
+        return [query for query in queries if lookup.search(query["sql"])]
+
+    def test_hits_and_misses(self):
+        """
+        Test that the map counts its hits and misses, whatever the pk type.
+        """
+        identity_map = IdentityMap()
+        identity_map.get(Task, str(self.task.pk))
+        with self.assertNumQueries(0):
+            identity_map.get(Task, self.task.pk)
+            identity_map.get_many(Task, [str(self.task.pk)])
+        self.assertEqual((identity_map.hits, identity_map.misses), (2, 1))
+
+    def test_task_create_loads_project_once(self):
+        """
+        Test that creating a task loads its project once.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/tasks/",
+                {
+                    "name": "New Task",
+                    "description": "Test Description",
+                    "start_date": timezone.now() + timezone.timedelta(days=1),
+                    "end_date": timezone.now() + timezone.timedelta(days=2),
+                    "project": reverse("project-detail", args=[self.project.pk]),
+                    "assigned": [reverse("user-detail", args=[self.user.pk])],
+                },
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(len(self._lookups(queries, "projects_project")), 1)
+        # The user of the request is in the map from the start.
+        self.assertEqual(len(self._lookups(queries, "auth_user")), 0)
+
+    def test_comment_create_loads_task_once(self):
+        """
+        Test that the permission and the serializer share the task of a comment.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/tasks/comments/", {"content": "Comment", "task": self.task.pk}
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self._lookups(queries, "tasks_task")), 1)
+
+    def test_file_create_loads_project_and_task_once(self):
+        """
+        Test that the serializer and the view share the project and the task of a file.
+        """
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with (
+            override_settings(MEDIA_ROOT=media_root.name),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            response = self.client.post(
+                reverse("sharedfile-list"),
+                {
+                    "project": reverse("project-detail", args=[self.project.pk]),
+                    "task": reverse("task-detail", args=[self.task.pk]),
+                    "file": SimpleUploadedFile(
+                        "notes.txt", b"notes", content_type="text/plain"
+                    ),
+                },
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(len(self._lookups(queries, "projects_project")), 1)
+        self.assertEqual(len(self._lookups(queries, "tasks_task")), 1)
+
+
+class TaskArchiveTestCase(APITestCase):
+    """
+    Test case for the archive of the done tasks.
+    """
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.other = User.objects.create_user(username="other", password="password")
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.user,
+        )
+        self.project.users.add(self.member)
+        self.task = self._create_task("Done Task", status="DONE")
+        self.task.assigned.add(self.member)
+        self.comment = Comment.objects.create(
+            task=self.task, creator=self.member, content="Hi @owner"
+        )
+        self.mention = Mention.objects.create(
+            comment=self.comment, mentioned_user=self.user
+        )
+        self.file = SharedFile.objects.create(
+            file=SimpleUploadedFile("notes.txt", b"notes"),
+            uploaded_by=self.user,
+            project=self.project,
+            task=self.task,
+        )
+        self.open_task = self._create_task("Open Task")
+        self.later = timezone.now() + timezone.timedelta(seconds=1)
+
+    def _create_task(self, name, **kwargs):
+        return Task.objects.create(
+            name=name,
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            creator=self.user,
+            project=self.project,
+            **kwargs,
+        )
+
+    def test_completed_at_follows_status(self):
+        """
+        Test that a task is stamped when done, and cleared when reopened.
+        """
+        self.assertIsNotNone(self.task.completed_at)
+        self.assertIsNone(self.open_task.completed_at)
+        self.task.status = "TODO"
+        self.task.save(update_fields=["status"])
+        self.task.refresh_from_db()
+        self.assertIsNone(self.task.completed_at)
+
+    def test_set_statuses_stamps_completed_at(self):
+        """
+        Test that the bulk status mutation stamps the done tasks only.
+        """
+        done_at = self.task.completed_at
+        request = RequestFactory().post("/graphql/")
+        request.user = self.user
+        result = schema.execute(
+            """
+            mutation SetStatuses($statuses: [TaskStatusInput!]!) {
+                setTaskStatuses(statuses: $statuses) { results { errors } }
+            }
+            """,
+            variables={
+                "statuses": [
+                    {"id": self.task.pk, "status": "DONE"},
+                    {"id": self.open_task.pk, "status": "DONE"},
+                ]
+            },
+            context_value=request,
+        )
+        self.assertIsNone(result.errors)
+        self.task.refresh_from_db()
+        self.open_task.refresh_from_db()
+        self.assertEqual(self.task.completed_at, done_at)
+        self.assertIsNotNone(self.open_task.completed_at)
+
+    def test_archive_moves_done_tasks(self):
+        """
+        Test that the tasks done before the cutoff are moved with their
+        comments, mentions, assignees and files, and the others stay.
+        """
+        recent = self._create_task("Recent Task", status="DONE")
+        recent.completed_at = self.later + timezone.timedelta(days=1)
+        recent.save()
+        self.assertEqual(archive_done_tasks(before=self.later), 1)
+        self.assertEqual(
+            set(Task.objects.values_list("pk", flat=True)),
+            {self.open_task.pk, recent.pk},
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Mention.objects.exists())
+        archived = ArchivedTask.objects.get(pk=self.task.pk)
+        self.assertEqual(archived.name, "Done Task")
+        self.assertEqual(list(archived.assigned.all()), [self.member])
+        comment = archived.comments.get()
+        self.assertEqual((comment.pk, comment.content), (self.comment.pk, "Hi @owner"))
+        self.assertEqual(comment.mentions.get().mentioned_user, self.user)
+        # The file stays with the project.
+        self.file.refresh_from_db()
+        self.assertIsNone(self.file.task)
+        self.assertEqual(list(archived.shared_files.all()), [self.file])
+
+    def test_archive_runs_in_chunks(self):
+        """
+        Test that every chunk is moved, the last one being partial.
+        """
+        for index in range(4):
+            self._create_task(f"Done Task {index}", status="DONE")
+        self.assertEqual(archive_done_tasks(before=self.later, chunk_size=2), 5)
+        self.assertEqual(ArchivedTask.objects.count(), 5)
+        self.assertEqual(list(Task.objects.all()), [self.open_task])
+
+    def test_archive_list_is_scoped(self):
+        """
+        Test that the archive lists the archived tasks of the user's projects.
+        """
+        archive_done_tasks(before=self.later)
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get(reverse("archivedtask-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [task["pk"] for task in response.data["results"]], [self.task.pk]
+        )
+        self.assertEqual(
+            response.data["results"][0]["comments"][0]["mentions"], [self.user.pk]
+        )
+        cache.clear()
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(reverse("archivedtask-list"))
+        self.assertEqual(response.data["count"], 0)
+
+    def test_archive_is_read_only(self):
+        """
+        Test that the archived tasks can't be changed.
+        """
+        archive_done_tasks(before=self.later)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(
+            reverse("archivedtask-detail", args=[self.task.pk]), {"name": "Changed"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_restore(self):
+        """
+        Test that restoring a task brings back its pk, comments, mentions,
+        assignees and files, and stamps it as done now.
+        """
+        archive_done_tasks(before=self.later)
+        self.client.force_authenticate(user=self.member)
+        response = self.client.post(
+            reverse("archivedtask-restore", args=[self.task.pk])
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data["pk"], self.task.pk)
+        self.assertFalse(ArchivedTask.objects.exists())
+        task = Task.objects.get(pk=self.task.pk)
+        # Not archived again until TASK_ARCHIVE_AGE seconds after the restore.
+        self.assertGreater(task.completed_at, self.task.completed_at)
+        self.assertEqual(list(task.assigned.all()), [self.member])
+        comment = task.comments.get()
+        self.assertEqual(comment.created_at, self.comment.created_at)
+        self.assertEqual(comment.mentions.get().pk, self.mention.pk)
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.task_id, task.pk)
+
+    def test_restore_needs_membership(self):
+        """
+        Test that the users outside of the project don't find the archived task.
+        """
+        archive_done_tasks(before=self.later)
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(
+            reverse("archivedtask-restore", args=[self.task.pk])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(ArchivedTask.objects.exists())
+
+
+class PartitioningTestCase(TestCase):
+    """
+    Test case for the monthly partitions of the tasks and the comments.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(
+            name="Test Project",
+            start_date=timezone.now(),
+            end_date=timezone.now() + timezone.timedelta(days=1),
+            owner=self.user,
+        )
+        # The first month of its own partition, after the initial one.
+        self.month = next(
+            start for name, start, _end in partitions("tasks_task") if start is not None
+        )
+
+    def _create_task(self, created_at):
+        return Task.objects.create(
+            name="Test Task",
+            created_at=created_at,
+            start_date=timezone.now() + timezone.timedelta(days=1),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            creator=self.user,
+            project=self.project,
+        )
+
+    def _partition_of(self, task):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM tasks_task WHERE id = %s",
+                [task.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_tables_are_partitioned(self):
+        """
+        Test that the tasks and comments have the partitions of the next months.
+        """
+        self.assertEqual(partitioned_tables(), ["tasks_comment", "tasks_task"])
+        for table in partitioned_tables():
+            names = [name for name, _start, _end in partitions(table)]
+            self.assertIn(f"{table}_initial", names)
+            self.assertIn(f"{table}_default", names)
+            self.assertEqual(len(names), 2 + settings.PARTITION_MONTHS_AHEAD)
+
+    def test_rows_are_routed_by_month(self):
+        """
+        Test that a task is stored in the partition of the month it was created in.
+        """
+        task = self._create_task(self.month + timezone.timedelta(days=3))
+        comment = Comment.objects.create(task=task, creator=self.user, content="Hi")
+        self.assertEqual(self._partition_of(task), f"tasks_task_p{self.month:%Y%m}")
+        self.assertEqual(Task.objects.get(pk=task.pk).comments.get(), comment)
+
+    def test_create_partitions_is_idempotent(self):
+        """
+        Test that only the missing months are created.
+        """
+        self.assertEqual(create_partitions("tasks_task"), [])
+        created = create_partitions(
+            "tasks_task", months=settings.PARTITION_MONTHS_AHEAD + 2
+        )
+        self.assertEqual(len(created), 2)
+        self.assertEqual(create_partitions("tasks_task", months=5), [])
+
+    def test_date_filter_prunes_partitions(self):
+        """
+        Test that a created_at range only reads the partitions of its months.
+        """
+        plan = Task.objects.filter(
+            created_at__gte=self.month,
+            created_at__lt=self.month + timezone.timedelta(days=10),
+        ).explain()
+        self.assertIn(f"tasks_task_p{self.month:%Y%m}", plan)
+        self.assertNotIn("tasks_task_initial", plan)
+        self.assertNotIn("tasks_task_default", plan)
+
+    def test_detach_partitions(self):
+        """
+        Test that the old partitions are detached with their rows, and that a
+        row of a detached month goes to the default partition.
+        """
+        old = self._create_task(self.month - timezone.timedelta(days=40))
+        out = StringIO()
+        call_command(
+            "detach_partitions",
+            "--before",
+            f"{self.month:%Y-%m-%d}",
+            "--table",
+            "tasks_task",
+            stdout=out,
+        )
+        self.assertIn("Detached tasks_task_initial from tasks_task", out.getvalue())
+        self.assertFalse(Task.objects.filter(pk=old.pk).exists())
+        self.assertEqual(detach_partitions("tasks_task", self.month), [])
+        restored = self._create_task(self.month - timezone.timedelta(days=40))
+        self.assertEqual(self._partition_of(restored), "tasks_task_default")
+
+    def _count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{table}"')
+            return cursor.fetchone()[0]
+
+    def test_detach_partitions_moves_the_dependents(self):
+        """
+        Test that the assignments, comments and mentions of the tasks of a
+        detached month are moved with it, whatever the month of the comments.
+        """
+        old = self._create_task(self.month - timezone.timedelta(days=40))
+        old.assigned.add(self.user)
+        # Written in a later month than the task.
+        comment = Comment.objects.create(task=old, creator=self.user, content="Hi")
+        Mention.objects.create(comment=comment, mentioned_user=self.user)
+        kept = self._create_task(self.month + timezone.timedelta(days=3))
+        kept.assigned.add(self.user)
+
+        self.assertEqual(
+            detach_partitions("tasks_task", self.month), ["tasks_task_initial"]
+        )
+
+        self.assertFalse(Comment.objects.filter(pk=comment.pk).exists())
+        self.assertFalse(Mention.objects.filter(comment_id=comment.pk).exists())
+        self.assertEqual(list(self.user.tasks.all()), [kept])
+        for table in ("tasks_comment", "tasks_mention", "tasks_task_assigned"):
+            self.assertEqual(self._count(f"tasks_task_initial_{table}"), 1)
+
+    def test_detach_partitions_moves_the_dependents_in_batches(self):
+        """
+        Test that the dependents of a detached month are all moved, however
+        small the batches.
+        """
+        old = self._create_task(self.month - timezone.timedelta(days=40))
+        for content in ("Hi", "Hello", "Bye"):
+            Comment.objects.create(task=old, creator=self.user, content=content)
+
+        detach_partitions("tasks_task", self.month, batch_size=2)
+
+        self.assertFalse(Comment.objects.filter(task_id=old.pk).exists())
+        self.assertEqual(self._count("tasks_task_initial_tasks_comment"), 3)
+
+    def test_detach_partitions_refuses_shared_files(self):
+        """
+        Test that a month is not detached while files are shared on its tasks.
+        """
+        old = self._create_task(self.month - timezone.timedelta(days=40))
+        SharedFile.objects.create(
+            file="shared_files/test.txt",
+            uploaded_by=self.user,
+            project=self.project,
+            task=old,
+        )
+
+        with self.assertRaisesMessage(CommandError, "files_sharedfile"):
+            call_command(
+                "detach_partitions",
+                "--before",
+                f"{self.month:%Y-%m-%d}",
+                stdout=StringIO(),
+            )
+        self.assertTrue(Task.objects.filter(pk=old.pk).exists())
+
+
+class TaskSerializerAPITestCase(APITestCase):
+    """
+    Test case for the TaskSerializer class.
+    """
+
+    def setUp(self):
+        """
+        Set up the necessary data for the test case.
+        """
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.user2 = User.objects.create_user(
+            username="testuser2", password="testpassword"
+        )
+        self.user_outside = User.objects.create_user(
+            username="testuser3", password="testpassword"
+        )
+        self.project = Project.objects.create(
+            name="Test Project",
+            description="Test Description",
+            start_date=timezone.now() + timezone.timedelta(days=1),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            owner=self.user,
+        )
+        self.project.users.add(self.user, self.user2)
+        self.task = Task.objects.create(
+            name="Test Task",
+            start_date=timezone.now() + timezone.timedelta(days=1),
+            end_date=timezone.now() + timezone.timedelta(days=2),
+            description="Test description",
+            priority="MEDIUM",
+            status="TODO",
+            creator=self.user,
+            project=self.project,
+        )
+        self.task.assigned.add(self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_validate_assigned_with_members(self):
+        """
+        Test the validation of the assigned users with members of the project.
+        """
+        task_data = {
+            "assigned": reverse("user-detail", args=[self.user2.pk]),
+        }
+        response = self.client.patch(f"/tasks/{self.task.pk}/", task_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_validate_assigned_with_non_members(self):
+        """
+        Test the validation of the assigned users with non-members of the project.
+        """
+        task_data = {
+            "assigned": [self.user_outside.pk],
+        }
+        response = self.client.patch(f"/tasks/{self.task.pk}/", task_data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_validate_assigned_with_some_non_members(self):
+        """
+        Test that one non-member among members of the project is rejected.
+        """
+        task_data = {
+            "assigned": [
+                reverse("user-detail", args=[self.user2.pk]),
+                reverse("user-detail", args=[self.user_outside.pk]),
+            ],
+        }
+        response = self.client.patch(f"/tasks/{self.task.pk}/", task_data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("assigned", response.data)
+        self.assertNotIn(self.user2, self.task.assigned.all())
+
+    def test_assigned_users_added(self):
+        """
+        Test that the assigned users are added to the current ones.
+        """
+        task_data = {"assigned": [reverse("user-detail", args=[self.user2.pk])]}
+        response = self.client.patch(f"/tasks/{self.task.pk}/", task_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.task.assigned.all()), {self.user, self.user2})
+
+    def test_validate_assigned_queries(self):
+        """
+        Test that checking the assigned users doesn't depend on the members.
+        """
+        for index in range(20):
+            self.project.users.add(
+                User.objects.create_user(username=f"member{index}", password="pw")
+            )
+        serializer = TaskSerializer(
+            self.task,
+            data={"assigned": [reverse("user-detail", args=[self.user2.pk])]},
+            partial=True,
+        )
+        # The assigned user, and the count of the members among them.
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
 
 
 class CommentModelTest(APITestCase):
@@ -1,19 +1,33 @@
 """
 This module defines the URL patterns for the tasks app.
 
-It includes a router that automatically generates the URL patterns for the TaskViewSet.
+It includes a router that automatically generates the URL patterns for the TaskViewSet
+and the archived tasks, and the async task and mention reads.
 """
 
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import CommentViewSet, MentionViewSet, TaskViewSet
+from .views import (
+    ArchivedTaskViewSet,
+    CommentViewSet,
+    MentionViewSet,
+    TaskViewSet,
+    mention_inbox,
+    task_detail,
+    task_list,
+)
 
 router = DefaultRouter()
 router.register(r"comments", CommentViewSet)
 router.register(r"mentions", MentionViewSet)
+router.register(r"archive", ArchivedTaskViewSet)
 router.register(r"", TaskViewSet)
 
 urlpatterns = [
+    # The async reads, before the routes of the viewsets they would match.
+    path("async/", task_list, name="async-task-list"),
+    path("async/<int:pk>/", task_detail, name="async-task-detail"),
+    path("mentions/inbox/", mention_inbox, name="mention-inbox"),
     path("", include(router.urls)),
 ]
@@ -2,16 +2,30 @@
 This module contains the viewset for managing tasks in the Task Manager API.
 
 The TaskViewSet class provides CRUD operations for tasks, along with additional actions
-such as assigning a task to a user.
+such as assigning a task to a user. The ArchivedTaskViewSet lists the archived
+tasks, and restores them.
+
+The task_list, task_detail and mention_inbox views are async versions of the
+most read endpoints, for the ASGI server, see taskmanager.async_api.
 """
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed
 from django_filters.rest_framework import DjangoFilterBackend
+from projects import membership
+from projects.scoping import ProjectScopedMixin, visible_to
 from rest_framework import decorators, filters, response, status, viewsets
+from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from .models import Comment, Mention, Project, Task
+from taskmanager import async_api
+
+from .archive import restore_task
+from .models import ArchivedTask, Comment, Mention, Task
 from .permissions import (
     IsCreatorOrReadOnly,
     IsMentionedUser,
@@ -19,6 +33,7 @@ from .permissions import (
     IsProjectMemberOrReadOnly,
 )
 from .serializers import (
+    ArchivedTaskSerializer,
     CommentReadSerializer,
     CommentSerializer,
     CommentUpdateSerializer,
@@ -27,25 +42,28 @@ from .serializers import (
 )
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     """
     A viewset for managing tasks.
 
     This viewset provides CRUD operations for tasks, along with additional actions
-    such as assigning a task to a user.
+    such as assigning a task to a user. A user only sees the tasks of the projects
+    they own or are a member of.
 
     Attributes:
+        project_field (str): The path from a task to its project.
         queryset (QuerySet): The queryset of tasks.
         serializer_class (Serializer): The serializer class for tasks.
         authentication_classes (list): The authentication classes for the viewset.
         permission_classes (list): The permission classes for the viewset.
         filter_backends (list): The filter backends for the viewset.
-        filterset_fields (list): The fields to filter tasks by.
+        filterset_fields (dict): The fields to filter tasks by, with their lookups.
         search_fields (list): The fields to search tasks by.
         ordering_fields (list): The fields to order tasks by.
         ordering (list): The default ordering for tasks.
     """
 
+    project_field = "project"
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     authentication_classes = [JWTAuthentication]
@@ -55,7 +73,14 @@ class TaskViewSet(viewsets.ModelViewSet):
         filters.SearchFilter,
         filters.OrderingFilter,
     ]
-    filterset_fields = ["priority", "status", "shared_files"]
+    # The tasks are partitioned by month of creation, a created_at range only
+    # reads the partitions of its months.
+    filterset_fields = {
+        "priority": ["exact"],
+        "status": ["exact"],
+        "shared_files": ["exact"],
+        "created_at": ["gte", "lt"],
+    }
     search_fields = ["name", "description", "priority", "status"]
     ordering_fields = ["priority", "status", "end_date", "duration", "created_at"]
     ordering = [
@@ -106,10 +131,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             return response.Response(
                 {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
-        if (
-            request.user not in task.project.users.all()
-            and request.user != task.project.owner
-        ):
+        if not membership.is_member(request, task.project_id):
             return response.Response(
                 {"error": "User is not a member of the project or owner"},
                 status=status.HTTP_403_FORBIDDEN,
@@ -200,11 +222,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         Returns:
             None
         """
-        project_url = self.request.data.get("project")
-        # Extract the project pk from the URL string
-        project_id = project_url.rstrip("/").split("/")[-1]
-        project = Project.objects.get(pk=project_id)
-        if self.request.user not in {project.owner, *project.users.all()}:
+        project = serializer.validated_data["project"]
+        if not membership.is_member(self.request, project.pk):
             raise ValidationError("You are not a member of this project")
         serializer.save(creator=self.request.user)
 
@@ -228,23 +247,28 @@ class MentionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsMentionedUser]
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     """
     A viewset for managing comments.
 
-    This viewset provides CRUD operations for comments.
+    This viewset provides CRUD operations for comments. A user only sees the
+    comments of the tasks of the projects they own or are a member of.
 
     Attributes:
+        project_field (str): The path from a comment to its project.
         queryset (QuerySet): The queryset of comments.
         serializer_class (Serializer): The serializer class for comments.
         authentication_classes (list): The authentication classes for the viewset.
         permission_classes (list): The permission classes for the viewset.
+        filterset_fields (dict): The fields to filter comments by, with their lookups.
     """
 
+    project_field = "task__project"
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsCreatorOrReadOnly, IsProjectMember]
+    filterset_fields = {"created_at": ["gte", "lt"]}
 
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
@@ -256,3 +280,137 @@ class CommentViewSet(viewsets.ModelViewSet):
         if self.action in ("list", "retrive"):
             return CommentReadSerializer
         return CommentSerializer
+
+
+class ArchivedTaskViewSet(ProjectScopedMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    A read-only viewset for the archived tasks, see tasks.archive.
+
+    A user only sees the archived tasks of the projects they own or are a
+    member of, and the members restore them.
+
+    Attributes:
+        project_field (str): The path from an archived task to its project.
+        queryset (QuerySet): The queryset of archived tasks.
+        serializer_class (Serializer): The serializer class for archived tasks.
+        authentication_classes (list): The authentication classes for the viewset.
+        permission_classes (list): The permission classes for the viewset.
+        ordering (list): The ordering of archived tasks, the last done first.
+    """
+
+    project_field = "project"
+    queryset = ArchivedTask.objects.prefetch_related(
+        "assigned", "shared_files", "comments__mentions"
+    )
+    serializer_class = ArchivedTaskSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsProjectMemberOrReadOnly]
+    filter_backends = [filters.OrderingFilter]
+    ordering = ["-completed_at", "-pk"]
+
+    @decorators.action(detail=True, methods=["post"])
+    def restore(self, request, pk=None):
+        """
+        Moves an archived task back to the tasks.
+
+        Args:
+            request (HttpRequest): The request object.
+            pk (int): The pk of the archived task.
+
+        Returns:
+            HttpResponse: The response containing the restored task.
+        """
+        archived = self.get_object()
+        task = restore_task(archived.pk)
+        serializer = TaskSerializer(task, context=self.get_serializer_context())
+        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+# The relations the TaskSerializer reads, the foreign keys are only read as pks.
+TASK_PREFETCH = ("comments", "assigned", "shared_files")
+
+
+def _filter_tasks(request: HttpRequest, user) -> QuerySet:
+    # The scoping, filters, search and ordering of the TaskViewSet. Validating
+    # the filters may query the database.
+    drf_request = Request(request)
+    drf_request.user = user or AnonymousUser()
+    view = TaskViewSet(request=drf_request, format_kwarg=None, action="list")
+    return view.filter_queryset(view.get_queryset())
+
+
+async def task_list(request: HttpRequest) -> HttpResponse:
+    """
+    Lists the tasks, as the list action of the TaskViewSet.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        HttpResponse: A page of tasks.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    async with async_api.database():
+        user, error = await async_api.authenticate(request)
+        if error is not None:
+            return error
+        queryset = await sync_to_async(_filter_tasks)(request, user)
+        tasks, page = await async_api.paginate(
+            request, queryset.prefetch_related(*TASK_PREFETCH)
+        )
+    if page is None:
+        return async_api.render({"detail": "Invalid page."}, 404)
+    serializer = TaskSerializer(tasks, many=True, context={"request": request})
+    return async_api.render({**page, "results": serializer.data})
+
+
+async def task_detail(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Retrieves a task, as the retrieve action of the TaskViewSet.
+
+    Args:
+        request (HttpRequest): The request.
+        pk (int): The pk of the task.
+
+    Returns:
+        HttpResponse: The task.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    async with async_api.database():
+        user, error = await async_api.authenticate(request)
+        if error is not None:
+            return error
+        tasks = Task.objects.filter(visible_to(user, "project"))
+        try:
+            task = await tasks.prefetch_related(*TASK_PREFETCH).aget(pk=pk)
+        except Task.DoesNotExist:
+            return async_api.render({"detail": "Not found."}, 404)
+    return async_api.render(TaskSerializer(task, context={"request": request}).data)
+
+
+async def mention_inbox(request: HttpRequest) -> HttpResponse:
+    """
+    Lists the mentions of the user, newest first.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        HttpResponse: A page of mentions.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    async with async_api.database():
+        user, error = await async_api.authenticate(request, required=True)
+        if error is not None:
+            return error
+        mentions, page = await async_api.paginate(
+            request,
+            Mention.objects.filter(mentioned_user=user).order_by("-created_at", "-pk"),
+        )
+    if page is None:
+        return async_api.render({"detail": "Invalid page."}, 404)
+    serializer = MentionSerializer(mentions, many=True, context={"request": request})
+    return async_api.render({**page, "results": serializer.data})